@@ -4,6 +4,7 @@ from astropy import constants
 from astropy import wcs
 import numpy as np
 import warnings
+import weakref
 
 # Imports for the custom kernels
 from astropy.modeling.models import Ellipse2D, Gaussian2D
@@ -11,6 +12,9 @@ from astropy.convolution import Kernel2D
 from astropy.convolution.kernels import _round_up_to_odd_integer
 
 from .utils import deconvolve_optimized, convolve, RadioBeamDeprecationWarning
+from .fits_utils import _find_history_beam, update_header_inplace
+from .casa_utils import read_casa_beams
+from .kernel_cache import kernel_cache, kernel_key
 
 # Conversion between a twod Gaussian FWHM**2 and effective area
 FWHM_TO_AREA = 2*np.pi/(8*np.log(2))
@@ -205,52 +209,35 @@ class Beam(u.Quantity):
         """
         Instantiate the beam from an AIPS header. AIPS holds the beam
         in history. This method of initializing uses the last such
-        entry.
+        entry, found with a single scan from the end of the history.
+        See `~radio_beam.fits_utils.beam_params_from_header` for a parser
+        that does not need a `~astropy.io.fits.Header`.
         """
         # a line looks like
         # HISTORY AIPS   CLEAN BMAJ=  1.7599E-03 BMIN=  1.5740E-03 BPA=   2.61
+        # or, for CASA,
+        # HISTORY > restoration: 1.34841 by 0.830715 (arcsec) at pa 82.8827 (deg)
+        # The CASA style takes precedence over AIPS (a dubious choice).
         if 'HISTORY' not in hdr:
             return None
 
-        aipsline = None
-        for line in hdr['HISTORY']:
-            if 'BMAJ' in line:
-                aipsline = line
-
-        # a line looks like
-        # HISTORY Sat May 10 20:53:11 2014
-        # HISTORY imager::clean() [] Fitted beam used in
-        # HISTORY > restoration: 1.34841 by 0.830715 (arcsec)
-        #        at pa 82.8827 (deg)
-
-        casaline = None
-        for line in hdr['HISTORY']:
-            if ('restoration' in line) and ('arcsec' in line):
-                casaline = line
-        #assert precedence for CASA style over AIPS
-        #        this is a dubious choice
-
-        if casaline is not None:
-            bmaj = float(casaline.split()[2]) * u.arcsec
-            bmin = float(casaline.split()[4]) * u.arcsec
-            bpa = float(casaline.split()[8]) * u.deg
-            return cls(major=bmaj, minor=bmin, pa=bpa)
-
-        elif aipsline is not None:
-            bmaj = float(aipsline.split()[3]) * u.deg
-            bmin = float(aipsline.split()[5]) * u.deg
-            bpa = float(aipsline.split()[7]) * u.deg
-            return cls(major=bmaj, minor=bmin, pa=bpa)
-
-        else:
+        result = _find_history_beam(hdr['HISTORY'])
+        if result is None:
             return None
 
+        kind, match = result
+        bmaj, bmin, bpa = (float(value) for value in match.groups())
+        unit = u.arcsec if kind == 'casa' else u.deg
+        return cls(major=bmaj * unit, minor=bmin * unit, pa=bpa * u.deg)
+
     @classmethod
     def from_casa_image(cls, imagename):
         """
         Instantiate beam from a CASA image.
 
-        ** Must be run in a CASA environment! **
+        The restoring beam is read from the image's table keywords, so CASA
+        does not need to be installed (see
+        `~radio_beam.casa_utils.read_casa_beams`).
 
         Parameters
         ----------
@@ -258,30 +245,20 @@ class Beam(u.Quantity):
             Name of CASA image.
         """
 
-        try:
-            import casac
-        except ImportError:
-            raise ImportError("Could not import CASA (casac) and therefore"
-                              " cannot read CASA .image files")
-
-        ia.open(imagename)
-        beam_props = ia.restoringbeam()
-        ia.close()
-
-        beam_keys = ["major", "minor", "positionangle"]
-        if not all([True for key in beam_keys if key in beam_props]):
-            raise ValueError("The image does not contain complete beam "
-                             "information. Check the output of "
-                             "ia.restoringbeam().")
-
-        major = beam_props["major"]["value"] * \
-            u.Unit(beam_props["major"]["unit"])
-        minor = beam_props["minor"]["value"] * \
-            u.Unit(beam_props["minor"]["unit"])
-        pa = beam_props["positionangle"]["value"] * \
-            u.Unit(beam_props["positionangle"]["unit"])
+        params = read_casa_beams(imagename)
+        if params is None:
+            raise NoBeamException("The image does not contain a restoring "
+                                  "beam.")
 
-        return cls(major=major, minor=minor, pa=pa)
+        major, minor, pa = params
+        if major.size != 1:
+            raise ValueError("The image has {} beams. Use "
+                             "Beams.from_casa_image to read "
+                             "them.".format(major.size))
+
+        return cls(major=(major.item() * u.deg).to(u.arcsec),
+                   minor=(minor.item() * u.deg).to(u.arcsec),
+                   pa=pa.item() * u.deg)
 
     def attach_to_header(self, header, copy=True):
         """
@@ -308,6 +285,28 @@ class Beam(u.Quantity):
 
         return header
 
+    def attach_to_fits_file(self, filename, ext=0):
+        """
+        Set the beam keywords in the header of a FITS file on disk, writing
+        only the header blocks when there is room.
+
+        See `~radio_beam.fits_utils.update_beam_headers` to update many files.
+
+        Parameters
+        ----------
+        filename : str
+            Name of the FITS file.
+        ext : int or str, optional
+            The HDU to update.
+
+        Returns
+        -------
+        mode : str
+            'inplace' if only the header blocks were written, or 'rewritten'.
+        """
+        return update_header_inplace(filename, self.to_header_keywords(),
+                                     ext=ext)
+
     def __repr__(self):
         return "Beam: BMAJ={0} BMIN={1} BPA={2}".format(self.major.to(self.default_unit),self.minor.to(self.default_unit),self.pa.to(u.deg))
 
@@ -555,24 +554,68 @@ class Beam(u.Quantity):
                        # (it is angle from NCP)
                        angle=(self.pa+90*u.deg).to(u.deg).value, **kwargs)
 
-    def as_kernel(self, pixscale, **kwargs):
+    def as_kernel(self, pixscale, cache=False, **kwargs):
         """
         Returns an elliptical Gaussian kernel of the beam.
 
         .. warning::
             This method is not aware of any misalignment between pixel
-            and world coordinates.
+            and world coordinates. Use `as_kernel_for_wcs` for rotated or
+            non-square pixels.
 
         Parameters
         ----------
         pixscale : `~astropy.units.Quantity`
             Conversion from angular to pixel size.
+        cache : bool or `~radio_beam.kernel_cache.KernelCache`, optional
+            Cache of the kernels. By default, a new kernel is created.
+            `True` uses the default `~radio_beam.kernel_cache.kernel_cache`.
+            Cached kernels share a read-only array, so they cannot be
+            modified in place (e.g., with ``normalize``).
         kwargs : passed to EllipticalGaussian2DKernel
         """
         # do something here involving matrices
         # need to rotate the kernel into the wcs pixel space, kinda...
         # at the least, need to rescale the kernel axes into pixels
 
+        stddev_maj, stddev_min, angle = self._pixel_gaussian(pixscale)
+
+        return _cached_kernel(cache, EllipticalGaussian2DKernel,
+                              stddev_maj, stddev_min, angle, **kwargs)
+
+    def as_kernel_for_wcs(self, mywcs, cache=False, **kwargs):
+        """
+        Returns an elliptical Gaussian kernel of the beam in the pixel
+        coordinates of a WCS.
+
+        Unlike `as_kernel`, the beam is transformed with the full PC (or CD)
+        matrix of the celestial axes, so non-square, rotated and skewed
+        pixels are handled. The transform is linear, at the reference pixel
+        of the WCS, and is cached for each WCS object.
+
+        Parameters
+        ----------
+        mywcs : `~astropy.wcs.WCS`
+            WCS with two celestial axes.
+        cache : bool or `~radio_beam.kernel_cache.KernelCache`, optional
+            Cache of the kernels. See `as_kernel`.
+        kwargs : passed to EllipticalGaussian2DKernel
+        """
+        stddev_maj, stddev_min, angle = \
+            _transform_gaussian(self.major.to_value(u.deg),
+                                self.minor.to_value(u.deg),
+                                self.pa.to_value(u.rad),
+                                _wcs_pixel_transform(mywcs))
+
+        return _cached_kernel(cache, EllipticalGaussian2DKernel,
+                              float(stddev_maj), float(stddev_min),
+                              float(angle), **kwargs)
+
+    def _pixel_gaussian(self, pixscale):
+        """
+        Standard deviations in pixels and angle in radians of the beam
+        Gaussian.
+        """
         stddev_maj = (self.major.to(u.deg)/(pixscale.to(u.deg) *
                                             SIGMA_TO_FWHM)).decompose()
         stddev_min = (self.minor.to(u.deg)/(pixscale.to(u.deg) *
@@ -581,14 +624,88 @@ class Beam(u.Quantity):
         # position angle is defined as CCW from north
         # "angle" is conventionally defined as CCW from "west".
         # Therefore, add 90 degrees
-        angle = (90*u.deg+self.pa).to(u.radian).value,
+        angle = (90*u.deg+self.pa).to(u.radian).value
+
+        return stddev_maj.value, stddev_min.value, angle
+
+    def convolve_image_to(self, target, data, pixscale, tile_size=None,
+                          workers=None, support_scaling=8, out=None,
+                          method='fft'):
+        """
+        Convolve an image from this beam to a target beam, in overlapping
+        tiles.
+
+        See `~radio_beam.convolution.convolve_image`.
 
-        return EllipticalGaussian2DKernel(stddev_maj.value,
-                                          stddev_min.value,
-                                          angle,
-                                          **kwargs)
+        Parameters
+        ----------
+        target : `~radio_beam.Beam`
+            Beam to convolve to.
+        data : `~numpy.ndarray` or `~astropy.units.Quantity`
+            Image of shape ``(ny, nx)``.
+        pixscale : `~astropy.units.Quantity`
+            Conversion from angular to pixel size.
+        tile_size : int or tuple of int, optional
+            FFT shape of the tiles.
+        workers : int, optional
+            Number of threads.
+        support_scaling : int, optional
+            Sets the overlap between tiles.
+        out : `~numpy.ndarray`, optional
+            Output array of the same shape as ``data``.
+        method : {'fft', 'separable'}, optional
+            Tiled 2D FFTs, or 1-D passes along the pixel axes and a sheared
+            line.
+
+        Returns
+        -------
+        out : `~numpy.ndarray` or `~astropy.units.Quantity`
+            The convolved image.
+        """
+        from .convolution import convolve_image
 
-    def as_tophat_kernel(self, pixscale, **kwargs):
+        return convolve_image(data, self, target, pixscale,
+                              tile_size=tile_size, workers=workers,
+                              support_scaling=support_scaling, out=out,
+                              method=method)
+
+    def as_fourier_kernel(self, shape, pixscale, real=True, dtype=float):
+        """
+        Returns the Fourier transform of the beam kernel on a FFT grid.
+
+        The transfer function of the Gaussian is evaluated analytically, so
+        there is no kernel array to discretize, truncate or zero-pad. The
+        Gaussian is normalized to unit integral and centered on pixel
+        ``(0, 0)``, so that convolving an image is
+        ``irfft2(rfft2(image) * kernel, s=image.shape)``.
+
+        .. warning::
+            This method is not aware of any misalignment between pixel
+            and world coordinates.
+
+        Parameters
+        ----------
+        shape : tuple of int
+            Shape ``(ny, nx)`` of the image to convolve.
+        pixscale : `~astropy.units.Quantity`
+            Conversion from angular to pixel size.
+        real : bool, optional
+            Return the half-plane of `numpy.fft.rfft2`, of shape
+            ``(ny, nx // 2 + 1)``. Otherwise return the full plane of
+            `numpy.fft.fft2`.
+        dtype : data-type, optional
+            Float type of the result, e.g. `numpy.float32`.
+
+        Returns
+        -------
+        kernel : `~numpy.ndarray`
+            The real transfer function on the frequency grid.
+        """
+        stddev_maj, stddev_min, angle = self._pixel_gaussian(pixscale)
+        return _gaussian_transfer_function(stddev_maj, stddev_min, angle,
+                                           shape, real=real, dtype=dtype)
+
+    def as_tophat_kernel(self, pixscale, cache=False, **kwargs):
         """
         Returns an elliptical Tophat kernel of the beam. The area has
         been scaled to match the 2D Gaussian area:
@@ -608,6 +725,8 @@ class Beam(u.Quantity):
         ----------
         pixscale : float
             deg -> pixels
+        cache : bool or `~radio_beam.kernel_cache.KernelCache`, optional
+            Cache of the kernels. See `~radio_beam.Beam.as_kernel`.
         **kwargs : passed to EllipticalTophat2DKernel
         """
 
@@ -627,10 +746,10 @@ class Beam(u.Quantity):
         # position angle is defined as CCW from north
         # "angle" is conventionally defined as CCW from "west".
         # Therefore, add 90 degrees
-        angle = (90*u.deg+self.pa).to(u.radian).value,
+        angle = (90*u.deg+self.pa).to(u.radian).value
 
-        return EllipticalTophat2DKernel(maj_eff.value, min_eff.value,
-                                        angle, **kwargs)
+        return _cached_kernel(cache, EllipticalTophat2DKernel,
+                              maj_eff.value, min_eff.value, angle, **kwargs)
 
     def to_header_keywords(self):
         return {'BMAJ': self.major.to(u.deg).value,
@@ -640,11 +759,301 @@ class Beam(u.Quantity):
 
 # Beam.__doc__ = Beam.__doc__ + Beam.__new__.__doc__
 
+
+def _cached_kernel(cache, kernel_class, stddev_maj, stddev_min, angle,
+                   **kwargs):
+    """
+    Create a kernel, or get it from ``cache`` (see `~radio_beam.Beam.as_kernel`).
+    """
+    def factory():
+        return kernel_class(stddev_maj, stddev_min, angle, **kwargs)
+
+    if cache is False or cache is None:
+        return factory()
+    if cache is True:
+        cache = kernel_cache
+
+    # Include the default arguments, so that they give the same key
+    key_kwargs = dict(_KERNEL_DEFAULTS[kernel_class], **kwargs)
+    key = kernel_key(kernel_class.__name__, stddev_maj, stddev_min, angle,
+                     **key_kwargs)
+    return cache.get(key, factory)
+
 def mywcs_to_platescale(mywcs):
     pix_area = wcs.utils.proj_plane_pixel_area(mywcs)
     return pix_area**0.5
 
 
+# Pixel transforms of WCS objects, see `_wcs_pixel_transform`
+_WCS_TRANSFORMS = weakref.WeakKeyDictionary()
+
+
+def _wcs_pixel_transform(mywcs):
+    """
+    Matrix from (east, north) offsets in degrees to (x, y) pixel offsets,
+    the inverse of the pixel scale matrix of the celestial axes of a WCS.
+
+    The matrix is cached for each WCS object, and recomputed when its PC
+    (or CD) matrix or CDELT change.
+    """
+    state = (mywcs.wcs.get_pc().tobytes(), mywcs.wcs.get_cdelt().tobytes())
+    cached = _WCS_TRANSFORMS.get(mywcs)
+    if cached is not None and cached[0] == state:
+        return cached[1]
+
+    celestial = mywcs.celestial
+    if celestial.naxis != 2:
+        raise ValueError("The WCS must have two celestial axes.")
+
+    # Order the world axes as (longitude, latitude), in degrees
+    axes = [celestial.wcs.lng, celestial.wcs.lat]
+    scales = [u.Unit(celestial.wcs.cunit[axis]).to(u.deg) for axis in axes]
+    matrix = celestial.pixel_scale_matrix[axes] * np.c_[scales]
+    transform = np.linalg.inv(matrix)
+
+    _WCS_TRANSFORMS[mywcs] = (state, transform)
+    return transform
+
+
+def _transform_gaussian(major, minor, pa, transform):
+    """
+    Standard deviations in pixels and angle in radians from the x axis of
+    beam Gaussians, from their FWHMs in degrees, position angles in radians
+    and a matrix from `_wcs_pixel_transform`.
+
+    Like `~radio_beam.utils.transform_ellipse`, the quadratic form of the
+    Gaussian is transformed, but for any linear transform of the axes (e.g.
+    rotated or skewed pixels). Works with arrays.
+    """
+    var_maj = (major / SIGMA_TO_FWHM)**2
+    var_min = (minor / SIGMA_TO_FWHM)**2
+    sinpa = np.sin(pa)
+    cospa = np.cos(pa)
+
+    # Covariance in (east, north), with the major axis at PA east of north
+    cov_ee = var_maj * sinpa**2 + var_min * cospa**2
+    cov_nn = var_maj * cospa**2 + var_min * sinpa**2
+    cov_en = (var_maj - var_min) * sinpa * cospa
+
+    (t_xe, t_xn), (t_ye, t_yn) = transform
+    var_xx = t_xe**2 * cov_ee + 2 * t_xe * t_xn * cov_en + t_xn**2 * cov_nn
+    var_yy = t_ye**2 * cov_ee + 2 * t_ye * t_yn * cov_en + t_yn**2 * cov_nn
+    var_xy = (t_xe * t_ye * cov_ee + (t_xe * t_yn + t_xn * t_ye) * cov_en +
+              t_xn * t_yn * cov_nn)
+
+    mean = (var_xx + var_yy) / 2
+    radius = np.hypot((var_xx - var_yy) / 2, var_xy)
+    stddev_maj = np.sqrt(mean + radius)
+    stddev_min = np.sqrt(np.maximum(mean - radius, 0))
+    angle = np.arctan2(2 * var_xy, var_xx - var_yy) / 2
+
+    return stddev_maj, stddev_min, angle
+
+
+def _kernel_range(size):
+    """
+    Pixel range of a kernel axis, as used by `~astropy.convolution.Kernel2D`.
+    """
+    size = int(size)
+    if size % 2 == 0:
+        return (-size // 2 + 0.5, size // 2 + 0.5)
+    return (-(size - 1) // 2, (size - 1) // 2 + 1)
+
+
+def _gaussian_coefficients(stddev_maj, stddev_min, theta):
+    """
+    Coefficients of the quadratic form a x**2 + b x y + c y**2 in the
+    exponent of a rotated Gaussian, as in
+    `~astropy.modeling.models.Gaussian2D`.
+    """
+    cost2 = np.cos(theta)**2
+    sint2 = np.sin(theta)**2
+    sin2t = np.sin(2 * theta)
+    xstd2 = stddev_maj**2
+    ystd2 = stddev_min**2
+    a = 0.5 * (cost2 / xstd2 + sint2 / ystd2)
+    b = 0.5 * (sin2t / xstd2 - sin2t / ystd2)
+    c = 0.5 * (sint2 / xstd2 + cost2 / ystd2)
+    return a, b, c
+
+
+def _integrate_gaussian(a, b, c, x_edges, y_edges, stddev_min):
+    """
+    Integrals of exp(-(a x**2 + b x y + c y**2)) over the pixels with the
+    given edges.
+
+    When the axes are aligned with the grid (b = 0), the integral is a
+    product of error function differences. Otherwise the integral along x
+    is still done with the error function, and the integral along y with
+    Gauss-Legendre quadrature in each pixel.
+    """
+    from scipy.special import erf
+
+    sqrt_a = np.sqrt(a)
+    x_norm = 0.5 * np.sqrt(np.pi / a)
+
+    if abs(b) <= 1e-14 * max(a, c):
+        y_norm = 0.5 * np.sqrt(np.pi / c)
+        x_int = x_norm * np.diff(erf(sqrt_a * x_edges))
+        y_int = y_norm * np.diff(erf(np.sqrt(c) * y_edges))
+        return np.outer(y_int, x_int)
+
+    # The integrand along y varies on the scale of the minor axis
+    npts = int(min(256, max(8, np.ceil(12. / stddev_min))))
+    nodes, weights = np.polynomial.legendre.leggauss(npts)
+
+    # Quadrature points in every pixel along y
+    y_pts = (y_edges[:-1, np.newaxis] +
+             0.5 * (nodes + 1) * np.diff(y_edges)[:, np.newaxis])
+
+    # Completing the square in x for each y
+    shift = b * y_pts / (2 * a)
+    y_part = np.exp(-(c - b**2 / (4 * a)) * y_pts**2)
+    x_part = x_norm * np.diff(erf(sqrt_a * (x_edges + shift[..., np.newaxis])),
+                              axis=-1)
+
+    return np.einsum('k,jk,jki->ji',
+                     0.5 * weights * np.diff(y_edges)[0], y_part, x_part)
+
+
+def _gaussian_truncation(stddev_x, stddev_y, x_size, y_size):
+    """
+    Fraction of the integral of a normalized Gaussian outside of a kernel
+    array of shape ``(y_size, x_size)``.
+
+    ``stddev_x`` and ``stddev_y`` are the standard deviations of the
+    marginal Gaussians along the pixel axes, i.e. the
+    `~astropy.modeling.utils.ellipse_extent` of the Gaussian. The tails of
+    the marginals are computed with the error function. The result is exact
+    for Gaussians aligned with the pixel axes, and an upper bound otherwise
+    (Sidak's inequality).
+    """
+    from scipy.special import erfc
+
+    with np.errstate(divide='ignore'):
+        tail_x = erfc(x_size / (2 * np.sqrt(2) * np.asarray(stddev_x)))
+        tail_y = erfc(y_size / (2 * np.sqrt(2) * np.asarray(stddev_y)))
+    return tail_x + tail_y - tail_x * tail_y
+
+
+def _gaussian_support(stddev_x, stddev_y, truncation):
+    """
+    Smallest odd kernel sizes ``(x_size, y_size)`` for which
+    `_gaussian_truncation` is at most ``truncation``.
+
+    The tolerance is split equally between the two axes, and the sizes
+    follow from the inverse error function.
+    """
+    from scipy.special import erfcinv
+
+    if not 0 < truncation < 1:
+        raise ValueError("truncation must be between 0 and 1.")
+
+    scale = 2 * np.sqrt(2) * erfcinv(truncation / 2)
+    return (_round_up_to_odd_integer(scale * stddev_x),
+            _round_up_to_odd_integer(scale * stddev_y))
+
+
+def _gaussian_kernel_array(stddev_maj, stddev_min, theta, x_size, y_size,
+                           mode='center', factor=10):
+    """
+    Discretize a normalized elliptical Gaussian on a kernel grid with NumPy.
+
+    The result matches `~astropy.convolution.discretize_model` applied to
+    the equivalent `~astropy.modeling.models.Gaussian2D`, without evaluating
+    the model. In 'integrate' mode the pixel integrals are computed with the
+    error function (see `_integrate_gaussian`) instead of numerical
+    integration of every pixel.
+
+    The Gaussian parameters may be arrays, giving a stack of kernels of
+    shape ``params.shape + (y_size, x_size)``.
+    """
+    if mode == 'integrate' and np.ndim(theta) > 0:
+        stddev_maj, stddev_min, theta = np.broadcast_arrays(stddev_maj,
+                                                            stddev_min, theta)
+        arrays = [_gaussian_kernel_array(*params, x_size, y_size,
+                                         mode=mode, factor=factor)
+                  for params in zip(stddev_maj.ravel(), stddev_min.ravel(),
+                                    theta.ravel())]
+        return np.reshape(arrays, theta.shape + (y_size, x_size))
+
+    a, b, c = (np.asarray(coeff)[..., np.newaxis, np.newaxis]
+               for coeff in _gaussian_coefficients(stddev_maj, stddev_min,
+                                                   theta))
+    amplitude = 1. / (2 * np.pi * np.asarray(stddev_maj * stddev_min))
+
+    x_range = _kernel_range(x_size)
+    y_range = _kernel_range(y_size)
+
+    def evaluate(x, y):
+        x = x[np.newaxis, :]
+        y = y[:, np.newaxis]
+        return (amplitude[..., np.newaxis, np.newaxis] *
+                np.exp(-(a * x**2 + b * x * y + c * y**2)))
+
+    if mode == 'center':
+        return evaluate(np.arange(*x_range), np.arange(*y_range))
+
+    elif mode == 'linear_interp':
+        values = evaluate(np.arange(x_range[0] - 0.5, x_range[1] + 0.5),
+                          np.arange(y_range[0] - 0.5, y_range[1] + 0.5))
+        values = 0.5 * (values[..., 1:, :] + values[..., :-1, :])
+        return 0.5 * (values[..., 1:] + values[..., :-1])
+
+    elif mode == 'oversample':
+        x = np.linspace(x_range[0] - 0.5 * (1 - 1 / factor),
+                        x_range[1] - 0.5 * (1 + 1 / factor),
+                        num=int((x_range[1] - x_range[0]) * factor))
+        y = np.linspace(y_range[0] - 0.5 * (1 - 1 / factor),
+                        y_range[1] - 0.5 * (1 + 1 / factor),
+                        num=int((y_range[1] - y_range[0]) * factor))
+        values = evaluate(x, y)
+        values = values.reshape(values.shape[:-2] +
+                                (y.size // factor, factor,
+                                 x.size // factor, factor))
+        return values.mean(axis=-1).mean(axis=-2)
+
+    elif mode == 'integrate':
+        x_edges = np.arange(x_range[0] - 0.5, x_range[1] + 0.5)
+        y_edges = np.arange(y_range[0] - 0.5, y_range[1] + 0.5)
+        return amplitude * _integrate_gaussian(a.item(), b.item(), c.item(),
+                                               x_edges, y_edges,
+                                               min(stddev_maj, stddev_min))
+
+    raise ValueError("Invalid mode {}. Must be one of 'center', "
+                     "'linear_interp', 'oversample' or "
+                     "'integrate'.".format(mode))
+
+
+def _gaussian_transfer_function(stddev_maj, stddev_min, theta, shape,
+                                real=True, dtype=float):
+    """
+    Fourier transform of a normalized elliptical Gaussian on the frequency
+    grid of `numpy.fft.rfft2` (``real=True``) or `numpy.fft.fft2`.
+
+    For a Gaussian with covariance matrix S, this is
+    exp(-2 pi**2 k^T S k), with k the frequencies in cycles per pixel. As in
+    `_gaussian_kernel_array`, the parameters may be arrays, giving a stack
+    of shape ``params.shape + grid shape``.
+    """
+    ny, nx = shape
+    ky = np.fft.fftfreq(ny).astype(dtype)[:, np.newaxis]
+    kx = (np.fft.rfftfreq(nx) if real else np.fft.fftfreq(nx)).astype(dtype)
+
+    var_maj = np.asarray(stddev_maj, dtype=float)**2
+    var_min = np.asarray(stddev_min, dtype=float)**2
+    cost = np.cos(theta)
+    sint = np.sin(theta)
+    coeffs = (-2 * np.pi**2 * (var_maj * cost**2 + var_min * sint**2),
+              -2 * np.pi**2 * (var_maj * sint**2 + var_min * cost**2),
+              -4 * np.pi**2 * (var_maj - var_min) * sint * cost)
+    sxx, syy, sxy = (np.asarray(coeff, dtype=dtype)[..., np.newaxis,
+                                                    np.newaxis]
+                     for coeff in coeffs)
+
+    return np.exp(sxx * kx**2 + syy * ky**2 + sxy * kx * ky)
+
+
 class EllipticalGaussian2DKernel(Kernel2D):
     """
     2D Elliptical Gaussian filter kernel.
@@ -684,6 +1093,22 @@ class EllipticalGaussian2DKernel(Kernel2D):
                 model over the bin.
     factor : number, optional
         Factor of oversampling. Default factor = 10.
+    truncation : float, optional
+        Maximum fraction of the integral of the Gaussian outside of the
+        kernel array. If given, the default x_size and y_size are the
+        smallest odd sizes that meet it, instead of using support_scaling.
+
+    Notes
+    -----
+    The kernel array is computed directly with NumPy rather than by
+    discretizing the `~astropy.modeling.models.Gaussian2D` model, and
+    matches the astropy result. The 'integrate' mode uses the error function
+    to integrate each pixel, instead of numerical integration.
+
+    The truncation of the kernel (``_truncation``) is computed analytically
+    from the tails of the Gaussian along the pixel axes, before the array.
+    It is exact for kernels aligned with the pixel axes and an upper bound
+    otherwise.
 
 
     See Also
@@ -709,14 +1134,12 @@ class EllipticalGaussian2DKernel(Kernel2D):
         plt.show()
 
     """
-    _separable = True
     _is_bool = False
 
     def __init__(self, stddev_maj, stddev_min, position_angle,
-                 support_scaling=8, **kwargs):
-        self._model = Gaussian2D(1. / (2 * np.pi * stddev_maj * stddev_min), 0,
-                                 0, x_stddev=stddev_maj, y_stddev=stddev_min,
-                                 theta=position_angle)
+                 support_scaling=8, x_size=None, y_size=None, mode='center',
+                 factor=10, truncation=None):
+        position_angle = float(np.squeeze(position_angle))
 
         try:
             from astropy.modeling.utils import ellipse_extent
@@ -724,12 +1147,43 @@ class EllipticalGaussian2DKernel(Kernel2D):
             raise NotImplementedError("EllipticalGaussian2DKernel requires"
                                       " astropy 1.1b1 or greater.")
 
-        max_extent = \
-            np.max(ellipse_extent(stddev_maj, stddev_min, position_angle))
-        self._default_size = \
-            _round_up_to_odd_integer(support_scaling * 2 * max_extent)
-        super(EllipticalGaussian2DKernel, self).__init__(**kwargs)
-        self._truncation = np.abs(1. - 1 / self._array.sum())
+        extent = ellipse_extent(stddev_maj, stddev_min, position_angle)
+        if truncation is None:
+            self._default_size = \
+                _round_up_to_odd_integer(support_scaling * 2 * np.max(extent))
+            default_y_size = None
+        else:
+            self._default_size, default_y_size = \
+                _gaussian_support(*extent, truncation)
+
+        if x_size is None:
+            x_size = self._default_size
+        elif x_size != int(x_size):
+            raise TypeError("x_size should be an integer")
+        if y_size is None:
+            y_size = x_size if default_y_size is None else default_y_size
+        elif y_size != int(y_size):
+            raise TypeError("y_size should be an integer")
+
+        self._truncation = float(_gaussian_truncation(*extent, x_size, y_size))
+
+        array = _gaussian_kernel_array(stddev_maj, stddev_min, position_angle,
+                                       x_size, y_size, mode=mode,
+                                       factor=factor)
+
+        # The array is computed directly, so skip the model discretization
+        # of Kernel2D
+        Kernel2D.__init__(self, array=array)
+
+        self._model = Gaussian2D(1. / (2 * np.pi * stddev_maj * stddev_min), 0,
+                                 0, x_stddev=stddev_maj, y_stddev=stddev_min,
+                                 theta=position_angle)
+
+        # The kernel is the outer product of two 1D Gaussians only when its
+        # axes are aligned with the pixel axes
+        a, b, c = _gaussian_coefficients(stddev_maj, stddev_min,
+                                         position_angle)
+        self._separable = bool(abs(b) <= 1e-14 * max(a, c))
 
 
 class EllipticalTophat2DKernel(Kernel2D):
@@ -817,3 +1271,12 @@ class EllipticalTophat2DKernel(Kernel2D):
             _round_up_to_odd_integer(support_scaling * 2 * max_extent)
         super(EllipticalTophat2DKernel, self).__init__(**kwargs)
         self._truncation = 0
+
+
+_KERNEL_DEFAULTS = {
+    EllipticalGaussian2DKernel: dict(support_scaling=8, x_size=None,
+                                     y_size=None, mode='center', factor=10,
+                                     truncation=None),
+    EllipticalTophat2DKernel: dict(support_scaling=1, x_size=None,
+                                   y_size=None, mode='center', factor=10),
+}
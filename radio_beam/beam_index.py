@@ -0,0 +1,452 @@
+
+import os
+import sqlite3
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from astropy import units as u
+
+from .beam import Beam, NoBeamException, FWHM_TO_AREA
+from .multiple_beams import Beams
+from .columnar import MetaColumns
+from .fits_utils import read_header_bytes, beam_params_from_header
+
+
+__all__ = ['BeamIndex']
+
+# Version of the database schema written by `BeamIndex`. Beam parameters
+# that are NaN (e.g., flagged channels) are stored as NULL.
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS info (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    nbeams INTEGER NOT NULL,
+    common_major REAL,
+    common_minor REAL,
+    common_pa REAL
+);
+CREATE TABLE IF NOT EXISTS beams (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    chan INTEGER NOT NULL,
+    pol INTEGER NOT NULL,
+    major REAL,
+    minor REAL,
+    pa REAL
+);
+CREATE INDEX IF NOT EXISTS beams_file_id ON beams (file_id);
+"""
+
+
+def _handle_error(on_error, message):
+    """
+    Re-raise the exception being handled, warn with ``message``, or do
+    nothing, for ``on_error`` of 'raise', 'warn' or 'ignore'.
+    """
+    if on_error == 'raise':
+        raise
+    if on_error == 'warn':
+        warnings.warn(message)
+
+
+def _read_file_beams(filename):
+    """
+    Channel, polarization, major, minor and PA (in degrees) arrays of the
+    beams in a FITS file: the rows of its beam table if it has one,
+    otherwise the single beam of the primary header.
+    """
+    try:
+        beams = Beams.from_fits_file(filename)
+    except KeyError:
+        params = beam_params_from_header(read_header_bytes(filename))
+        if params is None:
+            raise NoBeamException("No beam table, BMAJ keyword or CASA/AIPS"
+                                  " history found in {}.".format(filename))
+        return (np.zeros(1, dtype=int), np.zeros(1, dtype=int),
+                *(np.array([value]) for value in params))
+
+    nbeams = len(beams)
+    meta_keys = beams.meta.keys()
+    chan = (np.asarray(beams.meta.columns['CHAN']) if 'CHAN' in meta_keys
+            else np.arange(nbeams))
+    pol = (np.asarray(beams.meta.columns['POL']) if 'POL' in meta_keys
+           else np.zeros(nbeams, dtype=int))
+
+    return (chan.astype(int), pol.astype(int),
+            beams.major.to_value(u.deg), beams.minor.to_value(u.deg),
+            beams.pa.to_value(u.deg))
+
+
+def _range_mask(values, bounds, unit):
+    """
+    Mask of ``values`` (in ``unit``) within ``bounds``, a ``(low, high)``
+    tuple of Quantities where either end can be `None`. Both ends are
+    included.
+    """
+    mask = np.ones(values.shape, dtype=bool)
+    if bounds is None:
+        return mask
+
+    low, high = bounds
+    if low is not None:
+        mask &= values >= u.Quantity(low).to_value(unit)
+    if high is not None:
+        mask &= values <= u.Quantity(high).to_value(unit)
+    return mask
+
+
+class BeamIndex:
+    """
+    A persistent index of the beams of a collection of FITS files, stored
+    in a SQLite database.
+
+    For each file, the index stores the beam of every channel and
+    polarization (from the beam table extension, or the beam in the primary
+    header) and a cached common beam. Files are only re-read when their
+    modification time or size changes. Range queries on the major axis,
+    minor axis, area and position angle are evaluated on arrays of the whole
+    index.
+
+    Parameters
+    ----------
+    path : str
+        Name of the database file. It is created if it does not exist. Use
+        ``':memory:'`` for an index that is not stored.
+
+    Examples
+    --------
+    >>> index = BeamIndex('beams.sqlite')  # doctest: +SKIP
+    >>> index.update(glob.glob('*.fits'))  # doctest: +SKIP
+    >>> small = index.query_common_beams(major=(None, 2 * u.arcsec))  # doctest: +SKIP
+    >>> small.meta.columns['FILENAME']  # doctest: +SKIP
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+            row = self._conn.execute("SELECT value FROM info WHERE "
+                                     "key = 'schema_version'").fetchone()
+            if row is None:
+                self._conn.execute("INSERT INTO info VALUES "
+                                   "('schema_version', ?)",
+                                   (str(SCHEMA_VERSION),))
+            elif int(row[0]) != SCHEMA_VERSION:
+                self._conn.close()
+                raise ValueError("Unsupported schema version in "
+                                 "{}.".format(path))
+
+        self._columns = None
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def __contains__(self, filename):
+        return self._file_id(filename) is not None
+
+    @property
+    def filenames(self):
+        """
+        Absolute names of the indexed files.
+        """
+        return [row[0] for row in
+                self._conn.execute("SELECT path FROM files ORDER BY id")]
+
+    def _file_id(self, filename):
+        row = self._conn.execute("SELECT id FROM files WHERE path = ?",
+                                 (os.path.abspath(filename),)).fetchone()
+        return None if row is None else row[0]
+
+    def update(self, filenames, workers=None, on_error='warn'):
+        """
+        Add files to the index, or re-read indexed files whose modification
+        time or size has changed.
+
+        Parameters
+        ----------
+        filenames : list of str
+            Names of the FITS files.
+        workers : int, optional
+            Number of threads used to read the files. Defaults to the
+            `~concurrent.futures.ThreadPoolExecutor` default.
+        on_error : {'warn', 'raise', 'ignore'}, optional
+            What to do when a file does not exist or cannot be read. These
+            files are not indexed.
+
+        Returns
+        -------
+        updated : list of str
+            Absolute names of the files that were (re)read.
+        """
+        if on_error not in ('warn', 'raise', 'ignore'):
+            raise ValueError("on_error must be 'warn', 'raise' or 'ignore'.")
+
+        known = {path: (mtime_ns, size) for path, mtime_ns, size in
+                 self._conn.execute("SELECT path, mtime_ns, size FROM files")}
+
+        stale = []
+        for filename in filenames:
+            path = os.path.abspath(filename)
+            try:
+                stat = os.stat(path)
+            except OSError as exc:
+                _handle_error(on_error, "Could not read the beams from {0}: "
+                              "{1}".format(path, exc))
+                continue
+            if known.get(path) != (stat.st_mtime_ns, stat.st_size):
+                stale.append((path, stat))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_read_file_beams, path)
+                       for path, _ in stale]
+
+        updated = []
+        with self._conn:
+            for (path, stat), future in zip(stale, futures):
+                try:
+                    columns = future.result()
+                except Exception as exc:
+                    _handle_error(on_error, "Could not read the beams from "
+                                  "{0}: {1}".format(path, exc))
+                    continue
+
+                self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                file_id = self._conn.execute(
+                    "INSERT INTO files (path, mtime_ns, size, nbeams) "
+                    "VALUES (?, ?, ?, ?)",
+                    (path, stat.st_mtime_ns, stat.st_size,
+                     len(columns[0]))).lastrowid
+                rows = np.column_stack([np.full(len(columns[0]), file_id)] +
+                                       list(columns))
+                self._conn.executemany(
+                    "INSERT INTO beams VALUES (?, ?, ?, ?, ?, ?)",
+                    [(int(fid), int(chan), int(pol), float(major),
+                      float(minor), float(pa))
+                     for fid, chan, pol, major, minor, pa in rows])
+                updated.append(path)
+
+        if updated:
+            self._columns = None
+
+        return updated
+
+    def refresh(self, workers=None, on_error='warn'):
+        """
+        Re-read the indexed files that have changed and remove the files
+        that no longer exist.
+
+        Returns
+        -------
+        updated : list of str
+            Absolute names of the files that were re-read.
+        """
+        existing = []
+        missing = []
+        for path in self.filenames:
+            (existing if os.path.exists(path) else missing).append(path)
+
+        self.remove(missing)
+        return self.update(existing, workers=workers, on_error=on_error)
+
+    def remove(self, filenames):
+        """
+        Remove files from the index.
+        """
+        with self._conn:
+            self._conn.executemany("DELETE FROM files WHERE path = ?",
+                                   [(os.path.abspath(filename),)
+                                    for filename in filenames])
+        self._columns = None
+
+    def _load_columns(self):
+        """
+        The beam table as arrays, cached until the index changes.
+        """
+        if self._columns is None:
+            paths = dict(self._conn.execute("SELECT id, path FROM files"))
+            rows = self._conn.execute("SELECT file_id, chan, pol, major, "
+                                      "minor, pa FROM beams "
+                                      "ORDER BY file_id, rowid").fetchall()
+            table = np.array(rows, dtype=float).reshape(-1, 6)
+
+            file_ids = table[:, 0].astype(int)
+            major, minor = table[:, 3], table[:, 4]
+            self._columns = {
+                'FILENAME': np.array([paths[fid] for fid in file_ids],
+                                     dtype=str),
+                'CHAN': table[:, 1].astype(int),
+                'POL': table[:, 2].astype(int),
+                'major': major,
+                'minor': minor,
+                'pa': table[:, 5],
+                'area': major * minor * FWHM_TO_AREA * np.deg2rad(1)**2,
+            }
+        return self._columns
+
+    def beams(self, filename):
+        """
+        The indexed beams of one file, with CHAN and POL metadata.
+        """
+        file_id = self._file_id(filename)
+        if file_id is None:
+            raise KeyError("{} is not in the index.".format(filename))
+
+        rows = self._conn.execute("SELECT chan, pol, major, minor, pa FROM "
+                                  "beams WHERE file_id = ? ORDER BY rowid",
+                                  (file_id,)).fetchall()
+        chan, pol, major, minor, pa = np.array(rows, dtype=float).T
+
+        return Beams(major=major * u.deg, minor=minor * u.deg, pa=pa * u.deg,
+                     meta=MetaColumns({'CHAN': chan.astype(int),
+                                       'POL': pol.astype(int)}))
+
+    def common_beam(self, filename, **kwargs):
+        """
+        The common beam of one file, cached in the index.
+
+        Parameters
+        ----------
+        filename : str
+            Name of an indexed file.
+        kwargs : dict
+            Passed to `~radio_beam.Beams.common_beam`. The cached beam is
+            only used (and stored) when no keyword arguments are given.
+
+        Returns
+        -------
+        beam : `~radio_beam.Beam`
+        """
+        file_id = self._file_id(filename)
+        if file_id is None:
+            raise KeyError("{} is not in the index.".format(filename))
+
+        if not kwargs:
+            cached = self._conn.execute("SELECT common_major, common_minor, "
+                                        "common_pa FROM files WHERE id = ?",
+                                        (file_id,)).fetchone()
+            if cached[0] is not None:
+                return Beam(major=cached[0] * u.deg, minor=cached[1] * u.deg,
+                            pa=cached[2] * u.deg)
+
+        beams = self.beams(filename)
+        if len(beams) == 1:
+            beam = beams[0]
+        else:
+            beam = beams.common_beam(**kwargs)
+
+        if not kwargs:
+            with self._conn:
+                self._conn.execute("UPDATE files SET common_major = ?, "
+                                   "common_minor = ?, common_pa = ? "
+                                   "WHERE id = ?",
+                                   (beam.major.to_value(u.deg),
+                                    beam.minor.to_value(u.deg),
+                                    beam.pa.to_value(u.deg), file_id))
+
+        return beam
+
+    def query(self, major=None, minor=None, area=None, pa=None):
+        """
+        Find the channels whose beams are within the given ranges.
+
+        Each range is a ``(low, high)`` tuple of Quantities, where either
+        end can be `None` for an open range. Both ends are included.
+
+        Parameters
+        ----------
+        major, minor, pa : tuple of `~astropy.units.Quantity`, optional
+            Ranges of the major and minor axes, and of the position angle.
+        area : tuple of `~astropy.units.Quantity`, optional
+            Range of the beam area (solid angle).
+
+        Returns
+        -------
+        beams : `~radio_beam.Beams`
+            The matching beams, with FILENAME, CHAN and POL metadata.
+        """
+        columns = self._load_columns()
+
+        mask = (_range_mask(columns['major'], major, u.deg) &
+                _range_mask(columns['minor'], minor, u.deg) &
+                _range_mask(columns['area'], area, u.sr) &
+                _range_mask(columns['pa'], pa, u.deg))
+
+        return Beams(major=columns['major'][mask] * u.deg,
+                     minor=columns['minor'][mask] * u.deg,
+                     pa=columns['pa'][mask] * u.deg,
+                     meta=MetaColumns({key: columns[key][mask] for key in
+                                       ('FILENAME', 'CHAN', 'POL')},
+                                      length=int(mask.sum())))
+
+    def query_common_beams(self, major=None, minor=None, area=None, pa=None,
+                           on_error='warn'):
+        """
+        Find the files whose common beams are within the given ranges. See
+        `query` for the ranges. Common beams that are not cached yet are
+        computed and stored.
+
+        Parameters
+        ----------
+        on_error : {'warn', 'raise', 'ignore'}, optional
+            What to do when the common beam of a file cannot be found (e.g.,
+            when none of its beams are finite). These files are left out of
+            the results.
+
+        Returns
+        -------
+        beams : `~radio_beam.Beams`
+            The matching common beams, with FILENAME metadata.
+        """
+        if on_error not in ('warn', 'raise', 'ignore'):
+            raise ValueError("on_error must be 'warn', 'raise' or 'ignore'.")
+
+        for path, in self._conn.execute("SELECT path FROM files WHERE "
+                                        "common_major IS NULL").fetchall():
+            try:
+                self.common_beam(path)
+            except Exception as exc:
+                _handle_error(on_error, "Could not find the common beam of "
+                              "{0}: {1}".format(path, exc))
+
+        rows = self._conn.execute("SELECT path, common_major, common_minor, "
+                                  "common_pa FROM files "
+                                  "ORDER BY id").fetchall()
+        paths = np.array([row[0] for row in rows], dtype=str)
+        cmajor, cminor, cpa = np.array([row[1:] for row in rows],
+                                       dtype=float).reshape(-1, 3).T
+        carea = cmajor * cminor * FWHM_TO_AREA * np.deg2rad(1)**2
+
+        # Files without a common beam have NULL (NaN) values
+        mask = (np.isfinite(cmajor) &
+                _range_mask(cmajor, major, u.deg) &
+                _range_mask(cminor, minor, u.deg) &
+                _range_mask(carea, area, u.sr) &
+                _range_mask(cpa, pa, u.deg))
+
+        return Beams(major=cmajor[mask] * u.deg, minor=cminor[mask] * u.deg,
+                     pa=cpa[mask] * u.deg,
+                     meta=MetaColumns({'FILENAME': paths[mask]},
+                                      length=int(mask.sum())))
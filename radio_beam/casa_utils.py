@@ -0,0 +1,228 @@
+
+import os
+import struct
+
+import numpy as np
+from astropy import units as u
+
+
+__all__ = ['read_table_keywords', 'read_casa_beams']
+
+# Magic number at the start of a casacore AipsIO file
+AIPSIO_MAGIC = 0xbebebebe
+
+# casacore data type codes of fixed-size scalars, and the matching dtypes.
+# AipsIO files (e.g., table.dat) are always big-endian.
+SCALAR_DTYPES = {0: '?', 1: 'i1', 2: 'u1', 3: '>i2', 4: '>u2', 5: '>i4',
+                 6: '>u4', 7: '>f4', 8: '>f8', 9: '>c8', 10: '>c16',
+                 29: '>i8'}
+
+TP_STRING = 11
+TP_TABLE = 12
+TP_RECORD = 25
+
+# Array type codes and the type code of their elements
+ARRAY_TYPES = {13: 0, 14: 1, 15: 2, 16: 3, 17: 4, 18: 5, 19: 6, 20: 7,
+               21: 8, 22: 9, 23: 10, 24: TP_STRING, 30: 29}
+
+
+class _AipsIOReader:
+    """
+    Sequential reader of the objects in a casacore AipsIO buffer.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, fmt):
+        values = struct.unpack_from(fmt, self.data, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return values
+
+    def read_uint(self):
+        return self.unpack('>I')[0]
+
+    def read_int(self):
+        return self.unpack('>i')[0]
+
+    def read_string(self):
+        length = self.read_uint()
+        value = self.data[self.offset:self.offset + length]
+        self.offset += length
+        return value.decode('utf-8', errors='replace')
+
+    def read_values(self, type_code, count):
+        if type_code == TP_STRING:
+            return np.array([self.read_string() for _ in range(count)])
+
+        if type_code == 0:
+            # Booleans are packed as bits
+            nbytes = (count + 7) // 8
+            bits = np.frombuffer(self.data, dtype=np.uint8, count=nbytes,
+                                 offset=self.offset)
+            self.offset += nbytes
+            return np.unpackbits(bits, bitorder='little')[:count].astype(bool)
+
+        dtype = np.dtype(SCALAR_DTYPES[type_code])
+        values = np.frombuffer(self.data, dtype=dtype, count=count,
+                               offset=self.offset)
+        self.offset += count * dtype.itemsize
+        return values.astype(dtype.newbyteorder('='))
+
+    def read_object_header(self, expected_type):
+        self.read_uint()
+        object_type = self.read_string()
+        if object_type != expected_type:
+            raise ValueError("Expected a {0} object, found "
+                             "{1}.".format(expected_type, object_type))
+        return self.read_uint()
+
+    def read_iposition(self):
+        version = self.read_object_header('IPosition')
+        ndim = self.read_uint()
+        fmt = '>{0}{1}'.format(ndim, 'i' if version == 1 else 'q')
+        return self.unpack(fmt)
+
+    def read_array(self, type_code):
+        self.read_uint()
+        self.read_string()
+        version = self.read_uint()
+        ndim = self.read_uint()
+        fmt = '>{0}{1}'.format(ndim, 'i' if version < 4 else 'q')
+        shape = self.unpack(fmt)
+        count = self.read_uint()
+        values = self.read_values(type_code, count)
+        # casacore arrays are stored in Fortran order
+        return values.reshape(shape, order='F')
+
+    def read_record_desc(self):
+        self.read_object_header('RecordDesc')
+        fields = []
+        for _ in range(self.read_int()):
+            name = self.read_string()
+            type_code = self.read_int()
+            if type_code in ARRAY_TYPES:
+                self.read_iposition()
+            elif type_code == TP_RECORD:
+                self.read_record_desc()
+            elif type_code == TP_TABLE:
+                # Name of the table description
+                self.read_string()
+            # Comment
+            self.read_string()
+            fields.append((name, type_code))
+        return fields
+
+    def read_table_record(self):
+        self.read_object_header('TableRecord')
+        fields = self.read_record_desc()
+        # Fixed or variable record type
+        self.read_int()
+
+        record = {}
+        for name, type_code in fields:
+            if type_code in SCALAR_DTYPES:
+                record[name] = self.read_values(type_code, 1)[0].item()
+            elif type_code in (TP_STRING, TP_TABLE):
+                record[name] = self.read_string()
+            elif type_code == TP_RECORD:
+                record[name] = self.read_table_record()
+            elif type_code in ARRAY_TYPES:
+                record[name] = self.read_array(ARRAY_TYPES[type_code])
+            else:
+                raise ValueError("Cannot read field {0} with casacore data "
+                                 "type {1}.".format(name, type_code))
+        return record
+
+
+def read_table_keywords(tablename):
+    """
+    Read the keywords of a casacore table (e.g., a CASA image) from its
+    ``table.dat`` file, without casacore or CASA.
+
+    Parameters
+    ----------
+    tablename : str
+        Name of the table directory.
+
+    Returns
+    -------
+    keywords : dict
+        The table keywords. Sub-records are returned as dictionaries, arrays
+        as `numpy.ndarray` and sub-tables as their (relative) names.
+    """
+
+    with open(os.path.join(tablename, 'table.dat'), 'rb') as fh:
+        data = fh.read()
+
+    reader = _AipsIOReader(data)
+    if reader.read_uint() != AIPSIO_MAGIC:
+        raise ValueError("{} is not a casacore table.".format(tablename))
+
+    version = reader.read_object_header('Table')
+    # Number of rows
+    reader.read_uint()
+    if version >= 2:
+        # Endianness of the column data
+        reader.read_uint()
+    # Table type (e.g., PlainTable)
+    reader.read_string()
+
+    reader.read_object_header('TableDesc')
+    # Name, version and comment of the table description
+    for _ in range(3):
+        reader.read_string()
+
+    return reader.read_table_record()
+
+
+def _quantity_values(records, key, unit):
+    """
+    Values of the ``{'value', 'unit'}`` quantity records ``record[key]``
+    for a list of records, converted to ``unit``.
+    """
+    values = np.array([record[key]['value'] for record in records],
+                      dtype=float)
+    units = np.array([record[key]['unit'] for record in records])
+
+    for unit_name in np.unique(units):
+        values[units == unit_name] *= u.Unit(unit_name).to(unit)
+
+    return values
+
+
+def read_casa_beams(imagename):
+    """
+    Read the restoring beam(s) of a CASA image from its ``imageinfo``
+    keyword, without casacore or CASA.
+
+    Parameters
+    ----------
+    imagename : str
+        Name of the CASA image directory.
+
+    Returns
+    -------
+    params : tuple or `None`
+        Major axis, minor axis and position angle in degrees, as arrays of
+        shape ``(nchan, nstokes)``. Images with a single restoring beam give
+        arrays of shape ``(1, 1)``. `None` if the image has no beam.
+    """
+
+    imageinfo = read_table_keywords(imagename).get('imageinfo', {})
+
+    if 'perplanebeams' in imageinfo:
+        beams = imageinfo['perplanebeams']
+        shape = (int(beams['nChannels']), int(beams['nStokes']))
+        # Planes are numbered with the channel varying fastest
+        records = [beams['*{}'.format(i)] for i in range(shape[0] * shape[1])]
+    elif 'restoringbeam' in imageinfo:
+        shape = (1, 1)
+        records = [imageinfo['restoringbeam']]
+    else:
+        return None
+
+    return tuple(_quantity_values(records, key, u.deg).reshape(shape,
+                                                               order='F')
+                 for key in ('major', 'minor', 'positionangle'))
@@ -0,0 +1,356 @@
+
+import os
+import re
+import json
+import struct
+from collections.abc import Sequence
+from types import MappingProxyType
+
+import numpy as np
+
+
+__all__ = ['MetaColumns', 'LazyColumn', 'write_columns', 'read_columns',
+           'columns_to_shared_memory', 'columns_from_shared_memory']
+
+# Version of the on-disk layout written by `write_columns`
+FORMAT_VERSION = 1
+
+HEADER_NAME = 'header.json'
+
+# Names of the column files written by `write_columns`
+COLUMN_PATTERN = re.compile(r'col[0-9]+\.npy')
+
+# Byte alignment of the columns within a shared memory block
+ALIGNMENT = 64
+
+
+class MetaColumns(Sequence):
+    """
+    Per-beam metadata stored as columns.
+
+    Behaves like the list of dictionaries used for `~radio_beam.Beams.meta`,
+    but only builds a dictionary when a row is accessed. Indexing with a
+    slice or an array returns a new `MetaColumns` on the indexed columns.
+    The rows are read-only mappings, and setting a key on a row raises a
+    `TypeError`. Use `row` or `to_list` for dictionaries that can be
+    modified.
+
+    Parameters
+    ----------
+    columns : dict
+        Mapping of metadata key to an array with one value per beam.
+    length : int, optional
+        Number of beams. Only needed when there are no columns.
+    """
+
+    def __init__(self, columns, length=None):
+        self._columns = dict(columns)
+
+        lengths = {len(col) for col in self._columns.values()}
+        if length is not None:
+            lengths.add(length)
+        if len(lengths) != 1:
+            raise ValueError("All metadata columns must have the same length.")
+
+        self._length = lengths.pop()
+
+    @classmethod
+    def from_list(cls, meta):
+        """
+        Convert a list of dictionaries with the same keys into columns.
+        """
+        if isinstance(meta, cls):
+            return meta
+
+        keys = list(meta[0].keys()) if len(meta) > 0 else []
+        if any(row.keys() != meta[0].keys() for row in meta):
+            raise ValueError("All beams must have the same metadata keys to "
+                             "be stored as columns.")
+
+        return cls({key: np.asarray([row[key] for row in meta]) for key in keys},
+                   length=len(meta))
+
+    @property
+    def columns(self):
+        return self._columns
+
+    def keys(self):
+        return self._columns.keys()
+
+    def __len__(self):
+        return self._length
+
+    def row(self, index):
+        """
+        A new dictionary with the metadata of one beam. Changes made to it
+        are not stored in the columns.
+        """
+        if not -self._length <= index < self._length:
+            raise IndexError("index {} is out of range".format(index))
+        return {key: col[index] for key, col in self._columns.items()}
+
+    def to_list(self):
+        """
+        The metadata as a new list of dictionaries.
+        """
+        return [self.row(i) for i in range(self._length)]
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return MappingProxyType(self.row(item))
+
+        if isinstance(item, slice):
+            length = len(range(*item.indices(self._length)))
+        else:
+            item = np.asarray(item)
+            if item.dtype.kind == 'b':
+                item = np.flatnonzero(item)
+            length = len(item)
+
+        return MetaColumns({key: col[item] for key, col in self._columns.items()},
+                           length=length)
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self[i]
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or len(other) != len(self):
+            return False
+        return all(row == other_row for row, other_row in zip(self, other))
+
+    def __repr__(self):
+        return "MetaColumns(keys={0}, length={1})".format(list(self.keys()),
+                                                          len(self))
+
+
+class LazyColumn:
+    """
+    A named column of a table (e.g., a `~astropy.io.fits.FITS_rec`) that is
+    only read when its values are first needed.
+
+    Slicing returns another `LazyColumn` on the sliced table, so the column is
+    not read by slicing alone.
+
+    Parameters
+    ----------
+    table : table-like
+        Table that returns the column when indexed with ``name``.
+    name : str
+        Name of the column.
+    """
+
+    def __init__(self, table, name):
+        self._table = table
+        self._name = name
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self._table[self._name]
+        return self._data
+
+    def __len__(self):
+        return len(self._table)
+
+    def __getitem__(self, item):
+        if self._data is None and not isinstance(item, (int, np.integer)):
+            return LazyColumn(self._table[item], self._name)
+        return self.data[item]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.data, dtype=dtype)
+
+
+def _check_column(name, column):
+    arr = np.asarray(column)
+    if arr.dtype.kind == 'O':
+        raise TypeError("Column {} cannot be stored: only numeric, boolean"
+                        " and string columns are supported.".format(name))
+    return arr
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_columns(path, columns, header, overwrite=False):
+    """
+    Write a set of equal-length arrays as a directory of ``.npy`` files.
+
+    Parameters
+    ----------
+    path : str
+        Output directory.
+    columns : dict
+        Mapping of column name to array. Object arrays are not supported.
+    header : dict
+        JSON-serializable information stored alongside the columns.
+    overwrite : bool, optional
+        Replace the columns in an existing directory. Column files of an
+        earlier save that are not replaced are removed.
+    """
+
+    if os.path.exists(path) and not overwrite:
+        raise OSError("{} already exists. Set overwrite=True to "
+                      "replace it.".format(path))
+
+    os.makedirs(path, exist_ok=True)
+
+    names = list(columns.keys())
+    filenames = ["col{}.npy".format(i) for i in range(len(names))]
+
+    for filename, name in zip(filenames, names):
+        arr = _check_column(name, columns[name])
+        np.save(os.path.join(path, filename), arr, allow_pickle=False)
+
+    header = dict(header)
+    header['format_version'] = FORMAT_VERSION
+    header['columns'] = dict(zip(names, filenames))
+
+    with open(os.path.join(path, HEADER_NAME), 'w') as fh:
+        json.dump(header, fh, indent=1)
+
+    # Remove the columns of an earlier save that are not in the header
+    for filename in os.listdir(path):
+        if (COLUMN_PATTERN.fullmatch(filename) and
+                filename not in filenames):
+            os.remove(os.path.join(path, filename))
+
+
+def read_columns(path, mmap_mode='r'):
+    """
+    Read columns written by `write_columns`.
+
+    Parameters
+    ----------
+    path : str
+        Directory with the columns.
+    mmap_mode : {None, 'r', 'r+', 'c'}, optional
+        Memory-map the columns rather than reading them into memory. See
+        `numpy.load`.
+
+    Returns
+    -------
+    columns : dict
+        Mapping of column name to (memory-mapped) array.
+    header : dict
+        The information stored with the columns.
+    """
+
+    with open(os.path.join(path, HEADER_NAME)) as fh:
+        header = json.load(fh)
+
+    if header.get('format_version', None) != FORMAT_VERSION:
+        raise ValueError("Unsupported format version in {}.".format(path))
+
+    columns = {name: np.load(os.path.join(path, filename),
+                             mmap_mode=mmap_mode, allow_pickle=False)
+               for name, filename in header.pop('columns').items()}
+
+    return columns, header
+
+
+def columns_to_shared_memory(columns, header):
+    """
+    Copy a set of arrays into a new shared memory block.
+
+    The block starts with the length of a JSON header (8-byte little-endian
+    integer) followed by the header, which records the dtype, shape and
+    offset of each column. Columns are aligned to 64 bytes.
+
+    Parameters
+    ----------
+    columns : dict
+        Mapping of column name to array. Object arrays are not supported.
+    header : dict
+        JSON-serializable information stored alongside the columns.
+
+    Returns
+    -------
+    shm : `~multiprocessing.shared_memory.SharedMemory`
+        The new block. The caller owns it and must ``close`` and
+        ``unlink`` it when finished.
+    """
+    from multiprocessing.shared_memory import SharedMemory
+
+    columns = {name: np.ascontiguousarray(_check_column(name, col))
+               for name, col in columns.items()}
+
+    layout = {}
+    data_size = 0
+    for name, col in columns.items():
+        data_size = _align(data_size)
+        layout[name] = {'dtype': col.dtype.str,
+                        'shape': list(col.shape),
+                        'offset': data_size}
+        data_size += col.nbytes
+
+    header = dict(header)
+    header['format_version'] = FORMAT_VERSION
+    header['columns'] = layout
+    header_bytes = json.dumps(header).encode('utf-8')
+
+    data_start = _align(8 + len(header_bytes))
+
+    shm = SharedMemory(create=True, size=data_start + _align(data_size))
+    shm.buf[:8] = struct.pack('<Q', len(header_bytes))
+    shm.buf[8:8 + len(header_bytes)] = header_bytes
+
+    for name, col in columns.items():
+        dest = np.ndarray(col.shape, dtype=col.dtype, buffer=shm.buf,
+                          offset=data_start + layout[name]['offset'])
+        dest[...] = col
+        # Drop the export of the buffer so the block can be closed
+        del dest
+
+    return shm
+
+
+def columns_from_shared_memory(name):
+    """
+    Attach to a shared memory block written by `columns_to_shared_memory`.
+
+    Parameters
+    ----------
+    name : str
+        Name of the shared memory block.
+
+    Returns
+    -------
+    columns : dict
+        Mapping of column name to a read-only array backed by the block.
+    header : dict
+        The information stored with the columns.
+    shm : `~multiprocessing.shared_memory.SharedMemory`
+        The attached block, which must be kept alive as long as the columns
+        are used.
+    """
+    from multiprocessing.shared_memory import SharedMemory
+
+    try:
+        # The creating process owns the block; don't let the resource
+        # tracker of an attaching worker unlink it on exit (python>=3.13)
+        shm = SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = SharedMemory(name=name)
+
+    header_len = struct.unpack('<Q', bytes(shm.buf[:8]))[0]
+    header = json.loads(bytes(shm.buf[8:8 + header_len]).decode('utf-8'))
+
+    if header.get('format_version', None) != FORMAT_VERSION:
+        raise ValueError("Unsupported format version in {}.".format(name))
+
+    data_start = _align(8 + header_len)
+
+    columns = {}
+    for col_name, col_layout in header.pop('columns').items():
+        col = np.ndarray(tuple(col_layout['shape']),
+                         dtype=np.dtype(col_layout['dtype']),
+                         buffer=shm.buf,
+                         offset=data_start + col_layout['offset'])
+        col.flags.writeable = False
+        columns[col_name] = col
+
+    return columns, header, shm
@@ -10,7 +10,7 @@ except ImportError:
     HAS_SCIPY = False
 
 from .beam import Beam
-from .utils import BeamError, transform_ellipse, deconvolve_optimized
+from .utils import BeamError, transform_ellipse, deconvolve_vectorized
 
 __all__ = ['commonbeam', 'common_2beams', 'getMinVolEllipse',
            'common_manybeams_mve', 'find_commonbeam_between']
@@ -376,33 +376,29 @@ def fits_in_largest(beams, large_beam=None):
     # This is the same limit used for checking equal beams in Beam.__eq__
     atol_limit = 1e-12
 
-    for major, minor, pa in zip(majors, minors, pas):
+    equal = ((np.abs(large_hdr_keywords['BMAJ'] - majors) < atol_limit) &
+             (np.abs(large_hdr_keywords['BMIN'] - minors) < atol_limit))
 
-        equal = abs(large_hdr_keywords['BMAJ'] - major) < atol_limit
-        equal = equal and (abs(large_hdr_keywords['BMIN'] - minor) < atol_limit)
+    # Check if the beam is circular
+    # This checks for fractional changes below 1e-6 between the major and minor.
+    # Same limit used in Beam.__eq__
+    with np.errstate(invalid='ignore', divide='ignore'):
+        iscircular = (majors - minors) / minors < 1e-6
 
-        # Check if the beam is circular
-        # This checks for fractional changes below 1e-6 between the major and minor.
-        # Same limit used in Beam.__eq__
-        iscircular = (major - minor) / minor < 1e-6
+    # position angle only matters if the beam is asymmetric
+    equal_pa = np.abs((large_hdr_keywords['BPA'] % np.pi) - (pas % np.pi)) < atol_limit
+    equal &= iscircular | equal_pa
 
-        # position angle only matters if the beam is asymmetric
-        if not iscircular:
-            equal = equal and (abs(((large_hdr_keywords['BPA'] % np.pi) - (pa % np.pi))) < atol_limit)
-
-        if equal:
-            continue
-
-        out = deconvolve_optimized(large_hdr_keywords,
-                                   {'BMAJ': major,
-                                    'BMIN': minor,
-                                    'BPA': pa},
-                                   failure_returns_pointlike=True)
+    if equal.all():
+        return True
 
-        if np.any([ax == 0. for ax in out[:2]]):
-            return False
+    out = deconvolve_vectorized(large_hdr_keywords,
+                                {'BMAJ': majors[~equal],
+                                 'BMIN': minors[~equal],
+                                 'BPA': pas[~equal]},
+                                failure_returns_pointlike=True)
 
-    return True
+    return not np.any((out[0] == 0.) | (out[1] == 0.))
 
 
 def getMinVolEllipse(P, tolerance=1e-5, maxiter=1e5):
@@ -503,8 +499,9 @@ def ellipse_edges(beam, npts=300, epsilon=1e-3):
 
     Parameters
     ----------
-    beam : `~radio_beam.Beam`
-        Beam object.
+    beam : `~radio_beam.Beam` or `~radio_beam.Beams`
+        Beam object. For a `~radio_beam.Beams` object, the edge points of
+        all beams are returned together, ordered by beam.
     npts : int, optional
         Number of samples.
     epsilon : float
@@ -518,9 +515,9 @@ def ellipse_edges(beam, npts=300, epsilon=1e-3):
         The x, y coordinates of the ellipse edge.
     """
 
-    bpa = beam.pa.to(u.rad).value
-    major = beam.major.to(u.deg).value * (1. + epsilon)
-    minor = beam.minor.to(u.deg).value * (1. + epsilon)
+    bpa = np.atleast_1d(beam.pa.to_value(u.rad))[:, np.newaxis]
+    major = np.atleast_1d(beam.major.to_value(u.deg))[:, np.newaxis] * (1. + epsilon)
+    minor = np.atleast_1d(beam.minor.to_value(u.deg))[:, np.newaxis] * (1. + epsilon)
 
     phi = np.linspace(0, 2 * np.pi, npts)
 
@@ -530,7 +527,7 @@ def ellipse_edges(beam, npts=300, epsilon=1e-3):
     xr = x * np.cos(bpa) - y * np.sin(bpa)
     yr = x * np.sin(bpa) + y * np.cos(bpa)
 
-    pts = np.vstack([xr, yr])
+    pts = np.vstack([xr.ravel(), yr.ravel()])
     return pts
 
 
@@ -582,12 +579,7 @@ def common_manybeams_mve(beams, tolerance=1e-4, nsamps=200,
     step = 1
 
     while True:
-        pts = []
-
-        for beam in beams:
-            pts.append(ellipse_edges(beam, nsamps, epsilon=epsilon))
-
-        all_pts = np.hstack(pts).T
+        all_pts = ellipse_edges(beams, nsamps, epsilon=epsilon).T
 
         # Now find the outer edges of the convex hull.
         hull = ConvexHull(all_pts)
@@ -0,0 +1,808 @@
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from astropy import units as u
+from astropy.io import fits
+from astropy.wcs import WCS
+
+from .beam import (Beam, SIGMA_TO_FWHM, _gaussian_transfer_function,
+                   mywcs_to_platescale)
+from .fits_utils import BLOCK_LENGTH
+from .utils import BeamError, deconvolve_vectorized
+
+
+__all__ = ['convolve_cube', 'convolve_fits_cube', 'convolve_image']
+
+# Convolution kernels whose parameters (in pixels and radians) agree to this
+# many decimals share the same transfer function
+GROUP_DECIMALS = 10
+
+# FFT-friendly tile sizes: the 5-smooth numbers up to 2**16
+FFT_SIZES = np.unique([2**i * 3**j * 5**k
+                       for i in range(17) for j in range(11) for k in range(7)
+                       if 2**i * 3**j * 5**k <= 2**16])
+
+# The default FFT size of the tiles is at least MIN_TILE_SIZE, and at least
+# TILE_OVERLAP_FACTOR times the overlap between tiles
+MIN_TILE_SIZE = 512
+TILE_OVERLAP_FACTOR = 4
+
+
+def _kernel_pad(stddev_maj, stddev_min, angle, support_scaling):
+    """
+    Half-size ``(pad_y, pad_x)`` in pixels of the largest of the kernels,
+    with the support of `~radio_beam.Beam.as_kernel`.
+    """
+    from astropy.modeling.utils import ellipse_extent
+
+    if np.size(angle) == 0:
+        return (0, 0)
+    extent = np.reshape(ellipse_extent(stddev_maj, stddev_min, angle), (2, -1))
+    extent_x, extent_y = np.nanmax(extent, axis=1)
+    return (int(np.ceil(support_scaling * extent_y)),
+            int(np.ceil(support_scaling * extent_x)))
+
+
+class _PlaneConvolver:
+    """
+    FFT convolution of 2D planes of a fixed shape with Gaussian transfer
+    functions.
+
+    The planes are zero-padded by ``pad`` pixels to avoid wrapping around
+    the edges, to a size that is fast for `scipy.fft`. Every thread reuses
+    its own padded buffer, and `scipy.fft` reuses its plans for the fixed
+    shape. NaNs are interpolated over by normalizing with the convolved
+    weights of the finite pixels, and kept in the output.
+    """
+
+    def __init__(self, shape, pad, dtype=float):
+        from scipy import fft
+
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.fft_shape = tuple(fft.next_fast_len(size + 2 * width, real=True)
+                               for size, width in zip(self.shape, pad))
+        self._local = threading.local()
+
+    def transfer_function(self, stddev_maj, stddev_min, angle):
+        return _gaussian_transfer_function(stddev_maj, stddev_min, angle,
+                                           self.fft_shape, dtype=self.dtype)
+
+    def _buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            # Only the plane region is written, so the padding stays zero
+            buffer = np.zeros(self.fft_shape, dtype=self.dtype)
+            self._local.buffer = buffer
+        return buffer
+
+    def _convolve_buffer(self, kernel_ft, shape):
+        from scipy import fft
+
+        spectrum = fft.rfft2(self._buffer())
+        spectrum *= kernel_ft
+        result = fft.irfft2(spectrum, s=self.fft_shape, overwrite_x=True)
+        return result[:shape[0], :shape[1]]
+
+    def convolve(self, plane, kernel_ft, out):
+        """
+        Convolve ``plane`` with the transfer function ``kernel_ft``, writing
+        the result to ``out``.
+
+        The plane may be smaller than ``shape``, e.g. a tile at the edge of
+        an image, and is then zero-padded to the FFT shape.
+        """
+        shape = np.shape(plane)
+        buffer = self._buffer()
+        if shape != self.shape:
+            buffer[...] = 0
+        region = buffer[:shape[0], :shape[1]]
+        region[...] = plane
+
+        finite = np.isfinite(region)
+        if finite.all():
+            out[...] = self._convolve_buffer(kernel_ft, shape)
+            return out
+
+        region[~finite] = 0
+        result = self._convolve_buffer(kernel_ft, shape)
+        # The kernel sums to one, so the weight of the finite pixels is one
+        # minus the convolved mask of the NaNs. The zero-padding counts as
+        # finite, so the edges are not renormalized.
+        region[...] = ~finite
+        weight = 1 - self._convolve_buffer(kernel_ft, shape)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result /= weight
+        result[~finite] = np.nan
+        out[...] = result
+        return out
+
+
+class _CubeConvolution:
+    """
+    Convolution of the planes of a cube from their beams to a target beam.
+
+    The convolution beams of all planes are found with one vectorized
+    deconvolution, and the planes with the same convolution beam are
+    grouped, so that they share a transfer function.
+
+    Parameters
+    ----------
+    beams : `~radio_beam.Beams`
+        Beams of the planes. Planes are numbered by their flat index.
+    target : `~radio_beam.Beam`
+        Beam to convolve to.
+    pixscale : `~astropy.units.Quantity`
+        Conversion from angular to pixel size.
+    plane_shape : tuple of int
+        Shape ``(ny, nx)`` of the planes.
+    dtype : data-type
+        Float type of the convolution.
+    support_scaling : int
+        Sets the zero-padding of the planes.
+    per_beam : bool
+        Rescale the data by the ratio of the beam areas, for data in
+        Jy/beam.
+    """
+
+    def __init__(self, beams, target, pixscale, plane_shape, dtype,
+                 support_scaling=8, per_beam=False):
+        conv_major, conv_minor, conv_pa = \
+            deconvolve_vectorized(target.to_header_keywords(),
+                                  beams._beamprops(),
+                                  failure_returns_pointlike=True)
+
+        finite = beams.isfinite
+        same = beams.isclose(target) & finite
+        failed = finite & ~same & (conv_major == 0)
+        if failed.any():
+            if failed.ndim == 1:
+                planes = np.flatnonzero(failed).tolist()
+            else:
+                planes = [tuple(index)
+                          for index in np.argwhere(failed).tolist()]
+            raise BeamError("The beams of planes {} cannot be deconvolved "
+                            "from the target beam.".format(planes))
+
+        self.scale = None
+        if per_beam:
+            self.scale = (target.sr / beams.sr).to_value(
+                u.dimensionless_unscaled).ravel()
+
+        pixscale = pixscale.to_value(u.deg)
+        stddev_maj = conv_major / (pixscale * SIGMA_TO_FWHM)
+        stddev_min = conv_minor / (pixscale * SIGMA_TO_FWHM)
+        # PA is from north, and the kernel angle from west
+        angle = conv_pa + np.pi / 2
+
+        # Group the planes with the same convolution kernel. Planes at the
+        # target beam are in group -1, and planes without a beam in group -2
+        convolved = np.flatnonzero(finite & ~same)
+        self.params = np.stack([stddev_maj.ravel()[convolved],
+                                stddev_min.ravel()[convolved],
+                                np.mod(angle.ravel()[convolved], np.pi)],
+                               axis=-1)
+        _, self.first, group = np.unique(np.round(self.params,
+                                                  GROUP_DECIMALS),
+                                         axis=0, return_index=True,
+                                         return_inverse=True)
+        self.group = np.where(finite, -1, -2).ravel()
+        self.group[convolved] = group.ravel()
+        self.ngroups = self.first.size
+
+        self.convolver = _PlaneConvolver(plane_shape,
+                                         _kernel_pad(*self.params.T,
+                                                     support_scaling),
+                                         dtype=dtype)
+
+        # Transfer functions in use, with the number of planes of each
+        # group left to convolve
+        self._lock = threading.Lock()
+        self._kernels = {}
+        self._remaining = np.bincount(group.ravel(), minlength=self.ngroups)
+
+    def transfer_function(self, group):
+        return self.convolver.transfer_function(
+            *self.params[self.first[group]])
+
+    def _acquire(self, group):
+        """
+        Transfer function of a group, computed once by the first thread
+        that needs it.
+        """
+        with self._lock:
+            entry = self._kernels.setdefault(group, [None, threading.Lock()])
+        with entry[1]:
+            if entry[0] is None:
+                entry[0] = self.transfer_function(group)
+        return entry[0]
+
+    def _release(self, group):
+        """
+        Drop the transfer function of a group after its last plane.
+        """
+        with self._lock:
+            self._remaining[group] -= 1
+            if self._remaining[group] <= 0:
+                self._kernels.pop(group, None)
+
+    def convolve_planes(self, indices, planes, out):
+        """
+        Convolve the planes with flat indices ``indices``, writing the
+        results to the matching planes of ``out``.
+
+        Planes can be convolved by several threads at once. Each transfer
+        function is shared by the planes of its group, and released after
+        the last of them.
+        """
+        for i, index in enumerate(indices):
+            group = self.group[index]
+            if group == -2:
+                out[i][...] = np.nan
+            elif group == -1:
+                out[i][...] = planes[i]
+            else:
+                try:
+                    self.convolver.convolve(planes[i], self._acquire(group),
+                                            out[i])
+                finally:
+                    self._release(group)
+                if self.scale is not None:
+                    out[i] *= self.scale[index]
+
+        return out
+
+
+def _is_per_beam(unit):
+    return unit is not None and unit.is_equivalent(u.Jy / u.beam)
+
+
+def convolve_cube(data, beams, target, pixscale, workers=None,
+                  support_scaling=8, out=None):
+    """
+    Convolve every plane of a cube from its beam to a target beam.
+
+    The convolution beams of all planes are found with one vectorized
+    deconvolution. Planes already at the target beam are copied, and planes
+    with the same convolution beam share a transfer function, which is
+    evaluated analytically (see `~radio_beam.Beam.as_fourier_kernel`). The
+    planes are convolved in parallel in a pool of threads.
+
+    Parameters
+    ----------
+    data : `~numpy.ndarray` or `~astropy.units.Quantity`
+        Cube of shape ``beams.shape + (ny, nx)``. Data in Jy/beam are
+        rescaled by the ratio of the beam areas.
+    beams : `~radio_beam.Beams`
+        Beams of the planes.
+    target : `~radio_beam.Beam`
+        Beam to convolve to, e.g. ``beams.common_beam()``.
+    pixscale : `~astropy.units.Quantity`
+        Conversion from angular to pixel size.
+    workers : int, optional
+        Number of threads. Defaults to the `~concurrent.futures` default.
+    support_scaling : int, optional
+        The planes are zero-padded by the half-size of the largest
+        convolution kernel for this support scaling (see
+        `~radio_beam.EllipticalGaussian2DKernel`).
+    out : `~numpy.ndarray`, optional
+        Output array of the same shape as ``data``, e.g. a memory-mapped
+        file. By default, a new float array is returned.
+
+    Returns
+    -------
+    out : `~numpy.ndarray` or `~astropy.units.Quantity`
+        The convolved cube. NaNs in the data are interpolated over and kept,
+        and planes with beams that are not finite are set to NaN.
+
+    See Also
+    --------
+    convolve_fits_cube : Convolution of cubes that do not fit in memory.
+    """
+    if np.ndim(data) < 3 or np.shape(data)[:-2] != beams.shape:
+        raise ValueError("The data must have shape beams.shape + (ny, nx), "
+                         "{0} + (ny, nx).".format(beams.shape))
+
+    unit = None
+    if isinstance(data, u.Quantity):
+        unit = data.unit
+        data = data.value
+    data = np.asanyarray(data)
+
+    if out is None:
+        out = np.empty(np.shape(data),
+                       dtype=np.result_type(data.dtype, np.float32))
+    elif np.shape(out) != np.shape(data):
+        raise ValueError("out must have the same shape as the data.")
+
+    plan = _CubeConvolution(beams, target, pixscale, np.shape(data)[-2:],
+                            out.dtype.newbyteorder('='),
+                            support_scaling=support_scaling,
+                            per_beam=_is_per_beam(unit))
+
+    def convolve_plane(index):
+        i = np.unravel_index(index, beams.shape)
+        plan.convolve_planes([index], [data[i]], [out[i]])
+
+    # One task per plane, ordered by group, so that few transfer functions
+    # are in memory at once
+    order = np.argsort(plan.group, kind='stable')
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Iterate over the results to raise any errors
+        list(executor.map(convolve_plane, order))
+
+    if unit is not None:
+        return u.Quantity(out, unit, copy=False)
+    return out
+
+
+def _read_plane_beams(filename, header, shape):
+    """
+    Beams of the planes of a FITS cube in the order of the data, from the
+    beam table, or from the header if there is no table.
+    """
+    from .multiple_beams import Beams
+
+    nplanes = int(np.prod(shape[:-2]))
+
+    try:
+        beams = Beams.from_fits_file(filename)
+    except KeyError:
+        beam = Beam.from_fits_header(header)
+        return Beams(major=np.repeat(beam.major.value, nplanes) *
+                     beam.major.unit,
+                     minor=np.repeat(beam.minor.value, nplanes) *
+                     beam.minor.unit,
+                     pa=np.repeat(beam.pa.value, nplanes) * beam.pa.unit)
+
+    if len(shape) == 4 and shape[0] > 1:
+        # The data are ordered by (stokes, channel), and the beams by
+        # (channel, polarization)
+        nchan, npol = shape[1], shape[0]
+        order = np.arange(nchan * npol).reshape(nchan, npol).T.ravel()
+        return beams.by_polarization().ravel()[order]
+
+    return beams
+
+
+def _output_header(header, shape, dtype, target):
+    """
+    Primary header of the convolved cube, with the target beam.
+    """
+    out_header = fits.PrimaryHDU(data=np.zeros((1,) * len(shape),
+                                               dtype=dtype)).header
+    for axis, size in enumerate(shape[::-1], start=1):
+        out_header['NAXIS{}'.format(axis)] = size
+
+    cards = header.copy(strip=True)
+    # The output has a single beam, and no scaling
+    for key in ('BLANK', 'CASAMBM', 'EXTNAME'):
+        cards.remove(key, ignore_missing=True)
+    out_header.extend(cards)
+
+    return target.attach_to_header(out_header, copy=False)
+
+
+def _allocate_fits(filename, header, shape, dtype, overwrite=False):
+    """
+    Write ``header`` and a zero-filled data unit to a new FITS file, and
+    return the data as a writable memory map.
+    """
+    if os.path.exists(filename) and not overwrite:
+        raise OSError("File {} already exists.".format(filename))
+
+    header_bytes = header.tostring().encode('ascii')
+    dtype = np.dtype(dtype).newbyteorder('>')
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    nbytes = -(-nbytes // BLOCK_LENGTH) * BLOCK_LENGTH
+
+    with open(filename, 'wb') as fh:
+        fh.write(header_bytes)
+        # Extend the file without writing the data, which are zero
+        fh.truncate(len(header_bytes) + nbytes)
+
+    return np.memmap(filename, dtype=dtype, mode='r+',
+                     offset=len(header_bytes), shape=shape)
+
+
+def convolve_fits_cube(filename, output, target=None, beams=None, ext=0,
+                       block_size=1, workers=None, max_pending=None,
+                       support_scaling=8, overwrite=False):
+    """
+    Convolve every plane of a FITS cube to a target beam, without loading
+    the cube into memory.
+
+    The cube is memory-mapped and read in blocks of planes, which are
+    convolved in a pool of threads (see `convolve_cube`) while the next
+    blocks are read and the finished blocks are written to a preallocated
+    output file. At most ``max_pending`` blocks are in memory at once.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the FITS file of the cube.
+    output : str
+        Name of the output FITS file. The header is that of the input, with
+        the target beam keywords.
+    target : `~radio_beam.Beam`, optional
+        Beam to convolve to. Defaults to the common beam of the planes.
+    beams : `~radio_beam.Beams`, optional
+        Beams of the planes, in the order of the data. By default, the
+        beams are read from the 'BEAMS' table of the file, or from the
+        header if there is no table.
+    ext : int or str, optional
+        Extension of the cube.
+    block_size : int, optional
+        Number of planes read and convolved together.
+    workers : int, optional
+        Number of threads for the convolution. Defaults to the number of
+        CPUs.
+    max_pending : int, optional
+        Maximum number of blocks being read, convolved or written at once.
+        Defaults to twice the number of workers.
+    support_scaling : int, optional
+        Sets the zero-padding of the planes.
+    overwrite : bool, optional
+        Overwrite an existing output file.
+
+    Returns
+    -------
+    target : `~radio_beam.Beam`
+        The beam of the output cube.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * workers
+
+    with fits.open(filename, memmap=True,
+                   do_not_scale_image_data=True) as hdulist:
+        hdu = hdulist[ext]
+        header = hdu.header
+        shape = hdu.shape
+
+        if len(shape) < 3:
+            raise ValueError("The data must have at least three dimensions.")
+        nplanes = int(np.prod(shape[:-2]))
+
+        if beams is None:
+            beams = _read_plane_beams(filename, header, shape)
+        if beams.size != nplanes:
+            raise ValueError("The number of beams ({0}) does not match the "
+                             "number of planes ({1})."
+                             .format(beams.size, nplanes))
+        beams = beams.ravel()
+
+        if target is None:
+            target = beams.common_beam()
+
+        pixscale = mywcs_to_platescale(WCS(header).celestial) * u.deg
+
+        bscale = header.get('BSCALE', 1)
+        bzero = header.get('BZERO', 0)
+        blank = header.get('BLANK') if header['BITPIX'] > 0 else None
+        dtype = np.float64 if header['BITPIX'] in (-64, 32, 64) else np.float32
+
+        unit = None
+        if 'BUNIT' in header:
+            unit = u.Unit(header['BUNIT'], parse_strict='silent')
+
+        plan = _CubeConvolution(beams, target, pixscale, shape[-2:], dtype,
+                                support_scaling=support_scaling,
+                                per_beam=_is_per_beam(unit))
+
+        data = hdu.data.reshape((nplanes,) + shape[-2:])
+        out = _allocate_fits(output, _output_header(header, shape, dtype,
+                                                    target),
+                             (nplanes,) + shape[-2:], dtype,
+                             overwrite=overwrite)
+
+        def read_block(start):
+            raw = data[start:start + block_size]
+            block = np.array(raw, dtype=dtype)
+            if blank is not None:
+                block[raw == blank] = np.nan
+            if bscale != 1 or bzero != 0:
+                block *= bscale
+                block += bzero
+            return block
+
+        def convolve_block(start, block):
+            indices = np.arange(start, start + len(block))
+            return plan.convolve_planes(indices, block, np.empty_like(block))
+
+        def write_block(start, future):
+            result = future.result()
+            out[start:start + len(result)] = result
+
+        # Read and write in this thread, while the pending blocks are
+        # convolved
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, nplanes, block_size):
+                pending.append((start,
+                                executor.submit(convolve_block, start,
+                                                read_block(start))))
+                while len(pending) >= max_pending:
+                    write_block(*pending.popleft())
+
+            while pending:
+                write_block(*pending.popleft())
+
+        out.flush()
+
+    return target
+
+
+def _fft_size(minimum):
+    """
+    Smallest size in `FFT_SIZES` of at least ``minimum``.
+    """
+    if minimum > FFT_SIZES[-1]:
+        raise ValueError("No FFT size of at least {} in the size "
+                         "table.".format(minimum))
+    return int(FFT_SIZES[np.searchsorted(FFT_SIZES, minimum)])
+
+
+def _tile_shape(shape, pad, tile_size=None):
+    """
+    FFT shape of the tiles of an image for a kernel half-size ``pad``.
+    """
+    if tile_size is None:
+        # Tiles larger than the padded image are not needed
+        return tuple(min(_fft_size(max(MIN_TILE_SIZE,
+                                       TILE_OVERLAP_FACTOR * 2 * width)),
+                         _fft_size(size + 2 * width))
+                     for size, width in zip(shape, pad))
+
+    tile_shape = tuple(np.broadcast_to(tile_size, (2,)).tolist())
+    if any(size <= 2 * width for size, width in zip(tile_shape, pad)):
+        raise ValueError("The tile size {0} must be larger than the overlap "
+                         "{1} between tiles.".format(tile_size,
+                                                     tuple(2 * width
+                                                           for width in pad)))
+    return tile_shape
+
+
+def _gaussian_pass(data, stddev, axis, shifts=None, workers=None):
+    """
+    One FFT-based 1-D pass along ``axis`` (-1 or -2): convolve with a
+    Gaussian of standard deviation ``stddev``, and shift the rows along x by
+    ``shifts`` pixels.
+    """
+    from scipy import fft
+
+    size = data.shape[axis]
+    freq = fft.rfftfreq(size)
+    transfer = np.exp(-2 * np.pi**2 * stddev**2 * freq**2)
+    if axis == -2:
+        transfer = transfer[:, np.newaxis]
+    if shifts is not None:
+        transfer = transfer * np.exp(-2j * np.pi * shifts[:, np.newaxis] *
+                                     freq)
+
+    spectrum = fft.rfft(data, axis=axis, workers=workers)
+    spectrum *= transfer
+    return fft.irfft(spectrum, n=size, axis=axis, overwrite_x=True,
+                     workers=workers)
+
+
+def _separable_gaussian(data, stddev_maj, stddev_min, angle,
+                        support_scaling=8, workers=None):
+    """
+    Convolve zero-padded images ``data[..., ny, nx]`` with a rotated
+    elliptical Gaussian as a sequence of 1-D passes.
+
+    The covariance S of the Gaussian is split into a Gaussian along x and a
+    Gaussian along the sheared line ``(mu, 1)``, with ``mu = Sxy / Syy``.
+    The line pass is a pass along y of the image with each row shifted by
+    ``-mu * y``, which is then shifted back. When ``|Sxy| > Syy`` the roles
+    of x and y are swapped, so that ``|mu| <= 1``. Each pass is a 1-D FFT,
+    so the cost does not depend on the size of the beam.
+    """
+    from scipy import fft
+
+    cost = np.cos(angle)
+    sint = np.sin(angle)
+    var_xx = stddev_maj**2 * cost**2 + stddev_min**2 * sint**2
+    var_yy = stddev_maj**2 * sint**2 + stddev_min**2 * cost**2
+    var_xy = (stddev_maj**2 - stddev_min**2) * sint * cost
+
+    transpose = abs(var_xy) > var_yy
+    if transpose:
+        data = np.swapaxes(data, -1, -2)
+        var_xx, var_yy = var_yy, var_xx
+
+    shear = var_xy / var_yy if var_yy > 0 else 0.
+    stddev_axis = np.sqrt(max(var_xx - shear * var_xy, 0.))
+    stddev_line = np.sqrt(var_yy)
+
+    # Pad by the kernel support, and along x by the largest shift of the rows
+    ny, nx = data.shape[-2:]
+    pad_y = int(np.ceil(support_scaling * stddev_line))
+    size_y = fft.next_fast_len(ny + 2 * pad_y, real=True)
+    pad_x = int(np.ceil(abs(shear) * size_y / 2 +
+                        support_scaling * stddev_axis))
+    # The rows are shifted with odd FFT sizes, which have no Nyquist
+    # frequency
+    size_x = nx + 2 * pad_x + 1 - (nx % 2)
+    while fft.next_fast_len(size_x) != size_x:
+        size_x += 2
+    padded = np.zeros(data.shape[:-2] + (size_y, size_x))
+    padded[..., pad_y:pad_y + ny, pad_x:pad_x + nx] = data
+
+    rows = np.arange(padded.shape[-2])
+    shifts = shear * (rows - rows.mean())
+
+    result = _gaussian_pass(padded, stddev_axis, -1, shifts=-shifts,
+                            workers=workers)
+    result = _gaussian_pass(result, stddev_line, -2, workers=workers)
+    result = _gaussian_pass(result, 0., -1, shifts=shifts, workers=workers)
+    result = result[..., pad_y:pad_y + ny, pad_x:pad_x + nx]
+
+    if transpose:
+        result = np.swapaxes(result, -1, -2)
+    return result
+
+
+def _convolve_separable(plane, kernel, support_scaling=8, workers=None):
+    """
+    Convolve a plane with `_separable_gaussian`, interpolating over NaNs as
+    `_PlaneConvolver` does.
+    """
+    finite = np.isfinite(plane)
+    if finite.all():
+        return _separable_gaussian(plane, *kernel,
+                                   support_scaling=support_scaling,
+                                   workers=workers)
+
+    # Convolve the data and the mask of the NaNs together
+    stack = np.stack([np.where(finite, plane, 0), ~finite])
+    result, nans = _separable_gaussian(stack, *kernel,
+                                       support_scaling=support_scaling,
+                                       workers=workers)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result /= 1 - nans
+    result[~finite] = np.nan
+    return result
+
+
+def convolve_image(data, beam, target, pixscale, tile_size=None,
+                   workers=None, support_scaling=8, out=None,
+                   method='fft'):
+    """
+    Convolve an image from its beam to a target beam in tiles, for images
+    too large for a single FFT.
+
+    The image is split into tiles that overlap by the support of the
+    convolution kernel, and each tile is convolved with the analytic
+    transfer function of the kernel (overlap-save). Only the tiles being
+    convolved are in memory, so ``data`` and ``out`` can be memory-mapped.
+    The result is the same as with `convolve_cube`.
+
+    Parameters
+    ----------
+    data : `~numpy.ndarray` or `~astropy.units.Quantity`
+        Image of shape ``(ny, nx)``. Data in Jy/beam are rescaled by the
+        ratio of the beam areas.
+    beam : `~radio_beam.Beam`
+        Beam of the image.
+    target : `~radio_beam.Beam`
+        Beam to convolve to.
+    pixscale : `~astropy.units.Quantity`
+        Conversion from angular to pixel size.
+    tile_size : int or tuple of int, optional
+        FFT shape of the tiles, including the overlap. By default, the
+        smallest size in `FFT_SIZES` of at least `MIN_TILE_SIZE` and
+        `TILE_OVERLAP_FACTOR` times the overlap. The overlap is twice the
+        half-size of the kernel, from its
+        `~astropy.modeling.utils.ellipse_extent` and ``support_scaling``.
+    workers : int, optional
+        Number of threads, each convolving one tile at a time. With the
+        'separable' method, the number of threads of each FFT pass.
+    support_scaling : int, optional
+        Sets the overlap between tiles.
+    out : `~numpy.ndarray`, optional
+        Output array of the same shape as ``data``, e.g. a memory-mapped
+        file. By default, a new float array is returned.
+    method : {'fft', 'separable'}, optional
+        'fft' convolves tiles with 2D FFTs. 'separable' convolves the whole
+        image with a sequence of 1-D FFT passes along the pixel axes and a
+        sheared line, which gives the same result without tiling. Kernels
+        narrower than about a pixel are aliased differently by the two
+        methods.
+
+    Returns
+    -------
+    out : `~numpy.ndarray` or `~astropy.units.Quantity`
+        The convolved image.
+    """
+    if np.ndim(data) != 2:
+        raise ValueError("The data must be a 2D image.")
+    if method not in ('fft', 'separable'):
+        raise ValueError("method must be 'fft' or 'separable'.")
+
+    unit = None
+    if isinstance(data, u.Quantity):
+        unit = data.unit
+        data = data.value
+    data = np.asanyarray(data)
+
+    if out is None:
+        out = np.empty(data.shape,
+                       dtype=np.result_type(data.dtype, np.float32))
+    elif np.shape(out) != data.shape:
+        raise ValueError("out must have the same shape as the data.")
+
+    if beam == target:
+        kernel = None
+        pad = (0, 0)
+    else:
+        kernel = target.deconvolve(beam)._pixel_gaussian(pixscale)
+        pad = _kernel_pad(*kernel, support_scaling)
+
+    scale = None
+    if _is_per_beam(unit):
+        scale = (target.sr / beam.sr).to_value(u.dimensionless_unscaled)
+
+    if method == 'separable':
+        if kernel is None:
+            out[...] = data
+        else:
+            out[...] = _convolve_separable(data, kernel,
+                                           support_scaling=support_scaling,
+                                           workers=workers)
+            if scale is not None:
+                out *= scale
+        return out if unit is None else u.Quantity(out, unit, copy=False)
+
+    # Each tile writes the core of its FFT, away from the overlap
+    tile_shape = _tile_shape(data.shape, pad, tile_size)
+    core = tuple(size - 2 * width for size, width in zip(tile_shape, pad))
+
+    convolver = _PlaneConvolver(tile_shape, (0, 0),
+                                dtype=out.dtype.newbyteorder('='))
+    kernel_ft = None
+    if kernel is not None:
+        kernel_ft = convolver.transfer_function(*kernel)
+
+    def convolve_tile(corner):
+        # Core of the tile, and the region of the data that it depends on
+        core_slices = tuple(slice(start, min(start + length, size))
+                            for start, length, size in zip(corner, core,
+                                                           data.shape))
+        region_start = tuple(max(start - width, 0)
+                             for start, width in zip(corner, pad))
+        region_slices = tuple(slice(start, min(edge.stop + width, size))
+                              for start, edge, width, size
+                              in zip(region_start, core_slices, pad,
+                                     data.shape))
+
+        if kernel_ft is None:
+            out[core_slices] = data[core_slices]
+            return
+
+        result = np.empty(tuple(edge.stop - edge.start
+                                for edge in region_slices), dtype=out.dtype)
+        convolver.convolve(data[region_slices], kernel_ft, result)
+        result = result[tuple(slice(edge.start - start, edge.stop - start)
+                              for edge, start in zip(core_slices,
+                                                     region_start))]
+        if scale is not None:
+            result *= scale
+        out[core_slices] = result
+
+    corners = [(y, x) for y in range(0, data.shape[0], core[0])
+               for x in range(0, data.shape[1], core[1])]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Iterate over the results to raise any errors
+        list(executor.map(convolve_tile, corners))
+
+    if unit is not None:
+        return u.Quantity(out, unit, copy=False)
+    return out
@@ -0,0 +1,404 @@
+
+import io
+import re
+import bz2
+import gzip
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from astropy.io import fits
+
+
+__all__ = ['write_table_extension', 'update_header_inplace',
+           'update_beam_headers', 'read_header_bytes',
+           'beam_params_from_history', 'beam_params_from_header']
+
+CARD_LENGTH = 80
+
+BLOCK_LENGTH = 2880
+
+# Restoring beams recorded in HISTORY, e.g.
+# HISTORY > restoration: 1.34841 by 0.830715 (arcsec) at pa 82.8827 (deg)
+# HISTORY AIPS   CLEAN BMAJ=  1.7599E-03 BMIN=  1.5740E-03 BPA=   2.61
+CASA_HISTORY_PATTERN = re.compile(r'restoration:?\s+(\S+)\s+by\s+(\S+)\s+'
+                                  r'\(arcsec\)\s+at\s+pa\s+(\S+)')
+AIPS_HISTORY_PATTERN = re.compile(r'BMAJ=\s*(\S+)\s+BMIN=\s*(\S+)\s+'
+                                  r'BPA=\s*([^\s/]+)')
+
+
+def _find_extension(hdulist, extname):
+    """
+    Index of the first HDU with the given EXTNAME, or `None`.
+    """
+    for i, hdu in enumerate(hdulist):
+        if hdu.name == extname.upper():
+            return i
+    return None
+
+
+def _hdu_bytes(hdu):
+    """
+    The bytes of an extension HDU as written after the primary HDU.
+    """
+    primary = fits.PrimaryHDU()
+    with io.BytesIO() as buffer:
+        fits.HDUList([primary, hdu]).writeto(buffer, output_verify='ignore')
+        return buffer.getvalue()[len(primary.header.tostring()):]
+
+
+def write_table_extension(filename, hdu):
+    """
+    Append a table extension to an existing FITS file, or replace the
+    extension with the same EXTNAME.
+
+    The preceding HDUs are never rewritten. When the extension is new, it is
+    appended to the end of the file. When an extension with the same name is
+    the last HDU, the file is truncated at the start of that HDU and the new
+    table appended. When the extension is followed by other HDUs, those HDUs
+    are copied to a temporary file, and written back after the new table.
+    The new table is serialized before the file is changed.
+
+    Parameters
+    ----------
+    filename : str
+        Name of an existing, uncompressed FITS file.
+    hdu : `~astropy.io.fits.BinTableHDU`
+        The table to write. Its ``name`` is used to find an existing
+        extension.
+
+    Returns
+    -------
+    mode : str
+        One of 'appended', 'replaced' or 'rewritten', describing how the
+        file was changed. 'rewritten' means that the HDUs after the
+        extension were written again.
+    """
+
+    # Offsets into compressed files are offsets into the uncompressed stream
+    with open(filename, 'rb') as fileobj:
+        if fileobj.read(6) != b'SIMPLE':
+            raise ValueError("{} is not an uncompressed FITS "
+                             "file.".format(filename))
+
+    # Only the headers are read to find the extension and its offset
+    with fits.open(filename, lazy_load_hdus=True) as hdulist:
+        index = _find_extension(hdulist, hdu.name)
+        nhdus = len(hdulist)
+        if index is not None:
+            hdr_loc = hdulist.fileinfo(index)['hdrLoc']
+        if index is not None and index < nhdus - 1:
+            tail_loc = hdulist.fileinfo(index + 1)['hdrLoc']
+
+    table = _hdu_bytes(hdu)
+
+    if index is None:
+        with open(filename, 'ab') as fileobj:
+            fileobj.write(table)
+        return 'appended'
+
+    if index == nhdus - 1:
+        with open(filename, 'r+b') as fileobj:
+            fileobj.truncate(hdr_loc)
+            fileobj.seek(hdr_loc)
+            fileobj.write(table)
+        return 'replaced'
+
+    # Set aside the HDUs after the extension, and append them again after
+    # the new table
+    with tempfile.TemporaryFile() as tail:
+        with open(filename, 'r+b') as fileobj:
+            fileobj.seek(tail_loc)
+            shutil.copyfileobj(fileobj, tail)
+            tail.seek(0)
+
+            fileobj.truncate(hdr_loc)
+            fileobj.seek(hdr_loc)
+            fileobj.write(table)
+            shutil.copyfileobj(tail, fileobj)
+    return 'rewritten'
+
+
+def _set_cards(cards, keywords):
+    """
+    Set keywords in a list of 80-character card images without changing the
+    number of cards. Returns `None` if there is not enough padding after the
+    END card for new keywords.
+    """
+    cards = list(cards)
+    card_keys = [card[:8].rstrip() for card in cards]
+
+    try:
+        end_idx = card_keys.index('END')
+    except ValueError:
+        raise ValueError("Header has no END card.")
+
+    for key, value in keywords.items():
+        image = fits.Card(key, value).image
+
+        if key in card_keys[:end_idx]:
+            cards[card_keys.index(key)] = image
+            continue
+
+        # Insert before END, using one of the blank cards after it
+        if end_idx + 1 >= len(cards) or cards[-1].strip():
+            return None
+        cards.insert(end_idx, image)
+        card_keys.insert(end_idx, key)
+        cards.pop()
+        card_keys.pop()
+        end_idx += 1
+
+    return cards
+
+
+def update_header_inplace(filename, keywords, ext=0):
+    """
+    Update keywords in the header of one HDU of a FITS file, writing only the
+    header blocks when possible.
+
+    Existing cards are overwritten in place. New keywords are added before
+    the END card when the padding at the end of the last header block has
+    room for them. Otherwise (or for compressed files), the file is updated
+    with `~astropy.io.fits.open` in 'update' mode, which can rewrite the file.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the FITS file.
+    keywords : dict
+        Keywords and values to set.
+    ext : int or str, optional
+        The HDU to update.
+
+    Returns
+    -------
+    mode : str
+        'inplace' if only the header blocks were written, or 'rewritten'.
+    """
+
+    with open(filename, 'rb') as fh:
+        is_plain_fits = fh.read(6) == b'SIMPLE'
+
+    if is_plain_fits:
+        with fits.open(filename, lazy_load_hdus=True) as hdulist:
+            info = hdulist.fileinfo(hdulist.index_of(ext))
+        hdr_loc = info['hdrLoc']
+        hdr_size = info['datLoc'] - hdr_loc
+
+        with open(filename, 'r+b') as fh:
+            fh.seek(hdr_loc)
+            raw = fh.read(hdr_size).decode('ascii')
+
+            cards = [raw[i:i + CARD_LENGTH]
+                     for i in range(0, hdr_size, CARD_LENGTH)]
+            new_cards = _set_cards(cards, keywords)
+
+            if new_cards is not None:
+                fh.seek(hdr_loc)
+                fh.write(''.join(new_cards).encode('ascii'))
+                return 'inplace'
+
+    with fits.open(filename, mode='update') as hdulist:
+        hdulist[ext].header.update(keywords)
+
+    return 'rewritten'
+
+
+def update_beam_headers(filenames, beams, ext=0, workers=None):
+    """
+    Set the BMAJ, BMIN and BPA keywords in many FITS files, changing only the
+    header blocks where there is room. See `update_header_inplace`.
+
+    Parameters
+    ----------
+    filenames : list of str
+        Names of the FITS files.
+    beams : `~radio_beam.Beam` or list of `~radio_beam.Beam`
+        A beam for each file, or one beam to set in all files.
+    ext : int or str, optional
+        The HDU to update in each file.
+    workers : int, optional
+        Number of threads. Defaults to the `~concurrent.futures.ThreadPoolExecutor`
+        default.
+
+    Returns
+    -------
+    modes : list of str
+        'inplace' or 'rewritten' for each file.
+    """
+
+    filenames = list(filenames)
+
+    if hasattr(beams, 'to_header_keywords'):
+        keywords = [beams.to_header_keywords()] * len(filenames)
+    else:
+        keywords = [beam.to_header_keywords() for beam in beams]
+        if len(keywords) != len(filenames):
+            raise ValueError("The number of beams must match the number of "
+                             "files.")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(update_header_inplace, filename, kws, ext=ext)
+                   for filename, kws in zip(filenames, keywords)]
+        return [future.result() for future in futures]
+
+
+def _find_history_beam(history):
+    """
+    Find the last restoring beam in a sequence of HISTORY entries.
+
+    The entries are scanned once, from the end. CASA entries take precedence
+    over AIPS entries, so the scan stops at the last CASA entry, while the
+    last AIPS entry is only used when there is no CASA entry.
+
+    Returns
+    -------
+    result : tuple or `None`
+        ``('casa', match)`` or ``('aips', match)``, where ``match`` holds the
+        major axis, minor axis and position angle as strings. `None` if
+        there is no beam entry.
+    """
+    aips_match = None
+
+    for line in reversed(history):
+        # Cheap substring tests before using the patterns
+        if 'restoration' in line:
+            match = CASA_HISTORY_PATTERN.search(line)
+            if match is not None:
+                return 'casa', match
+        if aips_match is None and 'BMAJ' in line:
+            aips_match = AIPS_HISTORY_PATTERN.search(line)
+
+    if aips_match is not None:
+        return 'aips', aips_match
+
+    return None
+
+
+def beam_params_from_history(history):
+    """
+    Beam parameters from the HISTORY entries written by CASA or AIPS.
+
+    Parameters
+    ----------
+    history : sequence of str
+        The HISTORY entries, e.g. ``header['HISTORY']``.
+
+    Returns
+    -------
+    params : tuple or `None`
+        Major axis, minor axis and position angle in degrees, or `None` if
+        no entry describes the restoring beam. When both CASA and AIPS
+        entries are present, the last CASA entry is used.
+    """
+    result = _find_history_beam(history)
+    if result is None:
+        return None
+
+    kind, match = result
+    bmaj, bmin, bpa = (float(value) for value in match.groups())
+    if kind == 'casa':
+        bmaj /= 3600.
+        bmin /= 3600.
+    return bmaj, bmin, bpa
+
+
+def _card_value(card):
+    """
+    Float value of an 80-character keyword card.
+    """
+    value = card[10:].split('/', 1)[0].strip()
+    return float(value.replace('D', 'E'))
+
+
+def beam_params_from_header(header):
+    """
+    Beam parameters from a FITS header, without building a
+    `~radio_beam.Beam` or, for raw headers, a `~astropy.io.fits.Header`.
+
+    The BMAJ, BMIN and BPA keywords are used when BMAJ is present; BMIN
+    defaults to BMAJ and BPA to zero. Otherwise the CASA or AIPS HISTORY
+    entries are used (see `beam_params_from_history`).
+
+    Parameters
+    ----------
+    header : `~astropy.io.fits.Header`, bytes or str
+        A header, or the raw header as a string of 80-character cards, e.g.
+        from `read_header_bytes`. Cards after the END card are ignored.
+
+    Returns
+    -------
+    params : tuple or `None`
+        Major axis, minor axis and position angle in degrees, or `None` if
+        the header does not describe a beam.
+    """
+
+    if isinstance(header, fits.Header):
+        if 'BMAJ' in header:
+            bmaj = float(header['BMAJ'])
+            return (bmaj, float(header.get('BMIN', bmaj)),
+                    float(header.get('BPA', 0.)))
+        if 'HISTORY' not in header:
+            return None
+        return beam_params_from_history(header['HISTORY'])
+
+    if isinstance(header, (bytes, bytearray, memoryview)):
+        header = bytes(header).decode('ascii', errors='replace')
+
+    keywords = {}
+    history = []
+    for i in range(0, len(header), CARD_LENGTH):
+        card = header[i:i + CARD_LENGTH]
+        key = card[:8].rstrip()
+        if key == 'END':
+            break
+        if key in ('BMAJ', 'BMIN', 'BPA') and card[8:10] == '= ':
+            keywords[key] = _card_value(card)
+        elif key == 'HISTORY':
+            history.append(card[8:])
+
+    if 'BMAJ' in keywords:
+        bmaj = keywords['BMAJ']
+        return bmaj, keywords.get('BMIN', bmaj), keywords.get('BPA', 0.)
+
+    return beam_params_from_history(history)
+
+
+def read_header_bytes(filename):
+    """
+    Read the raw primary header of a FITS file, stopping at the block with
+    the END card. Gzip and bzip2 compressed files are supported.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the FITS file.
+
+    Returns
+    -------
+    header : bytes
+        The header blocks, including the padding after the END card.
+    """
+
+    with open(filename, 'rb') as fh:
+        magic = fh.read(3)
+
+    if magic[:2] == b'\x1f\x8b':
+        opener = gzip.open
+    elif magic == b'BZh':
+        opener = bz2.open
+    else:
+        opener = open
+
+    blocks = []
+    with opener(filename, 'rb') as fh:
+        while True:
+            block = fh.read(BLOCK_LENGTH)
+            if len(block) < BLOCK_LENGTH:
+                raise OSError("No END card found in the header of "
+                              "{}.".format(filename))
+            blocks.append(block)
+            if any(block[i:i + 8] == b'END     '
+                   for i in range(0, BLOCK_LENGTH, CARD_LENGTH)):
+                return b''.join(blocks)
@@ -0,0 +1,148 @@
+
+import copy
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+
+__all__ = ['KernelCache', 'kernel_cache']
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions',
+                                     'entries', 'nbytes', 'max_bytes'])
+
+# Kernel parameters (in pixels and radians) are rounded to this many decimals
+# to form the cache key
+KEY_DECIMALS = 10
+
+
+def _quantize(value):
+    return round(float(value), KEY_DECIMALS)
+
+
+def kernel_key(kind, stddev_maj, stddev_min, angle, **kwargs):
+    """
+    Cache key of a kernel.
+
+    The shape parameters are the kernel axes in pixels, so the key covers
+    both the beam and the pixel scale. The angle is taken modulo pi, since
+    the kernels are symmetric. ``kwargs`` are the kernel keyword arguments
+    (e.g., mode, size and support_scaling).
+    """
+    return (kind, _quantize(stddev_maj), _quantize(stddev_min),
+            _quantize(np.mod(angle, np.pi)),
+            tuple(sorted(kwargs.items())))
+
+
+class KernelCache:
+    """
+    A thread-safe, least-recently-used cache of convolution kernels, bounded
+    by the memory used by the kernel arrays.
+
+    The cached arrays are read-only. Each lookup returns a shallow copy of
+    the cached kernel that shares the array, so in-place operations such as
+    `~astropy.convolution.Kernel.normalize` must be done on a copy of the
+    array.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Maximum total size of the cached arrays. The least recently used
+        kernels are evicted when it is exceeded. Kernels larger than
+        ``max_bytes`` are not cached.
+    """
+
+    def __init__(self, max_bytes=64 * 1024**2):
+        self.max_bytes = max_bytes
+        self._kernels = OrderedDict()
+        self._lock = threading.Lock()
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._kernels)
+
+    def __contains__(self, key):
+        return key in self._kernels
+
+    @property
+    def nbytes(self):
+        """
+        Total size of the cached kernel arrays.
+        """
+        return self._nbytes
+
+    def cache_info(self):
+        """
+        Cache statistics, like `functools.lru_cache`.
+
+        Returns
+        -------
+        info : namedtuple
+            Numbers of hits, misses and evictions, the number of cached
+            kernels, their size in bytes and ``max_bytes``.
+        """
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                             len(self._kernels), self._nbytes, self.max_bytes)
+
+    def clear(self):
+        """
+        Remove all kernels and reset the statistics.
+        """
+        with self._lock:
+            self._kernels.clear()
+            self._nbytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes and self._kernels:
+            _, kernel = self._kernels.popitem(last=False)
+            self._nbytes -= kernel.array.nbytes
+            self.evictions += 1
+
+    def get(self, key, factory):
+        """
+        Return the kernel for ``key``, creating it with ``factory`` when it
+        is not cached.
+
+        Parameters
+        ----------
+        key : hashable
+            Cache key, e.g. from `kernel_key`.
+        factory : callable
+            Function with no arguments that creates the kernel.
+
+        Returns
+        -------
+        kernel : `~astropy.convolution.Kernel`
+            A shallow copy of the cached kernel, with a read-only array.
+        """
+        with self._lock:
+            kernel = self._kernels.get(key, None)
+            if kernel is not None:
+                self._kernels.move_to_end(key)
+                self.hits += 1
+                return copy.copy(kernel)
+            self.misses += 1
+
+        # Build the kernel outside of the lock, so other threads are not
+        # blocked
+        kernel = factory()
+        kernel.array.flags.writeable = False
+
+        with self._lock:
+            nbytes = kernel.array.nbytes
+            if key not in self._kernels and nbytes <= self.max_bytes:
+                self._kernels[key] = kernel
+                self._nbytes += nbytes
+                self._evict()
+
+        return copy.copy(kernel)
+
+
+# Cache used by `~radio_beam.Beam.as_kernel` and
+# `~radio_beam.Beam.as_tophat_kernel`
+kernel_cache = KernelCache()
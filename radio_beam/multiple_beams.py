@@ -5,15 +5,48 @@ from astropy import constants
 from astropy import wcs
 import numpy as np
 import warnings
-
-from .beam import Beam, _to_area, SIGMA_TO_FWHM, _with_default_unit
+import itertools
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from astropy.convolution.kernels import _round_up_to_odd_integer
+
+from .beam import (Beam, _to_area, SIGMA_TO_FWHM, FWHM_TO_AREA,
+                   _with_default_unit, NoBeamException,
+                   _gaussian_kernel_array, _gaussian_support,
+                   _gaussian_transfer_function, _transform_gaussian,
+                   _wcs_pixel_transform)
 from .commonbeam import commonbeam
-from .utils import InvalidBeamOperationError
+from .fits_utils import (write_table_extension, read_header_bytes,
+                         beam_params_from_header)
+from .casa_utils import read_casa_beams
+from .convolution import convolve_cube
+from .columnar import (MetaColumns, LazyColumn, write_columns, read_columns,
+                       columns_to_shared_memory, columns_from_shared_memory)
+from .utils import (InvalidBeamOperationError, convolve_vectorized,
+                    deconvolve_vectorized)
+
+
+# Beam parameters as plain floats: major and minor FWHM and PA in degrees
+BeamParams = namedtuple('BeamParams', ['major', 'minor', 'pa'])
+
+RECORD_DTYPE = np.dtype([('major', np.float64),
+                         ('minor', np.float64),
+                         ('pa', np.float64)])
 
 
 class Beams(u.Quantity):
     """
     An object to handle a set of radio beams for a data cube.
+
+    The beams can have any number of dimensions, e.g. ``(nchan, npol)`` for
+    a cube with beams per channel and polarization. The metadata always has
+    one entry per beam, in the C order of the flattened beams.
+
+    Multiplying (convolving) or dividing (deconvolving) by a `Beam`, or by
+    `Beams` that broadcast against these beams, returns new `Beams`. The
+    metadata is kept when the result has the same shape as these beams.
+    When broadcasting changes the shape, the metadata no longer matches
+    the beams, and the result has none.
     """
 
     def __new__(cls, major=None, minor=None, pa=None,
@@ -25,7 +58,8 @@ class Beams(u.Quantity):
         Parameters
         ----------
         major : :class:`~astropy.units.Quantity` with angular equivalency
-            The FWHM major axes
+            The FWHM major axes. ``minor`` and ``pa`` must have the same
+            shape.
         minor : :class:`~astropy.units.Quantity` with angular equivalency
             The FWHM minor axes
         pa : :class:`~astropy.units.Quantity` with angular equivalency
@@ -65,7 +99,7 @@ class Beams(u.Quantity):
 
 
         if pa is not None:
-            if len(pa) != len(major):
+            if np.shape(pa) != np.shape(major):
                 raise ValueError("Number of position angles must match number of major axis lengths")
             pa = _with_default_unit("pa", pa, u.deg)
         else:
@@ -74,7 +108,7 @@ class Beams(u.Quantity):
         # some sensible defaults
         if minor is None:
             minor = major
-        elif len(minor) != len(major):
+        elif np.shape(minor) != np.shape(major):
             raise ValueError("Minor and major axes must have same number of values")
         else:
             minor = _with_default_unit("minor", minor, default_unit)
@@ -89,19 +123,39 @@ class Beams(u.Quantity):
         self.default_unit = default_unit
 
         if meta is None:
-            self.meta = [{}]*len(self)
+            self.meta = [{}]*self.size
         else:
             self.meta = meta
 
         return self
 
+    @classmethod
+    def _from_arrays(cls, area, major, minor, pa, meta=None,
+                     default_unit=u.arcsec):
+        """
+        Build a `Beams` from already validated arrays without copying them.
+
+        ``area`` is a float array in steradians; ``major``, ``minor`` and
+        ``pa`` are Quantities of the same shape.
+        """
+        self = super(Beams, cls).__new__(cls, value=area, unit=u.sr,
+                                         copy=False)
+        self.major = major
+        self.minor = minor
+        self.pa = pa
+        self.default_unit = default_unit
+        self.meta = [{}] * self.size if meta is None else meta
+        return self
+
     @property
     def meta(self):
         return self._meta
 
     @meta.setter
     def meta(self, value):
-        if len(value) == len(self):
+        # One entry per beam. The size is taken from the major axes, which
+        # are set first when a new view is finalized.
+        if len(value) == np.size(self.major):
             self._meta = value
         else:
             raise TypeError("metadata must be a list of dictionaries")
@@ -112,34 +166,120 @@ class Beams(u.Quantity):
 
     @property
     def isfinite(self):
-        return ((self.major > 0) & (self.minor > 0) & np.isfinite(self.major) &
-                np.isfinite(self.minor) & np.isfinite(self.pa))
+        """
+        Mask of valid beams.
+        """
+        return ((self.major > 0) & (self.minor > 0) &
+                np.isfinite(self.major) & np.isfinite(self.minor) &
+                np.isfinite(self.pa))
 
     def __getslice__(self, start, stop, increment=None):
         return self.__getitem__(slice(start, stop, increment))
 
     def __getitem__(self, view):
-        if isinstance(view, (int, np.int64)):
+        if self.ndim != 1:
+            return self._getitem_nd(view)
+
+        if isinstance(view, (int, np.integer)):
             return Beam(major=self.major[view],
                         minor=self.minor[view],
                         pa=self.pa[view],
-                        meta=self.meta[view])
+                        meta=self._beam_meta(view))
         elif isinstance(view, slice):
-            return Beams(major=self.major[view],
-                         minor=self.minor[view],
-                         pa=self.pa[view],
-                         meta=self.meta[view])
-        elif isinstance(view, np.ndarray):
-            if view.dtype.name != 'bool':
+            return self._take(view, self.meta[view])
+        elif isinstance(view, (np.ndarray, list)):
+            view = np.asarray(view)
+            if view.dtype.kind == 'b':
+                indices = np.flatnonzero(view)
+            elif view.dtype.kind in 'iu':
+                indices = view
+            else:
                 raise ValueError("If using an array to index beams, it must "
-                                 "be a boolean array.")
-            return Beams(major=self.major[view],
-                         minor=self.minor[view],
-                         pa=self.pa[view],
-                         meta=[x for ii,x in zip(view, self.meta) if ii])
+                                 "be a boolean or integer array.")
+            if isinstance(self.meta, MetaColumns):
+                meta = self.meta[indices]
+            else:
+                meta = [self.meta[ii] for ii in indices]
+            return self._take(view, meta)
         else:
             raise ValueError("Invalid slice")
 
+    def _beam_meta(self, index):
+        """
+        Metadata dictionary of the beam at a flat index, for a `Beam`.
+        """
+        if isinstance(self.meta, MetaColumns):
+            return self.meta.row(index)
+        return self.meta[index]
+
+    def _getitem_nd(self, view):
+        """
+        Index N-dimensional beams with the usual numpy rules. The metadata
+        of the selected beams is found from their flat indices.
+        """
+        flat_idx = np.arange(self.size).reshape(self.shape)[view]
+
+        if np.ndim(flat_idx) == 0:
+            return Beam(major=self.major[view],
+                        minor=self.minor[view],
+                        pa=self.pa[view],
+                        meta=self._beam_meta(int(flat_idx)))
+
+        flat_idx = flat_idx.ravel()
+        if isinstance(self.meta, MetaColumns):
+            meta = self.meta[flat_idx]
+        else:
+            meta = [self.meta[ii] for ii in flat_idx]
+        return self._take(view, meta)
+
+    def reshape(self, *shape):
+        """
+        Give the beams a new shape without changing their parameters. The
+        metadata is kept, since it follows the C order of the beams.
+
+        Parameters
+        ----------
+        shape : int or tuple of int
+            The new shape, as for `numpy.reshape`.
+
+        Returns
+        -------
+        beams : Beams
+            A new Beams object sharing the arrays of this one.
+        """
+        if len(shape) == 1 and isinstance(shape[0], (tuple, list)):
+            shape = tuple(shape[0])
+
+        new = self._from_arrays(self.to_value(u.sr).reshape(shape),
+                                self.major.reshape(shape),
+                                self.minor.reshape(shape),
+                                self.pa.reshape(shape),
+                                meta=self.meta,
+                                default_unit=self.default_unit)
+        if getattr(self, '_shared_memory', None) is not None:
+            new._shared_memory = self._shared_memory
+        return new
+
+    def ravel(self):
+        """
+        The beams as a 1-D Beams object. See `Beams.reshape`.
+        """
+        return self.reshape(-1)
+
+    def _take(self, view, meta):
+        """
+        Index the area and beam parameter arrays without re-validating them.
+
+        Slices return views of the parent arrays; integer and boolean arrays
+        gather into new arrays.
+        """
+        new = super(Beams, self).__getitem__(view)
+        new.major = self.major[view]
+        new.minor = self.minor[view]
+        new.pa = self.pa[view]
+        new.meta = meta
+        return new
+
     def __array_finalize__(self, obj):
         # If our unit is not set and obj has a valid one, use it.
         if self._unit is None:
@@ -154,6 +294,10 @@ class Beams(u.Quantity):
             self.minor = obj.minor
             self.pa = obj.pa
             self.meta = obj.meta
+            self.default_unit = getattr(obj, 'default_unit', u.arcsec)
+            # Keep an attached shared memory block open while views exist
+            if getattr(obj, '_shared_memory', None) is not None:
+                self._shared_memory = obj._shared_memory
 
         # Copy info if the original had `info` defined.  Because of the way the
         # DataInfo works, `'info' in obj.__dict__` is False until the
@@ -166,8 +310,21 @@ class Beams(u.Quantity):
     def sr(self):
         return _to_area(self.major, self.minor)
 
+    def __reduce__(self):
+        # Pickle only the arrays, units and metadata rather than the full
+        # Quantity state of the areas and each of the axes.
+        return (_rebuild_beams,
+                (type(self), self.to_value(u.sr),
+                 self.major.value, self.major.unit,
+                 self.minor.value, self.minor.unit,
+                 self.pa.value, self.pa.unit,
+                 self.meta, self.default_unit))
+
+    def __reduce_ex__(self, protocol):
+        return self.__reduce__()
+
     @classmethod
-    def from_fits_bintable(cls, bintable):
+    def from_fits_bintable(cls, bintable, by_polarization=False):
         """
         Instantiate a Beams list from a bintable HDU from a CASA-produced image
         HDU.
@@ -176,97 +333,474 @@ class Beams(u.Quantity):
         ----------
         bintable : fits.BinTableHDU
             The table data containing the beam information
+        by_polarization : bool, optional
+            Return ``(nchan, npol)`` beams arranged by the CHAN and POL
+            columns, rather than one beam per table row. See
+            `Beams.by_polarization`.
 
         Returns
         -------
         beams : Beams
-            A new Beams object
+            A new Beams object. The beam parameters are copied from the table
+            as float64. The remaining columns (e.g., CHAN and POL) are copied
+            to a read-only `~radio_beam.columnar.MetaColumns`; use
+            ``beams.meta.to_list()`` for a list of dictionaries that can be
+            modified.
         """
 
-        header = bintable.header
+        major, minor, pa = _bintable_beam_columns(bintable)
+
+        data = bintable.data
+        meta = MetaColumns({key: _native_column(data[key])
+                            for key in bintable.columns.names
+                            if key not in ('BMAJ', 'BPA', 'BMIN')},
+                           length=len(data))
 
-        # Read the bmaj/bmin units from the header
-        # (we still assume BPA is degrees because we've never seen an exceptional case)
-        # this will crash if there is no appropriate header info
-        maj_kw = [kw for kw, val in header.items() if val == 'BMAJ'][0]
-        min_kw = [kw for kw, val in header.items() if val == 'BMIN'][0]
-        maj_unit = header[maj_kw.replace('TTYPE', 'TUNIT')]
-        min_unit = header[min_kw.replace('TTYPE', 'TUNIT')]
+        beams = cls(major=major, minor=minor, pa=pa, meta=meta)
+        return beams.by_polarization() if by_polarization else beams
+
+    @classmethod
+    def from_fits_file(cls, filename, ext='BEAMS', by_polarization=False):
+        """
+        Instantiate a Beams list from the beam table extension of a FITS file,
+        without reading the other HDUs.
 
-        # AIPS uses non-FITS-standard unit names; this catches the
-        # only case we've seen so far
-        if maj_unit == 'DEGREES':
-            maj_unit = 'degree'
-        if min_unit == 'DEGREES':
-            min_unit = 'degree'
+        Only the headers before the beam table are read; the data of the
+        other HDUs (e.g., the cube) are skipped over. For uncompressed files
+        the table is memory-mapped. The beam parameters are copied as
+        float64, and the metadata columns (e.g., CHAN and POL) are only read
+        when they are accessed.
 
-        maj_unit = u.Unit(maj_unit)
-        min_unit = u.Unit(min_unit)
+        Parameters
+        ----------
+        filename : str
+            Name of the FITS file.
+        ext : int or str, optional
+            Index or name of the beam table extension. CASA names this
+            extension 'BEAMS'.
+        by_polarization : bool, optional
+            Return ``(nchan, npol)`` beams. See `Beams.by_polarization`.
 
-        major = u.Quantity(bintable.data['BMAJ'], maj_unit)
-        minor = u.Quantity(bintable.data['BMIN'], min_unit)
-        pa = u.Quantity(bintable.data['BPA'], u.deg)
-        meta = [{key: row[key] for key in bintable.columns.names
-                 if key not in ('BMAJ', 'BPA', 'BMIN')}
-                for row in bintable.data]
+        Returns
+        -------
+        beams : Beams
+            A new Beams object. Metadata is returned as a read-only
+            `~radio_beam.columnar.MetaColumns`.
+        """
 
-        return cls(major=major, minor=minor, pa=pa, meta=meta)
+        with fits.open(filename, memmap=True, lazy_load_hdus=True) as hdulist:
+            bintable = hdulist[ext]
+
+            if not isinstance(bintable, fits.BinTableHDU):
+                raise TypeError("Extension {} is not a binary "
+                                "table.".format(ext))
+
+            major, minor, pa = _bintable_beam_columns(bintable)
+
+            data = bintable.data
+            meta = MetaColumns({key: LazyColumn(data, key)
+                                for key in bintable.columns.names
+                                if key not in ('BMAJ', 'BPA', 'BMIN')},
+                               length=len(data))
+
+        beams = cls(major=major, minor=minor, pa=pa, meta=meta)
+        return beams.by_polarization() if by_polarization else beams
 
     @classmethod
-    def from_casa_image(cls, imagename):
+    def from_fits_files(cls, filenames, ext=0, workers=None,
+                        use_processes=False, on_error='warn'):
         """
-        Instantiate beams from a CASA image. Cannot currently handle beams for
-        different polarizations.
+        Read the beam of each of a list of FITS images.
 
-        ** Must be run in a CASA environment! **
+        Only the header of each file is read; primary headers are parsed
+        from the raw cards. The beam is taken from the BMAJ/BMIN/BPA keywords
+        or, failing that, from the AIPS or CASA HISTORY entries (see
+        `~radio_beam.fits_utils.beam_params_from_header`). Files are read in
+        parallel.
 
         Parameters
         ----------
-        imagename : str
-            Name of CASA image.
+        filenames : list of str
+            Names of the FITS files.
+        ext : int or str, optional
+            The HDU to read the beam from in each file.
+        workers : int, optional
+            Number of workers. Defaults to the executor's default.
+        use_processes : bool, optional
+            Use a process pool instead of a thread pool. Parsing long
+            HISTORY sections is CPU-bound, so processes can be faster for
+            large numbers of files.
+        on_error : {'warn', 'raise', 'ignore'}, optional
+            What to do when the beam cannot be read from a file, or is not
+            valid (not finite and positive, or with a minor axis greater
+            than the major axis). With 'raise', the first error is raised.
+            Otherwise the beam for that file is set to NaN and the error is
+            recorded in the metadata.
+
+        Returns
+        -------
+        beams : Beams
+            One beam per file, in degrees, in the order of ``filenames``.
+            The metadata has FILENAME, HDU and ERROR columns, where ERROR is
+            an empty string for files that were read successfully.
         """
 
-        try:
-            from casatools import image as iatool
+        if on_error not in ('warn', 'raise', 'ignore'):
+            raise ValueError("on_error must be 'warn', 'raise' or 'ignore'.")
+
+        filenames = [str(filename) for filename in filenames]
 
-            ia = iatool()
+        params = np.full((len(filenames), 3), np.nan)
+        errors = []
 
-        except ImportError:
+        executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with executor_cls(max_workers=workers) as executor:
+            results = executor.map(_read_fits_file_beam, filenames,
+                                   [ext] * len(filenames))
 
-            raise ImportError("Could not import CASA and therefore"
-                              " cannot read CASA .image files")
+            for i, (filename, (beam_params, error)) in enumerate(zip(filenames,
+                                                                     results)):
+                if error is None:
+                    params[i] = beam_params
+                    errors.append('')
+                    continue
 
-        ia.open(imagename)
-        beam_props = ia.restoringbeam()
-        ia.close()
+                if on_error == 'raise':
+                    # Don't start reading the remaining files
+                    executor.shutdown(cancel_futures=True)
+                    raise error
+                elif on_error == 'warn':
+                    warnings.warn("Could not read the beam from {0}: "
+                                  "{1}".format(filename, error))
+                errors.append("{0}: {1}".format(type(error).__name__, error))
 
-        nchans = beam_props['nChannels']
+        meta = MetaColumns({'FILENAME': np.array(filenames, dtype=str),
+                            'HDU': np.array([str(ext)] * len(filenames)),
+                            'ERROR': np.array(errors, dtype=str)},
+                           length=len(filenames))
 
-        # Assuming there is always a 0th channel...
-        maj_unit = u.Unit(beam_props['beams']['*0']['*0']['major']['unit'])
-        min_unit = u.Unit(beam_props['beams']['*0']['*0']['minor']['unit'])
-        pa_unit = u.Unit(beam_props['beams']['*0']['*0']['positionangle']['unit'])
+        return cls(major=params[:, 0] * u.deg, minor=params[:, 1] * u.deg,
+                   pa=params[:, 2] * u.deg, meta=meta)
 
-        major = np.empty((nchans)) * maj_unit
-        minor = np.empty((nchans)) * min_unit
-        pa = np.empty((nchans)) * pa_unit
+    def to_fits_bintable(self, float_format='E'):
+        """
+        Convert the beams to a CASA-style 'BEAMS' binary table.
 
-        for chan in range(nchans):
+        The table has BMAJ and BMIN columns in arcsec and BPA in degrees,
+        followed by integer CHAN and POL columns and any other metadata
+        columns. CHAN and POL are taken from the metadata when present;
+        otherwise CHAN is the index of the beam and POL is 0, or, for
+        ``(nchan, npol)`` beams, the indices along the two axes.
 
-            chan_name = '*{}'.format(chan)
-            chanbeam_props = beam_props['beams'][chan_name]['*0']
+        Parameters
+        ----------
+        float_format : {'E', 'D'}, optional
+            FITS format of the beam columns. CASA writes single precision
+            ('E'); use 'D' to keep double precision.
 
-            # Can CASA have mixes of units between channels? Let's test just
-            # in case
-            assert maj_unit == u.Unit(chanbeam_props['major']['unit'])
-            assert min_unit == u.Unit(chanbeam_props['minor']['unit'])
-            assert pa_unit == u.Unit(chanbeam_props['positionangle']['unit'])
+        Returns
+        -------
+        bintable : `~astropy.io.fits.BinTableHDU`
+            The beam table.
+        """
 
-            major[chan] = chanbeam_props['major']['value'] * maj_unit
-            minor[chan] = chanbeam_props['minor']['value'] * min_unit
-            pa[chan] = chanbeam_props['positionangle']['value'] * pa_unit
+        if self.ndim > 2:
+            raise ValueError("Only 1-D or (nchan, npol) beams can be written "
+                             "to a beam table.")
+
+        meta = MetaColumns.from_list(self.meta)
+        nbeams = self.size
+
+        columns = [fits.Column(name='BMAJ', format=float_format,
+                               array=self.major.to_value(u.arcsec).ravel(),
+                               unit='arcsec'),
+                   fits.Column(name='BMIN', format=float_format,
+                               array=self.minor.to_value(u.arcsec).ravel(),
+                               unit='arcsec'),
+                   fits.Column(name='BPA', format=float_format,
+                               array=self.pa.to_value(u.deg).ravel(),
+                               unit='deg')]
+
+        if self.ndim == 2:
+            default_chan, default_pol = np.indices(self.shape).reshape(2, -1)
+        else:
+            default_chan = np.arange(nbeams)
+            default_pol = np.zeros(nbeams, dtype=int)
+
+        meta_columns = dict(meta.columns)
+        chan = meta_columns.pop('CHAN', default_chan)
+        pol = meta_columns.pop('POL', default_pol)
+        columns.append(fits.Column(name='CHAN', format='J', array=chan))
+        columns.append(fits.Column(name='POL', format='J', array=pol))
+
+        columns = fits.ColDefs(columns)
+        if meta_columns:
+            # Let astropy pick the FITS formats for the other metadata
+            extra = np.empty(nbeams, dtype=[(key, np.asarray(col).dtype)
+                                            for key, col in meta_columns.items()])
+            for key, col in meta_columns.items():
+                extra[key] = col
+            columns = columns + fits.ColDefs(extra)
+
+        bintable = fits.BinTableHDU.from_columns(columns)
+        bintable.header['EXTNAME'] = 'BEAMS'
+        bintable.header['EXTVER'] = 1
+        bintable.header['NCHAN'] = len(np.unique(chan))
+        bintable.header['NPOL'] = len(np.unique(pol))
+
+        return bintable
+
+    def attach_to_hdulist(self, hdulist, float_format='E'):
+        """
+        Add the beam table to an `~astropy.io.fits.HDUList`, replacing an
+        existing 'BEAMS' extension.
 
-        return cls(major=major, minor=minor, pa=pa)
+        Parameters
+        ----------
+        hdulist : `~astropy.io.fits.HDUList`
+            HDU list to update in place.
+        float_format : {'E', 'D'}, optional
+            Passed to `Beams.to_fits_bintable`.
+
+        Returns
+        -------
+        hdulist : `~astropy.io.fits.HDUList`
+            The updated HDU list.
+        """
+
+        bintable = self.to_fits_bintable(float_format=float_format)
+
+        if 'BEAMS' in hdulist:
+            hdulist['BEAMS'] = bintable
+        else:
+            hdulist.append(bintable)
+
+        return hdulist
+
+    def attach_to_fits_file(self, filename, float_format='E'):
+        """
+        Write the beam table into an existing FITS file, appending a new
+        'BEAMS' extension or replacing the existing one.
+
+        The primary HDU (e.g., the cube) is not rewritten. See
+        `~radio_beam.fits_utils.write_table_extension`.
+
+        Parameters
+        ----------
+        filename : str
+            Name of an existing, uncompressed FITS file.
+        float_format : {'E', 'D'}, optional
+            Passed to `Beams.to_fits_bintable`.
+
+        Returns
+        -------
+        mode : str
+            One of 'appended', 'replaced' or 'rewritten'.
+        """
+
+        return write_table_extension(filename,
+                                     self.to_fits_bintable(float_format=float_format))
+
+    def _to_columns(self):
+        """
+        Arrays and header information used by the binary formats.
+        """
+        meta = MetaColumns.from_list(self.meta)
+
+        columns = {'area': self.to_value(u.sr),
+                   'major': self.major.value,
+                   'minor': self.minor.value,
+                   'pa': self.pa.value}
+        for key, col in meta.columns.items():
+            columns['meta:{}'.format(key)] = col
+
+        header = {'major_unit': self.major.unit.to_string(),
+                  'minor_unit': self.minor.unit.to_string(),
+                  'pa_unit': self.pa.unit.to_string(),
+                  'default_unit': u.Unit(self.default_unit).to_string(),
+                  'meta_keys': list(meta.keys())}
+
+        return columns, header
+
+    @classmethod
+    def _from_columns(cls, columns, header):
+        """
+        Inverse of `Beams._to_columns`. The arrays are used without copying.
+        """
+        meta = MetaColumns({key: columns['meta:{}'.format(key)]
+                            for key in header['meta_keys']},
+                           length=columns['area'].size)
+
+        return cls._from_arrays(columns['area'],
+                                u.Quantity(columns['major'], header['major_unit'],
+                                           copy=False),
+                                u.Quantity(columns['minor'], header['minor_unit'],
+                                           copy=False),
+                                u.Quantity(columns['pa'], header['pa_unit'],
+                                           copy=False),
+                                meta=meta,
+                                default_unit=u.Unit(header['default_unit']))
+
+    def save(self, path, overwrite=False):
+        """
+        Save the beams in a binary columnar format that can be
+        memory-mapped by `Beams.load`.
+
+        The output is a directory with one ``.npy`` file per column (areas,
+        axes, position angles and each metadata key) and a JSON header
+        with the units and ``default_unit``. All beams must have the same
+        metadata keys, with numeric, boolean or string values.
+
+        Parameters
+        ----------
+        path : str
+            Output directory.
+        overwrite : bool, optional
+            Overwrite an existing output.
+        """
+
+        columns, header = self._to_columns()
+        write_columns(path, columns, header, overwrite=overwrite)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Load beams written by `Beams.save`.
+
+        With memory-mapping, the columns are not read until they are used,
+        and the pages are shared between processes that load the same file.
+        The beams are not re-validated on loading.
+
+        Parameters
+        ----------
+        path : str
+            Directory written by `Beams.save`.
+        mmap_mode : {None, 'r', 'r+', 'c'}, optional
+            Memory-mapping mode passed to `numpy.load`. Use `None` to read
+            the columns into memory.
+
+        Returns
+        -------
+        beams : Beams
+            A new Beams object. Metadata is returned as a read-only
+            `~radio_beam.columnar.MetaColumns`.
+        """
+
+        columns, header = read_columns(path, mmap_mode=mmap_mode)
+        return cls._from_columns(columns, header)
+
+    def to_shared_memory(self):
+        """
+        Copy the beams into a shared memory block that other processes can
+        attach to with `Beams.from_shared_memory`.
+
+        The metadata requirements are the same as for `Beams.save`.
+
+        Returns
+        -------
+        shm : `~multiprocessing.shared_memory.SharedMemory`
+            The shared memory block. Pass ``shm.name`` to the workers. The
+            caller must call ``shm.close()`` and ``shm.unlink()`` once the
+            workers are finished.
+        """
+
+        columns, header = self._to_columns()
+        return columns_to_shared_memory(columns, header)
+
+    @classmethod
+    def from_shared_memory(cls, name):
+        """
+        Attach to beams stored in shared memory by `Beams.to_shared_memory`.
+
+        The arrays of the returned object are read-only views of the shared
+        block; nothing is copied. The attachment is released when the
+        returned object (and any slices of it) are deleted.
+
+        Parameters
+        ----------
+        name : str
+            Name of the shared memory block.
+
+        Returns
+        -------
+        beams : Beams
+            A new Beams object.
+        """
+
+        columns, header, shm = columns_from_shared_memory(name)
+        self = cls._from_columns(columns, header)
+        self._shared_memory = shm
+        return self
+
+    @classmethod
+    def from_casa_image(cls, imagename, by_polarization=False):
+        """
+        Instantiate beams from a CASA image.
+
+        The per-plane beams are read in bulk from the image's table keywords,
+        so CASA does not need to be installed (see
+        `~radio_beam.casa_utils.read_casa_beams`). The beams are ordered by
+        channel and then by polarization, with CHAN and POL metadata.
+
+        Parameters
+        ----------
+        imagename : str
+            Name of CASA image.
+        by_polarization : bool, optional
+            Return ``(nchan, npol)`` beams rather than a 1-D set.
+        """
+
+        params = read_casa_beams(imagename)
+        if params is None:
+            raise NoBeamException("The image does not contain a restoring "
+                                  "beam.")
+
+        major, minor, pa = (param.ravel() for param in params)
+        nchan, npol = params[0].shape
+        chan, pol = np.indices((nchan, npol)).reshape(2, -1)
+
+        beams = cls(major=(major * u.deg).to(u.arcsec),
+                    minor=(minor * u.deg).to(u.arcsec),
+                    pa=pa * u.deg,
+                    meta=MetaColumns({'CHAN': chan, 'POL': pol}))
+        return beams.reshape(nchan, npol) if by_polarization else beams
+
+    def by_polarization(self):
+        """
+        Arrange a 1-D set of beams with CHAN and POL metadata (e.g., from a
+        CASA beam table) into ``(nchan, npol)`` beams.
+
+        The table must have one beam for every channel and polarization, in
+        any order. The metadata is reordered to follow the new beams.
+
+        Returns
+        -------
+        beams : Beams
+            Beams indexed by channel and polarization, sorted by the CHAN and
+            POL values.
+        """
+        if self.ndim != 1:
+            raise ValueError("The beams must be 1-D.")
+
+        meta = MetaColumns.from_list(self.meta)
+        if 'CHAN' not in meta.keys() or 'POL' not in meta.keys():
+            raise ValueError("The metadata must have CHAN and POL columns.")
+
+        chans, chan_idx = np.unique(np.asarray(meta.columns['CHAN']),
+                                    return_inverse=True)
+        pols, pol_idx = np.unique(np.asarray(meta.columns['POL']),
+                                  return_inverse=True)
+        shape = (len(chans), len(pols))
+
+        flat_idx = np.ravel_multi_index((chan_idx.ravel(), pol_idx.ravel()),
+                                        shape)
+        if self.size != shape[0] * shape[1] or \
+                len(np.unique(flat_idx)) != self.size:
+            raise ValueError("There must be exactly one beam for every "
+                             "channel and polarization.")
+
+        order = np.argsort(flat_idx)
+        return self[order].reshape(shape)
 
     def average_beam(self, includemask=None, raise_for_nan=True):
         """
@@ -295,20 +829,121 @@ class Beams(u.Quantity):
 
         return new_beam
 
+    def _included(self, includemask=None):
+        """
+        Flat indices of the finite beams, optionally restricted by a mask.
+        """
+        if includemask is None:
+            return np.flatnonzero(self.isfinite)
+        return np.flatnonzero(np.logical_and(includemask, self.isfinite))
+
+    def _summary_params(self, idx):
+        """
+        Area (sr), major and minor (deg), PA (deg) and ellipticity of the
+        beams at the given indices, stacked into one array.
+        """
+        major = self.major.to_value(u.deg).ravel()[idx]
+        minor = self.minor.to_value(u.deg).ravel()[idx]
+        return np.vstack([major * minor * FWHM_TO_AREA * (np.pi / 180.)**2,
+                          major,
+                          minor,
+                          self.pa.to_value(u.deg).ravel()[idx],
+                          1. - minor / major])
+
+    _summary_fields = ('area', 'major', 'minor', 'pa', 'ellipticity')
+    _summary_units = (u.sr, u.deg, u.deg, u.deg, u.dimensionless_unscaled)
+
+    def summary(self, includemask=None, percentiles=(25, 50, 75)):
+        """
+        Summary statistics of the beam properties, computed in a single
+        vectorized pass over the valid beams.
+
+        Parameters
+        ----------
+        includemask : `~numpy.ndarray`, optional
+            Boolean mask of beams to include. Non-finite beams are always
+            excluded.
+        percentiles : sequence of float, optional
+            Percentiles to compute for each property.
+
+        Returns
+        -------
+        summary : dict
+            Dictionary keyed by ``'area'``, ``'major'``, ``'minor'`` and
+            ``'ellipticity'`` (defined as 1 - minor / major). Each entry is
+            a dictionary with the ``'min'``, ``'max'`` and ``'percentiles'``
+            values, and the ``'argmin'`` and ``'argmax'`` indices into this
+            `Beams` object (flat indices for N-dimensional beams).
+        """
+        idx = self._included(includemask)
+        if idx.size == 0:
+            raise ValueError("No finite beams to summarize.")
+
+        # The PA range and percentiles are not meaningful for circular
+        # statistics
+        fields = [ii for ii, name in enumerate(self._summary_fields)
+                  if name != 'pa']
+        params = self._summary_params(idx)[fields]
+        argmins = idx[params.argmin(axis=1)]
+        argmaxs = idx[params.argmax(axis=1)]
+        pcts = np.percentile(params, percentiles, axis=1)
+
+        summary = {}
+        for ii, field in enumerate(fields):
+            unit = self._summary_units[field]
+            summary[self._summary_fields[field]] = {
+                'min': params[ii].min() * unit,
+                'max': params[ii].max() * unit,
+                'argmin': argmins[ii],
+                'argmax': argmaxs[ii],
+                'percentiles': pcts[:, ii] * unit}
+        return summary
+
+    def argsort(self, by='area', includemask=None):
+        """
+        Indices that sort the valid beams by one of their properties.
+
+        Parameters
+        ----------
+        by : {'area', 'major', 'minor', 'pa', 'ellipticity'}, optional
+            Property to sort by.
+        includemask : `~numpy.ndarray`, optional
+            Boolean mask of beams to include. Non-finite beams are always
+            excluded.
+
+        Returns
+        -------
+        indices : `~numpy.ndarray`
+            Indices into this `Beams` object of the included beams, in
+            ascending order of the chosen property. These are flat indices
+            for N-dimensional beams.
+        """
+        if by not in self._summary_fields:
+            raise ValueError("by must be one of "
+                             "{}.".format(", ".join(self._summary_fields)))
+
+        idx = self._included(includemask)
+        values = self._summary_params(idx)[self._summary_fields.index(by)]
+        return idx[np.argsort(values, kind='stable')]
+
+    def _extrema_idx(self, includemask=None):
+        """
+        Indices of the smallest and largest beams by area.
+        """
+        idx = self._included(includemask)
+        areas = (self.major.to_value(u.deg) *
+                 self.minor.to_value(u.deg)).ravel()[idx]
+        return idx[areas.argmin()], idx[areas.argmax()]
+
     def largest_beam(self, includemask=None):
         """
         Returns the largest beam (by area) in a list of beams.
         """
 
-        if includemask is None:
-            includemask = self.isfinite
-        else:
-            includemask = np.logical_and(includemask, self.isfinite)
-
-        largest_idx = (self.major * self.minor)[includemask].argmax()
-        new_beam = Beam(major=self.major[includemask][largest_idx],
-                        minor=self.minor[includemask][largest_idx],
-                        pa=self.pa[includemask][largest_idx])
+        largest_idx = self._extrema_idx(includemask)[1]
+        new_beam = Beam(major=self.major.ravel()[largest_idx],
+                        minor=self.minor.ravel()[largest_idx],
+                        pa=self.pa.ravel()[largest_idx])
 
         return new_beam
 
@@ -317,23 +952,21 @@ class Beams(u.Quantity):
         Returns the smallest beam (by area) in a list of beams.
         """
 
-        if includemask is None:
-            includemask = self.isfinite
-        else:
-            includemask = np.logical_and(includemask, self.isfinite)
-
-        largest_idx = (self.major * self.minor)[includemask].argmin()
-        new_beam = Beam(major=self.major[includemask][largest_idx],
-                        minor=self.minor[includemask][largest_idx],
-                        pa=self.pa[includemask][largest_idx])
+        smallest_idx = self._extrema_idx(includemask)[0]
+        new_beam = Beam(major=self.major.ravel()[smallest_idx],
+                        minor=self.minor.ravel()[smallest_idx],
+                        pa=self.pa.ravel()[smallest_idx])
 
         return new_beam
 
     def extrema_beams(self, includemask=None):
-        return [self.smallest_beam(includemask),
-                self.largest_beam(includemask)]
+        return [Beam(major=self.major.ravel()[idx],
+                     minor=self.minor.ravel()[idx],
+                     pa=self.pa.ravel()[idx])
+                for idx in self._extrema_idx(includemask)]
 
-    def common_beam(self, includemask=None, method='pts', **kwargs):
+    def common_beam(self, includemask=None, method='pts', axis=None,
+                    **kwargs):
         """
         Return the smallest common beam size. For set of two beams,
         the solution is solved analytically. All larger sets solve for the
@@ -362,43 +995,177 @@ class Beams(u.Quantity):
         these `kwargs` may need to be changed for discrepant cases.
 
 
+        For N-dimensional beams, ``axis`` gives the common beam of each set
+        of beams along that axis, e.g. ``axis=0`` for the common beam of
+        each polarization of ``(nchan, npol)`` beams. Identical sets of beams
+        are only solved once.
+
         Parameters
         ----------
         includemask : `~numpy.ndarray`, optional
-            Boolean mask.
+            Boolean mask, with the same shape as the beams.
         method : {'pts'}, optional
             Many beam method. Only `pts` is currently available.
+        axis : int, optional
+            Axis along which to find the common beams. By default, the
+            common beam of all beams is returned.
         kwargs : Passed to `~radio_beam.commonbeam`.
 
+        Returns
+        -------
+        common_beam : `~radio_beam.Beam` or `~radio_beam.Beams`
+            The common beam, or the common beams with the shape of the beams
+            without ``axis``. With ``axis``, the common beams of sets without
+            any included, finite beam are NaN.
         """
-        return commonbeam(self if includemask is None else self[includemask],
-                          method=method, **kwargs)
+        if axis is None:
+            beams = self if self.ndim == 1 else self.ravel()
+            if includemask is not None:
+                beams = beams[np.ravel(includemask)]
+            return commonbeam(beams, method=method, **kwargs)
+
+        if not -self.ndim <= axis < self.ndim:
+            raise ValueError("axis {0} is out of bounds for beams with {1} "
+                             "dimensions.".format(axis, self.ndim))
+
+        # Flat indices of the beams in each set, one set per row
+        groups = np.moveaxis(np.arange(self.size).reshape(self.shape),
+                             axis, -1)
+        out_shape = groups.shape[:-1]
+        groups = groups.reshape(-1, groups.shape[-1])
+
+        flat = self.ravel()
+        if includemask is not None:
+            mask = np.broadcast_to(includemask, self.shape).ravel()
+        props = flat._beamprops()
+        params = np.stack([props['BMAJ'], props['BMIN'], props['BPA']],
+                          axis=-1)
+
+        finite = flat.isfinite
+        solutions = {}
+        common = np.empty((len(groups), 3))
+        for ii, group in enumerate(groups):
+            if includemask is not None:
+                group = group[mask[group]]
+            # Sets without any included, finite beam have a NaN common beam
+            if not finite[group].any():
+                common[ii] = np.nan
+                continue
+            key = params[group].tobytes()
+            if key not in solutions:
+                beam = commonbeam(flat[group], method=method, **kwargs)
+                solutions[key] = (beam.major.to_value(u.deg),
+                                  beam.minor.to_value(u.deg),
+                                  beam.pa.to_value(u.deg))
+            common[ii] = solutions[key]
+
+        if out_shape == ():
+            return Beam(major=common[0, 0] * u.deg, minor=common[0, 1] * u.deg,
+                        pa=common[0, 2] * u.deg)
+
+        return Beams(major=common[:, 0].reshape(out_shape) * u.deg,
+                     minor=common[:, 1].reshape(out_shape) * u.deg,
+                     pa=common[:, 2].reshape(out_shape) * u.deg,
+                     default_unit=self.default_unit)
 
     def __iter__(self):
         for i in range(len(self)):
             yield self[i]
 
+    def _beamprops(self):
+        """
+        Major, minor and PA arrays in degrees, keyed like
+        `~radio_beam.Beam.to_header_keywords` for use with the non-Quantity
+        functions in `~radio_beam.utils`.
+        """
+        return {'BMAJ': self.major.to_value(u.deg),
+                'BMIN': self.minor.to_value(u.deg),
+                'BPA': self.pa.to_value(u.deg)}
+
+    def iter_params(self):
+        """
+        Iterate over the beam parameters without creating `Beam` objects.
+
+        Yields
+        ------
+        params : `BeamParams`
+            Named tuple of the major FWHM, minor FWHM and PA, as floats
+            in degrees.
+        """
+        props = self._beamprops()
+        for params in zip(props['BMAJ'].ravel().tolist(),
+                          props['BMIN'].ravel().tolist(),
+                          props['BPA'].ravel().tolist()):
+            yield BeamParams(*params)
+
+    def records(self):
+        """
+        Return the beam parameters as a structured array.
+
+        Returns
+        -------
+        records : `~numpy.ndarray`
+            Structured array with float fields ``major``, ``minor`` and
+            ``pa``, all in degrees, with the shape of the beams. Iterating
+            over a 1-D set yields one row per beam.
+        """
+        props = self._beamprops()
+        records = np.empty(self.shape, dtype=RECORD_DTYPE)
+        records['major'] = props['BMAJ']
+        records['minor'] = props['BMIN']
+        records['pa'] = props['BPA']
+        return records
+
+    def _broadcast_result(self, new_major, new_minor, new_pa):
+        """
+        Beams from the output of the vectorized convolution functions. The
+        metadata is dropped when broadcasting changed the shape (see
+        `Beams`).
+        """
+        new_major = np.broadcast_to(new_major, np.shape(new_pa))
+        new_minor = np.broadcast_to(new_minor, np.shape(new_pa))
+        meta = self.meta if np.shape(new_pa) == self.shape else None
+
+        return Beams(major=new_major * u.deg, minor=new_minor * u.deg,
+                     pa=(new_pa * u.rad).to(u.deg), meta=meta)
+
     def __mul__(self, other):
-        # Other must be a single beam. Assume multiplying is convolving
-        # as set of beams with a given beam
-        if not isinstance(other, Beam):
+        # Other must be a single beam, or a set of beams that broadcasts
+        # against this one. Assume multiplying is convolving as set of beams
+        # with a given beam
+        if isinstance(other, Beam):
+            other_props = other.to_header_keywords()
+        elif isinstance(other, Beams):
+            other_props = other._beamprops()
+        else:
             raise InvalidBeamOperationError("Multiplication is defined as a "
                                             "convolution of the set of beams "
                                             "with a given beam. Must be "
                                             "multiplied with a Beam object.")
 
-        return Beams(beams=[beam * other for beam in self])
+        new_major, new_minor, new_pa = \
+            convolve_vectorized(self._beamprops(), other_props)
+
+        return self._broadcast_result(new_major, new_minor, new_pa)
 
     def __truediv__(self, other):
-        # Other must be a single beam. Assume dividing is deconvolving
-        # as set of beams with a given beam
-        if not isinstance(other, Beam):
+        # Other must be a single beam, or a set of beams that broadcasts
+        # against this one (e.g., the common beam of each polarization).
+        # Assume dividing is deconvolving as set of beams with a given beam
+        if isinstance(other, Beam):
+            other_props = other.to_header_keywords()
+        elif isinstance(other, Beams):
+            other_props = other._beamprops()
+        else:
             raise InvalidBeamOperationError("Division is defined as a "
                                             "deconvolution of the set of beams"
                                             " with a given beam. Must be "
                                             "divided by a Beam object.")
 
-        return Beams(beams=[beam / other for beam in self])
+        new_major, new_minor, new_pa = \
+            deconvolve_vectorized(self._beamprops(), other_props)
+
+        return self._broadcast_result(new_major, new_minor, new_pa)
 
     def __add__(self, other):
         raise InvalidBeamOperationError("Addition of a set of Beams "
@@ -408,19 +1175,129 @@ class Beams(u.Quantity):
         raise InvalidBeamOperationError("Addition of a set of Beams "
                                         "is not defined.")
 
-    def __eq__(self, other):
-        # other should be a single beam, or a another Beams object
+    def isclose(self, other, atol=1e-10 * u.deg):
+        """
+        Per-beam equality test against a `Beam` or another `Beams` object.
+
+        Uses the same criteria as `Beam.__eq__`: the major and minor axes
+        must agree to within ``atol``, and the position angles (modulo 180
+        degrees) must agree to within ``atol`` unless the beam is circular.
+
+        Parameters
+        ----------
+        other : `~radio_beam.Beam` or `~radio_beam.Beams`
+            Beam to compare every beam with, or a set of beams of the same
+            size to compare element-wise.
+        atol : `~astropy.units.Quantity`, optional
+            Absolute tolerance on the axes and position angle.
+
+        Returns
+        -------
+        mask : `~numpy.ndarray`
+            Boolean array that is `True` where the beams are equal.
+        """
         if isinstance(other, Beam):
-            return np.array([beam == other for beam in self])
+            other_props = other.to_header_keywords()
         elif isinstance(other, Beams):
-            # These should have the same size.
-            if not self.size == other.size:
+            if not self.shape == other.shape:
                 raise InvalidBeamOperationError("Beams objects must have the "
                                                 "same shape to test "
                                                 "equality.")
+            other_props = other._beamprops()
+        else:
+            raise InvalidBeamOperationError("Must test equality with a Beam"
+                                            " or Beams object.")
+
+        return _isclose_beamprops(self._beamprops(), other_props,
+                                  atol.to_value(u.deg))
+
+    def match(self, other, tol=1e-10 * u.deg):
+        """
+        Find, for each beam, the index of an equal beam in another set.
+
+        Equality follows `Beams.isclose`. Rather than comparing every pair of
+        beams, exact duplicates in ``other`` are collapsed, and the beams are
+        binned on their axes and position angle in bins of width ``tol``.
+        Each beam is only compared with the beams in the same or adjacent
+        bins. Circular beams are binned on their axes alone.
 
-            return np.all([beam == other_beam for beam, other_beam in
-                           zip(self, other)])
+        Parameters
+        ----------
+        other : `~radio_beam.Beams`
+            The set of beams to search.
+        tol : `~astropy.units.Quantity`, optional
+            Absolute tolerance on the axes and position angle.
+
+        Returns
+        -------
+        indices : `~numpy.ndarray`
+            Index into ``other`` of the first matching beam for each beam in
+            this set, or -1 where there is no match. For N-dimensional beams, the
+            indices are flat indices into ``other`` and have the shape of
+            this set.
+        """
+        if not isinstance(other, Beams):
+            raise InvalidBeamOperationError("Can only match against another "
+                                            "Beams object.")
+
+        atol = tol.to_value(u.deg)
+        if not atol > 0:
+            raise ValueError("tol must be positive.")
+
+        props = self._beamprops()
+        other_props = other._beamprops()
+        rows = np.column_stack([props['BMAJ'].ravel(), props['BMIN'].ravel(),
+                                props['BPA'].ravel() % 180.])
+        other_rows = np.column_stack([other_props['BMAJ'].ravel(),
+                                      other_props['BMIN'].ravel(),
+                                      other_props['BPA'].ravel() % 180.])
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            iscircular = (rows[:, 0] - rows[:, 1]) / rows[:, 0] <= 1e-6
+        valid = np.all(np.isfinite(rows), axis=1)
+        other_valid = np.flatnonzero(np.all(np.isfinite(other_rows), axis=1))
+
+        indices = np.full(self.size, -1, dtype=int)
+
+        # The PA of circular beams is ignored, so they are matched on the
+        # axes alone. Collapsing identical rows leaves a single candidate
+        # for large runs of equal beams.
+        for query, ncols in ((valid & ~iscircular, 3), (valid & iscircular, 2)):
+            query_idx = np.flatnonzero(query)
+            unique_rows, first_idx = np.unique(other_rows[other_valid, :ncols],
+                                               axis=0, return_index=True)
+            first_idx = other_valid[first_idx]
+
+            beam_idx, cand_idx = _neighbour_pairs(rows[query_idx, :ncols],
+                                                  unique_rows, atol)
+            beam_idx = query_idx[beam_idx]
+
+            cand_rows = np.zeros((len(cand_idx), 3))
+            cand_rows[:, :ncols] = unique_rows[cand_idx]
+            is_match = _isclose_beamprops({'BMAJ': rows[beam_idx, 0],
+                                           'BMIN': rows[beam_idx, 1],
+                                           'BPA': rows[beam_idx, 2]},
+                                          {'BMAJ': cand_rows[:, 0],
+                                           'BMIN': cand_rows[:, 1],
+                                           'BPA': cand_rows[:, 2]},
+                                          atol)
+            beam_idx = beam_idx[is_match]
+            match_idx = first_idx[cand_idx[is_match]]
+
+            # Keep the first matching beam in ``other``
+            order = np.lexsort((match_idx, beam_idx))
+            matched_beams, first = np.unique(beam_idx[order],
+                                             return_index=True)
+            indices[matched_beams] = match_idx[order][first]
+
+        return indices.reshape(self.shape)
+
+    def __eq__(self, other):
+        # other should be a single beam, or a another Beams object
+        if isinstance(other, Beam):
+            return self.isclose(other)
+        elif isinstance(other, Beams):
+            return bool(np.all(self.isclose(other)))
         else:
             raise InvalidBeamOperationError("Must test equality with a Beam"
                                             " or Beams object.")
@@ -434,3 +1311,367 @@ class Beams(u.Quantity):
         # If other is a Beams, will get boolean back
         else:
             return not eq_out
+
+    def as_kernels(self, pixscale, shape=None, support_scaling=8,
+                   mode='center', factor=10, truncation=None):
+        """
+        Return the elliptical Gaussian kernels of all beams as one array.
+
+        The kernels are computed together on a common grid, e.g. for batched
+        FFT convolution of the channels of a cube.
+
+        .. warning::
+            This method is not aware of any misalignment between pixel
+            and world coordinates. Use `as_kernels_for_wcs` for rotated or
+            non-square pixels.
+
+        Parameters
+        ----------
+        pixscale : `~astropy.units.Quantity`
+            Conversion from angular to pixel size.
+        shape : tuple of int, optional
+            Shape ``(ny, nx)`` of each kernel. By default, the square odd
+            size that fits the largest of the kernels from
+            `~radio_beam.Beam.as_kernel`.
+        support_scaling : int, optional
+            The amount to scale the kernel extent by for the default shape.
+        mode : str, optional
+            Discretization mode. See `~radio_beam.EllipticalGaussian2DKernel`.
+        factor : number, optional
+            Factor of oversampling for the 'oversample' mode.
+        truncation : float, optional
+            Maximum fraction of the integral of each Gaussian outside of the
+            kernel. If given, the default shape is the smallest odd shape
+            that meets it for all beams, instead of using support_scaling.
+
+        Returns
+        -------
+        kernels : `~numpy.ndarray`
+            C-contiguous float array of shape ``self.shape + (ny, nx)``.
+            Each kernel is normalized to a sum of one. Beams that are not
+            finite give NaN kernels.
+        """
+        return _kernel_stack(*self._pixel_gaussian(pixscale), shape=shape,
+                             support_scaling=support_scaling, mode=mode,
+                             factor=factor, truncation=truncation)
+
+    def as_kernels_for_wcs(self, mywcs, shape=None, support_scaling=8,
+                           mode='center', factor=10, truncation=None):
+        """
+        Return the elliptical Gaussian kernels of all beams in the pixel
+        coordinates of a WCS, as one array.
+
+        The beams are transformed with the full PC (or CD) matrix of the
+        celestial axes, computed once for all beams. See
+        `~radio_beam.Beam.as_kernel_for_wcs` and `as_kernels`.
+
+        Parameters
+        ----------
+        mywcs : `~astropy.wcs.WCS`
+            WCS with two celestial axes.
+        shape : tuple of int, optional
+            Shape ``(ny, nx)`` of each kernel. By default, the square odd
+            size that fits the largest of the kernels.
+        support_scaling : int, optional
+            The amount to scale the kernel extent by for the default shape.
+        mode : str, optional
+            Discretization mode. See `~radio_beam.EllipticalGaussian2DKernel`.
+        factor : number, optional
+            Factor of oversampling for the 'oversample' mode.
+        truncation : float, optional
+            Maximum fraction of the integral of each Gaussian outside of the
+            kernel, for the default shape.
+
+        Returns
+        -------
+        kernels : `~numpy.ndarray`
+            C-contiguous float array of shape ``self.shape + (ny, nx)``,
+            with kernels normalized to a sum of one.
+        """
+        params = _transform_gaussian(self.major.to_value(u.deg),
+                                     self.minor.to_value(u.deg),
+                                     self.pa.to_value(u.rad),
+                                     _wcs_pixel_transform(mywcs))
+
+        return _kernel_stack(*params, shape=shape,
+                             support_scaling=support_scaling, mode=mode,
+                             factor=factor, truncation=truncation)
+
+    def as_fourier_kernels(self, shape, pixscale, real=True, dtype=float):
+        """
+        Return the Fourier transforms of the kernels of all beams on a FFT
+        grid, as one array.
+
+        See `~radio_beam.Beam.as_fourier_kernel`.
+
+        Parameters
+        ----------
+        shape : tuple of int
+            Shape ``(ny, nx)`` of the images to convolve.
+        pixscale : `~astropy.units.Quantity`
+            Conversion from angular to pixel size.
+        real : bool, optional
+            Return the half-planes of `numpy.fft.rfft2`. Otherwise return
+            the full planes of `numpy.fft.fft2`.
+        dtype : data-type, optional
+            Float type of the result, e.g. `numpy.float32`.
+
+        Returns
+        -------
+        kernels : `~numpy.ndarray`
+            Array of shape ``self.shape + (ny, nx // 2 + 1)``, or
+            ``self.shape + (ny, nx)`` when ``real`` is `False`.
+        """
+        stddev_maj, stddev_min, angle = self._pixel_gaussian(pixscale)
+        return _gaussian_transfer_function(stddev_maj, stddev_min, angle,
+                                           shape, real=real, dtype=dtype)
+
+    def convolve_cube_to(self, target, data, pixscale, workers=None,
+                         support_scaling=8, out=None):
+        """
+        Convolve every plane of a cube from these beams to a target beam.
+
+        See `~radio_beam.convolution.convolve_cube`.
+
+        Parameters
+        ----------
+        target : `~radio_beam.Beam`
+            Beam to convolve to, e.g. from `~radio_beam.Beams.common_beam`.
+        data : `~numpy.ndarray` or `~astropy.units.Quantity`
+            Cube of shape ``self.shape + (ny, nx)``.
+        pixscale : `~astropy.units.Quantity`
+            Conversion from angular to pixel size.
+        workers : int, optional
+            Number of threads.
+        support_scaling : int, optional
+            Sets the zero-padding of the planes.
+        out : `~numpy.ndarray`, optional
+            Output array of the same shape as ``data``.
+
+        Returns
+        -------
+        out : `~numpy.ndarray` or `~astropy.units.Quantity`
+            The convolved cube.
+        """
+        return convolve_cube(data, self, target, pixscale, workers=workers,
+                             support_scaling=support_scaling, out=out)
+
+    def _pixel_gaussian(self, pixscale):
+        """
+        Standard deviations in pixels and angles in radians of the beam
+        Gaussians, as arrays.
+        """
+        stddev_maj = (self.major / (pixscale * SIGMA_TO_FWHM)).to_value(
+            u.dimensionless_unscaled)
+        stddev_min = (self.minor / (pixscale * SIGMA_TO_FWHM)).to_value(
+            u.dimensionless_unscaled)
+        # position angle is defined as CCW from north
+        # "angle" is conventionally defined as CCW from "west".
+        # Therefore, add 90 degrees
+        angle = (90 * u.deg + self.pa).to_value(u.rad)
+
+        return stddev_maj, stddev_min, angle
+
+
+def _kernel_stack(stddev_maj, stddev_min, angle, shape=None,
+                  support_scaling=8, mode='center', factor=10,
+                  truncation=None):
+    """
+    Normalized kernels of arrays of Gaussian parameters in pixels on a
+    common grid, for `Beams.as_kernels` and `Beams.as_kernels_for_wcs`.
+    """
+    from astropy.modeling.utils import ellipse_extent
+
+    if shape is None:
+        extent = ellipse_extent(stddev_maj, stddev_min, angle)
+        if not np.any(np.isfinite(extent)):
+            raise ValueError("The default kernel shape requires at least "
+                             "one finite beam.")
+        if truncation is None:
+            size = _round_up_to_odd_integer(support_scaling * 2 *
+                                            np.nanmax(extent))
+            shape = (size, size)
+        else:
+            x_size, y_size = _gaussian_support(np.nanmax(extent[0]),
+                                               np.nanmax(extent[1]),
+                                               truncation)
+            shape = (y_size, x_size)
+    elif len(shape) != 2 or any(int(size) != size for size in shape):
+        raise TypeError("shape should be a tuple of two integers.")
+
+    kernels = _gaussian_kernel_array(stddev_maj, stddev_min, angle,
+                                     int(shape[1]), int(shape[0]),
+                                     mode=mode, factor=factor)
+    kernels /= kernels.sum(axis=(-2, -1), keepdims=True)
+
+    return np.ascontiguousarray(kernels, dtype=float)
+
+
+# Non-standard unit names used in beam tables (e.g., AIPS writes DEGREES),
+# keyed by the upper-case TUNIT value.
+BINTABLE_UNIT_ALIASES = {'DEGREES': u.deg,
+                         'DEGREE': u.deg,
+                         'DEG': u.deg,
+                         'ARCSEC': u.arcsec,
+                         'ARCSECS': u.arcsec,
+                         'ARCMIN': u.arcmin,
+                         'ARCMINS': u.arcmin,
+                         'RADIANS': u.rad,
+                         'RAD': u.rad}
+
+
+def _bintable_unit(bintable, name, default=None):
+    """
+    Unit of a beam table column from its TUNIT keyword.
+    """
+    col_num = bintable.columns.names.index(name) + 1
+    unit = bintable.header.get('TUNIT{}'.format(col_num), None)
+
+    if unit is None or not unit.strip():
+        if default is None:
+            raise ValueError("No unit given for the {} column.".format(name))
+        return default
+
+    unit = unit.strip()
+    return BINTABLE_UNIT_ALIASES.get(unit.upper(), None) or u.Unit(unit)
+
+
+def _native_column(column):
+    """
+    Copy of a table column as a plain array in the native byte order, so
+    that it does not share memory with the (big-endian) FITS table.
+    """
+    column = np.asarray(column)
+    return np.array(column, dtype=column.dtype.newbyteorder('='))
+
+
+def _bintable_beam_columns(bintable):
+    """
+    The BMAJ, BMIN and BPA columns of a beam table as float64 Quantities,
+    using the units from the table header. The columns are copied.
+    """
+
+    # BPA is assumed to be in degrees if no unit is given
+    major = u.Quantity(bintable.data['BMAJ'], _bintable_unit(bintable, 'BMAJ'),
+                       dtype=np.float64)
+    minor = u.Quantity(bintable.data['BMIN'], _bintable_unit(bintable, 'BMIN'),
+                       dtype=np.float64)
+    pa = u.Quantity(bintable.data['BPA'],
+                    _bintable_unit(bintable, 'BPA', default=u.deg),
+                    dtype=np.float64)
+
+    return major, minor, pa
+
+
+def _read_fits_file_beam(filename, ext):
+    """
+    Major, minor and PA in degrees of the beam in a FITS file header, and
+    the exception raised when reading or validating it (or `None`). Defined
+    at the module level so that it can be used with a process pool.
+    """
+    try:
+        # The primary header is parsed from its raw cards
+        if ext == 0:
+            header = read_header_bytes(filename)
+        else:
+            header = fits.getheader(filename, ext=ext)
+        params = beam_params_from_header(header)
+        if params is None:
+            raise NoBeamException("No BMAJ found and does not appear to be "
+                                  "a CASA/AIPS header.")
+
+        bmaj, bmin, bpa = params
+        if not (np.all(np.isfinite(params)) and bmaj > 0 and bmin > 0):
+            raise ValueError("Invalid beam with BMAJ={0}, BMIN={1} and "
+                             "BPA={2}.".format(bmaj, bmin, bpa))
+        if bmin > bmaj:
+            raise ValueError("Minor axis greater than major axis.")
+        return params, None
+    except Exception as exc:
+        return None, exc
+
+
+def _rebuild_beams(cls, area, major, major_unit, minor, minor_unit,
+                   pa, pa_unit, meta, default_unit):
+    """
+    Unpickle a `Beams` object from the arrays stored by `Beams.__reduce__`.
+    """
+    return cls._from_arrays(area,
+                            u.Quantity(major, major_unit, copy=False),
+                            u.Quantity(minor, minor_unit, copy=False),
+                            u.Quantity(pa, pa_unit, copy=False),
+                            meta=meta, default_unit=default_unit)
+
+
+def _bin_keys(bins, other_bins):
+    """
+    Integer keys of the rows of ``bins``, equal to the key of the same row in
+    ``other_bins``, or -1 where ``other_bins`` has no such row. The columns
+    are combined one at a time, so the keys stay below the number of rows.
+    """
+    keys = np.zeros(len(bins), dtype=np.int64)
+    other_keys = np.zeros(len(other_bins), dtype=np.int64)
+    found = np.ones(len(bins), dtype=bool)
+
+    for col in range(bins.shape[1]):
+        values = np.unique(other_bins[:, col])
+        keys = keys * len(values) + np.searchsorted(values, bins[:, col])
+        other_keys = (other_keys * len(values) +
+                      np.searchsorted(values, other_bins[:, col]))
+
+        unique_keys, other_keys = np.unique(other_keys, return_inverse=True)
+        pos = np.searchsorted(unique_keys, keys)
+        found &= unique_keys[np.minimum(pos, len(unique_keys) - 1)] == keys
+        keys = pos
+
+    keys[~found] = -1
+    return keys, other_keys
+
+
+def _neighbour_pairs(rows, other_rows, atol):
+    """
+    Pairs of indices into ``rows`` and ``other_rows`` whose bins of width
+    ``atol`` are the same or adjacent in every column. This includes every
+    pair that agrees to within ``atol`` in all columns.
+    """
+    if len(rows) == 0 or len(other_rows) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+    bins = np.floor(rows / atol).astype(np.int64)
+    other_bins = np.floor(other_rows / atol).astype(np.int64)
+
+    row_idx = []
+    other_idx = []
+    for offset in itertools.product((-1, 0, 1), repeat=rows.shape[1]):
+        keys, other_keys = _bin_keys(bins + offset, other_bins)
+        order = np.argsort(other_keys, kind='stable')
+        lower = np.searchsorted(other_keys[order], keys, side='left')
+        upper = np.searchsorted(other_keys[order], keys, side='right')
+        counts = upper - lower
+
+        # Expand the ranges of equal keys to flat pairs
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                      counts)
+        row_idx.append(np.repeat(np.arange(len(rows)), counts))
+        other_idx.append(order[np.repeat(lower, counts) + offsets])
+
+    return np.concatenate(row_idx), np.concatenate(other_idx)
+
+
+def _isclose_beamprops(beamprops1, beamprops2, atol):
+    """
+    Vectorized form of `Beam.__eq__` on beam parameters in degrees.
+    The PA is ignored where the first beam is circular.
+    """
+    maj1 = beamprops1['BMAJ']
+    min1 = beamprops1['BMIN']
+
+    equal_maj = np.abs(maj1 - beamprops2['BMAJ']) < atol
+    equal_min = np.abs(min1 - beamprops2['BMIN']) < atol
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        iscircular = (maj1 - min1) / maj1 <= 1e-6
+
+    equal_pa = np.abs(beamprops1['BPA'] % 180. - beamprops2['BPA'] % 180.) < atol
+
+    return equal_maj & equal_min & (iscircular | equal_pa)
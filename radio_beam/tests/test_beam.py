@@ -12,13 +12,9 @@ import numpy.testing as npt
 from astropy.tests.helper import assert_quantity_allclose
 from itertools import product
 
-try:
-    from taskinit import ia
-    HAS_CASA = True
-except ImportError:
-    HAS_CASA = False
-
 from ..utils import RadioBeamDeprecationWarning, BeamError
+from ..fits_utils import (beam_params_from_header, beam_params_from_history,
+                          read_header_bytes)
 
 
 data_dir = os.path.join(os.path.dirname(__file__), 'data')
@@ -100,17 +96,28 @@ def test_bintable():
                             45.10050065568665, decimal=4)
 
 
-@pytest.mark.skipif("not HAS_CASA")
-def test_from_casa_image():
-    # Extract from tar
+def extract_casa_image(path):
     import tarfile
     fname_tar = data_path("NGC0925.bima.mmom0.image.tar.gz")
-    tar = tarfile.open(fname_tar)
-    tar.extractall(path=data_dir)
-    tar.close()
-    fname = data_path("NGC0925.bima.mmom0.image")
+    with tarfile.open(fname_tar) as tar:
+        if hasattr(tarfile, 'data_filter'):
+            tar.extractall(path=path, filter='data')
+        else:
+            tar.extractall(path=path)
+    return os.path.join(path, "NGC0925.bima.mmom0.image")
+
+
+def test_from_casa_image(tmp_path):
+    # Read without CASA and compare to the FITS export of the image
+    fname = extract_casa_image(str(tmp_path))
     bima_casa_beam = Beam.from_casa_image(fname)
 
+    bima_fits_beam = Beam.from_fits_header(data_path("NGC0925.bima.mmom0.fits.gz"))
+    assert bima_casa_beam == bima_fits_beam
+    assert bima_casa_beam.major.unit == u.arcsec
+    npt.assert_allclose(bima_casa_beam.major.value, 6.109177367772)
+    npt.assert_allclose(bima_casa_beam.pa.to_value(u.deg), -4.25654315948)
+
 
 def test_attach_to_header():
     fname = data_path("NGC0925.bima.mmom0.fits.gz")
@@ -127,6 +134,121 @@ def test_attach_to_header():
     npt.assert_equal(new_hdr["BPA"], hdr["BPA"])
 
 
+def test_history_precedence():
+
+    history = ["AIPS   CLEAN BMAJ=  1.0000E-03 BMIN=  5.0000E-04 BPA=  10.00",
+               "> restoration: 1.5 by 0.75 (arcsec) at pa 20.0 (deg)",
+               "> restoration: 2.5 by 1.25 (arcsec) at pa 30.0 (deg)",
+               "CONVL BMAJ=  2.9700 BMIN=  1.6500 BPA= -15.1/Output beam",
+               "AIPS   CLEAN BMAJ=  2.0000E-03 BMIN=  1.0000E-03 BPA= -40.00"]
+
+    # The last CASA entry wins over any AIPS entry
+    npt.assert_allclose(beam_params_from_history(history),
+                        (2.5 / 3600, 1.25 / 3600, 30.))
+
+    # Otherwise the last AIPS entry is used
+    aips_only = [line for line in history if 'restoration' not in line]
+    npt.assert_allclose(beam_params_from_history(aips_only),
+                        (2e-3, 1e-3, -40.))
+
+    assert beam_params_from_history(["Nothing here"]) is None
+
+    hdr = fits.Header()
+    for line in history:
+        hdr.add_history(line)
+    beam = Beam.from_fits_history(hdr)
+    assert beam.major.unit == u.arcsec
+    npt.assert_allclose(beam.major.value, 2.5)
+    npt.assert_allclose(beam.pa.to_value(u.deg), 30.)
+
+
+@pytest.mark.parametrize("filename", ["ngc0925_na.fits.gz",
+                                      "m83.moment0.fits.gz"])
+def test_beam_params_from_header_bytes(filename):
+
+    fname = data_path(filename)
+    raw = read_header_bytes(fname)
+    assert len(raw) % 2880 == 0
+
+    beam = Beam.from_fits_header(fname)
+    expected = (beam.major.to_value(u.deg), beam.minor.to_value(u.deg),
+                beam.pa.to_value(u.deg))
+
+    npt.assert_allclose(beam_params_from_header(raw), expected)
+    npt.assert_allclose(beam_params_from_header(raw.decode('ascii')), expected)
+    npt.assert_allclose(beam_params_from_header(fits.getheader(fname)),
+                        expected)
+
+
+def test_beam_params_from_header_keywords():
+
+    hdr = fits.Header()
+    hdr['BMAJ'] = 1e-3
+    hdr['BPA'] = 45.
+    hdr.add_history("> restoration: 2.5 by 1.25 (arcsec) at pa 30.0 (deg)")
+    raw = hdr.tostring()
+
+    # Keywords take precedence over the history; BMIN defaults to BMAJ
+    assert beam_params_from_header(raw) == (1e-3, 1e-3, 45.)
+    assert beam_params_from_header(hdr) == (1e-3, 1e-3, 45.)
+
+    aips_hdr = fits.Header.fromtextfile(data_path("header_aips.hdr"))
+    npt.assert_allclose(beam_params_from_history(aips_hdr['HISTORY']),
+                        (8.2477E-04, 4.5736E-04, -15.06))
+
+    assert beam_params_from_header(fits.Header().tostring()) is None
+
+
+def test_attach_to_fits_file(tmp_path):
+
+    from ..fits_utils import update_beam_headers
+
+    data = np.arange(16, dtype=np.float32).reshape((4, 4))
+    beam = Beam(1 * u.arcsec, 0.5 * u.arcsec, 30 * u.deg)
+
+    # New keywords fit in the padding of the header block
+    filename = str(tmp_path / "image.fits")
+    fits.PrimaryHDU(data).writeto(filename)
+    size = os.path.getsize(filename)
+
+    assert beam.attach_to_fits_file(filename) == 'inplace'
+    assert os.path.getsize(filename) == size
+    assert Beam.from_fits_header(filename) == beam
+
+    # Existing keywords are overwritten
+    new_beam = Beam(2 * u.arcsec)
+    assert new_beam.attach_to_fits_file(filename) == 'inplace'
+    assert Beam.from_fits_header(filename) == new_beam
+    npt.assert_equal(fits.getdata(filename), data)
+
+    # A full header block needs to be rewritten
+    full_filename = str(tmp_path / "image_full.fits")
+    hdu = fits.PrimaryHDU(data)
+    while len(hdu.header) < 35:
+        hdu.header['KEY{}'.format(len(hdu.header))] = 1
+    hdu.writeto(full_filename)
+
+    assert beam.attach_to_fits_file(full_filename) == 'rewritten'
+    assert Beam.from_fits_header(full_filename) == beam
+    npt.assert_equal(fits.getdata(full_filename), data)
+
+    # Batch update over many files
+    filenames = []
+    for i in range(5):
+        fname = str(tmp_path / "batch{}.fits".format(i))
+        fits.PrimaryHDU(data).writeto(fname)
+        filenames.append(fname)
+
+    beams = [Beam((i + 1) * u.arcsec) for i in range(5)]
+    assert update_beam_headers(filenames, beams, workers=2) == ['inplace'] * 5
+
+    for fname, this_beam in zip(filenames, beams):
+        assert Beam.from_fits_header(fname) == this_beam
+
+    with pytest.raises(ValueError):
+        update_beam_headers(filenames, beams[:2])
+
+
 def test_beam_projected_area():
 
     distance = 250 * u.pc
@@ -0,0 +1,153 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+
+import os
+import shutil
+
+import pytest
+import numpy as np
+import numpy.testing as npt
+from astropy import units as u
+from astropy.io import fits
+
+from ..beam import Beam
+from ..multiple_beams import Beams
+from ..beam_index import BeamIndex
+from .test_beam import data_path
+
+
+def make_files(tmp_path):
+
+    cube = str(tmp_path / 'cube.fits.gz')
+    shutil.copy(data_path('m33_beams_bintable.fits.gz'), cube)
+
+    image = str(tmp_path / 'image.fits')
+    hdu = fits.PrimaryHDU(np.zeros((2, 2)))
+    hdu.header.update(Beam(1.5 * u.arcsec).to_header_keywords())
+    hdu.writeto(image)
+
+    return cube, image
+
+
+def test_beam_index_update_and_query(tmp_path):
+
+    cube, image = make_files(tmp_path)
+    cube_beams = Beams.from_fits_file(cube)
+
+    with BeamIndex(str(tmp_path / 'index.sqlite')) as index:
+        assert index.update([cube, image]) == [cube, image]
+        assert len(index) == 2
+        assert image in index
+
+        # Unchanged files are not read again
+        assert index.update([cube, image]) == []
+
+        npt.assert_allclose(index.beams(cube).major.to_value(u.arcsec),
+                            cube_beams.major.to_value(u.arcsec))
+
+        found = index.query(major=(1.4 * u.arcsec, 1.6 * u.arcsec))
+        assert list(found.meta.columns['FILENAME']) == [image]
+        assert found[0] == Beam(1.5 * u.arcsec)
+
+        threshold = np.median(cube_beams.major)
+        found = index.query(major=(threshold, None))
+        expected = cube_beams.major >= threshold
+        assert len(found) == expected.sum()
+        npt.assert_equal(found.meta.columns['CHAN'],
+                         np.asarray(cube_beams.meta.columns['CHAN'])[expected])
+
+        found = index.query(area=(None, Beam(1.5 * u.arcsec).sr))
+        assert image in found.meta.columns['FILENAME']
+
+        assert len(index.query(major=(1 * u.deg, None))) == 0
+
+
+def test_beam_index_common_beams(tmp_path):
+
+    cube, image = make_files(tmp_path)
+    path = str(tmp_path / 'index.sqlite')
+
+    with BeamIndex(path) as index:
+        index.update([cube, image])
+        common = index.common_beam(cube)
+        assert common == Beams.from_fits_file(cube).common_beam()
+        assert index.common_beam(image) == Beam(1.5 * u.arcsec)
+
+    # The index and the cached common beams persist
+    with BeamIndex(path) as index:
+        assert index.filenames == [cube, image]
+
+        found = index.query_common_beams(major=(None, 2 * u.arcsec))
+        assert list(found.meta.columns['FILENAME']) == [image]
+        found = index.query_common_beams(major=(2 * u.arcsec, None))
+        assert list(found.meta.columns['FILENAME']) == [cube]
+        assert found[0] == common
+
+
+def test_beam_index_refresh(tmp_path):
+
+    cube, image = make_files(tmp_path)
+
+    with BeamIndex(str(tmp_path / 'index.sqlite')) as index:
+        index.update([cube, image])
+        assert index.common_beam(image) == Beam(1.5 * u.arcsec)
+
+        Beam(3 * u.arcsec).attach_to_fits_file(image)
+        stat = os.stat(image)
+        os.utime(image, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        os.remove(cube)
+
+        assert index.refresh() == [image]
+        assert index.filenames == [image]
+        assert index.common_beam(image) == Beam(3 * u.arcsec)
+        assert len(index.query()) == 1
+
+
+def test_beam_index_errors(tmp_path):
+
+    bad = str(tmp_path / 'nobeam.fits')
+    fits.PrimaryHDU(np.zeros((2, 2))).writeto(bad)
+
+    with BeamIndex(':memory:') as index:
+        with pytest.warns(UserWarning, match='Could not read the beams'):
+            assert index.update([bad]) == []
+        assert len(index) == 0
+
+        with pytest.raises(KeyError):
+            index.common_beam(bad)
+
+        with pytest.raises(ValueError):
+            index.update([bad], on_error='skip')
+
+        # Missing files go through on_error as well
+        missing = str(tmp_path / 'missing.fits')
+        with pytest.warns(UserWarning, match='Could not read the beams'):
+            assert index.update([missing]) == []
+        assert index.update([missing], on_error='ignore') == []
+        with pytest.raises(FileNotFoundError):
+            index.update([missing], on_error='raise')
+
+
+def test_beam_index_common_beam_errors(tmp_path):
+
+    cube, image = make_files(tmp_path)
+
+    # A file without any finite beams has no common beam
+    nan_cube = str(tmp_path / 'nan_cube.fits')
+    fits.PrimaryHDU(np.zeros((2, 2, 2))).writeto(nan_cube)
+    Beams(major=[np.nan, np.nan] * u.arcsec).attach_to_fits_file(nan_cube)
+
+    with BeamIndex(':memory:') as index:
+        index.update([nan_cube, image, cube])
+        assert not index.beams(nan_cube).isfinite.any()
+
+        with pytest.raises(ValueError):
+            index.query_common_beams(on_error='raise')
+
+        # The other files are still found
+        with pytest.warns(UserWarning, match='Could not find the common beam'):
+            found = index.query_common_beams()
+        assert list(found.meta.columns['FILENAME']) == [image, cube]
+
+        found = index.query_common_beams(major=(None, 2 * u.arcsec),
+                                         on_error='ignore')
+        assert list(found.meta.columns['FILENAME']) == [image]
@@ -4,11 +4,14 @@ import numpy.testing as npt
 from astropy import units as u
 from astropy.io import fits
 
+import os
+import struct
 import warnings
 import pytest
 
 from ..multiple_beams import Beams
 from ..beam import Beam
+from ..columnar import MetaColumns
 from ..commonbeam import common_2beams, common_manybeams_mve, find_commonbeam_between
 from ..utils import InvalidBeamOperationError, BeamError
 
@@ -85,6 +88,427 @@ def test_beams_from_fits_bintable_nonarcsec():
     assert (beams.pa.to(u.deg).value == bintable.data['BPA']).all()
 
 
+@pytest.mark.parametrize(("unit_str", "unit"),
+                         [("DEGREES", u.deg), ("ARCSEC", u.arcsec),
+                          ("arcmin", u.arcmin)])
+def test_beams_from_fits_bintable_unit_aliases(unit_str, unit):
+
+    fname = data_path("m33_beams_bintable.fits.gz")
+
+    with fits.open(fname) as hdulist:
+        bintable = hdulist[1].copy()
+
+    bintable.header['TUNIT1'] = unit_str
+    bintable.header['TUNIT2'] = unit_str
+    bintable.header['TUNIT3'] = 'DEGREES'
+
+    beams = Beams.from_fits_bintable(bintable)
+
+    assert beams.major.unit == unit
+    assert beams.minor.unit == unit
+    assert beams.pa.unit == u.deg
+    npt.assert_equal(beams.major.value, bintable.data['BMAJ'])
+
+
+def test_beams_from_fits_bintable_meta():
+
+    fname = data_path("m33_beams_bintable.fits.gz")
+
+    with fits.open(fname) as hdulist:
+        bintable = hdulist[1].copy()
+
+    beams = Beams.from_fits_bintable(bintable)
+
+    row_meta = [{key: row[key] for key in ('CHAN', 'POL')}
+                for row in bintable.data]
+    assert beams.meta == row_meta
+    npt.assert_equal(beams.meta.columns['CHAN'], bintable.data['CHAN'])
+
+    # The columns are copied to native float64 and integer arrays
+    assert beams.major.dtype == np.float64
+    assert not np.shares_memory(beams.major.value, bintable.data['BMAJ'])
+    chan = beams.meta.columns['CHAN']
+    assert chan.dtype.isnative
+    assert not np.shares_memory(chan, bintable.data['CHAN'])
+
+    # The rows are read-only, while single beams get their own dictionary
+    with pytest.raises(TypeError):
+        beams.meta[0]['OBJECT'] = 'M33'
+    beams[0].meta['OBJECT'] = 'M33'
+    assert 'OBJECT' not in beams.meta[0]
+
+    meta = beams.meta.to_list()
+    meta[0]['OBJECT'] = 'M33'
+    beams.meta = meta
+    assert beams.meta[0]['OBJECT'] == 'M33'
+
+    del bintable.header['TUNIT1']
+    with pytest.raises(ValueError, match="No unit given for the BMAJ"):
+        Beams.from_fits_bintable(bintable)
+
+
+def test_beams_from_fits_file(tmp_path):
+
+    fname = data_path("m33_beams_bintable.fits.gz")
+
+    with fits.open(fname) as hdulist:
+        bintable = hdulist[1].copy()
+
+    beams_bintable = Beams.from_fits_bintable(bintable)
+
+    # Put the beam table after a data HDU in an uncompressed file
+    outname = str(tmp_path / "cube.fits")
+    hdulist = fits.HDUList([fits.PrimaryHDU(np.ones((4, 8, 8), dtype=np.float32)),
+                            bintable])
+    hdulist.writeto(outname)
+
+    beams = Beams.from_fits_file(outname)
+
+    assert beams == beams_bintable
+    assert beams.meta == beams_bintable.meta
+    assert beams[10:12].meta[0] == beams_bintable.meta[10]
+
+    assert Beams.from_fits_file(outname, ext=1) == beams_bintable
+
+    with pytest.raises(TypeError):
+        Beams.from_fits_file(outname, ext=0)
+
+
+@pytest.mark.parametrize("use_processes", [False, True])
+def test_beams_from_fits_files(tmp_path, use_processes):
+
+    filenames = [data_path("NGC0925.bima.mmom0.fits.gz"),
+                 data_path("ngc0925_na.fits.gz"),
+                 data_path("m83.moment0.fits.gz")]
+
+    nobeam_filename = str(tmp_path / "nobeam.fits")
+    fits.PrimaryHDU(np.ones((2, 2))).writeto(nobeam_filename)
+
+    # Invalid beams are reported like files without a beam
+    header = fits.Header({'BMAJ': 1e-4, 'BMIN': 2e-4, 'BPA': 0.})
+    badbeam_filename = str(tmp_path / "badbeam.fits")
+    fits.PrimaryHDU(np.ones((2, 2)), header=header).writeto(badbeam_filename)
+
+    all_filenames = filenames + [nobeam_filename, badbeam_filename]
+
+    with pytest.warns(UserWarning, match="Could not read the beam"):
+        beams = Beams.from_fits_files(all_filenames, workers=2,
+                                      use_processes=use_processes)
+
+    assert len(beams) == 5
+    for i, filename in enumerate(filenames):
+        assert beams[i] == Beam.from_fits_header(filename)
+        assert beams.meta[i]['FILENAME'] == filename
+        assert beams.meta[i]['ERROR'] == ''
+
+    npt.assert_equal(beams.isfinite, [True, True, True, False, False])
+    assert beams.meta[3]['ERROR'].startswith('NoBeamException')
+    assert beams.meta[4]['ERROR'] == ("ValueError: Minor axis greater than "
+                                      "major axis.")
+
+    beams = Beams.from_fits_files(all_filenames, on_error='ignore')
+    npt.assert_equal(beams.isfinite, [True, True, True, False, False])
+
+    with pytest.raises(Exception, match="No BMAJ found"):
+        Beams.from_fits_files(all_filenames, on_error='raise')
+
+    with pytest.raises(ValueError, match="Minor axis greater"):
+        Beams.from_fits_files([badbeam_filename] + filenames,
+                              on_error='raise')
+
+
+def test_beams_from_fits_files_raise_early(monkeypatch):
+
+    import time
+    from .. import multiple_beams
+
+    read = []
+
+    def read_beam(filename, ext):
+        if filename == 'bad.fits':
+            return None, OSError("Cannot read bad.fits")
+        time.sleep(0.01)
+        read.append(filename)
+        return (1e-4, 1e-4, 0.), None
+
+    monkeypatch.setattr(multiple_beams, '_read_fits_file_beam', read_beam)
+
+    filenames = ['bad.fits'] + ['good{}.fits'.format(i) for i in range(50)]
+    with pytest.raises(OSError, match="Cannot read bad.fits"):
+        Beams.from_fits_files(filenames, workers=1, on_error='raise')
+
+    # The files queued after the error are not read
+    assert len(read) < 5
+
+
+def test_beams_to_fits_bintable():
+
+    fname = data_path("m33_beams_bintable.fits.gz")
+
+    with fits.open(fname) as hdulist:
+        beams = Beams.from_fits_bintable(hdulist[1])
+
+    bintable = beams.to_fits_bintable(float_format='D')
+
+    assert bintable.name == 'BEAMS'
+    assert bintable.header['NCHAN'] == len(beams)
+    assert bintable.header['NPOL'] == 1
+    assert bintable.columns.names == ['BMAJ', 'BMIN', 'BPA', 'CHAN', 'POL']
+
+    new_beams = Beams.from_fits_bintable(bintable)
+    assert new_beams == beams
+    assert new_beams.meta == beams.meta
+
+    # Default CHAN/POL, and other metadata columns
+    beams = Beams(major=[1, 2] * u.arcsec,
+                  meta=[{'WEIGHT': 0.5}, {'WEIGHT': 1.5}])
+    bintable = beams.to_fits_bintable()
+    npt.assert_equal(bintable.data['CHAN'], [0, 1])
+    npt.assert_equal(bintable.data['POL'], [0, 0])
+    npt.assert_equal(bintable.data['WEIGHT'], [0.5, 1.5])
+    assert bintable.columns['BMAJ'].format == 'E'
+
+    # Flat beams of several polarizations
+    beams = Beams(major=[1, 2, 3, 4, 5, 6] * u.arcsec,
+                  meta=[{'CHAN': chan, 'POL': pol}
+                        for chan in range(3) for pol in range(2)])
+    bintable = beams.to_fits_bintable()
+    assert bintable.header['NCHAN'] == 3
+    assert bintable.header['NPOL'] == 2
+
+
+def test_beams_attach_to_fits_file(tmp_path):
+
+    beams = asymm_beams_for_tests()[0]
+
+    cube = np.arange(6 * 4 * 4, dtype=np.float32).reshape((6, 4, 4))
+
+    hdulist = fits.HDUList([fits.PrimaryHDU(cube)])
+    beams.attach_to_hdulist(hdulist)
+    assert Beams.from_fits_bintable(hdulist['BEAMS']) == beams
+    # Replaces rather than appending a second table
+    beams.attach_to_hdulist(hdulist)
+    assert len(hdulist) == 2
+
+    filename = str(tmp_path / "cube.fits")
+    fits.PrimaryHDU(cube).writeto(filename)
+
+    assert beams.attach_to_fits_file(filename, float_format='D') == 'appended'
+    assert Beams.from_fits_file(filename) == beams
+
+    new_beams = beams * Beam(1 * u.arcsec)
+    assert new_beams.attach_to_fits_file(filename, float_format='D') == 'replaced'
+
+    with fits.open(filename) as hdulist:
+        assert len(hdulist) == 2
+        npt.assert_equal(hdulist[0].data, cube)
+    assert Beams.from_fits_file(filename) == new_beams
+
+    # When other extensions follow the beam table, they are written again
+    # after the new table, which here has a different size. The file and the
+    # primary HDU are not rewritten.
+    fits.append(filename, np.ones((2, 2)))
+    with fits.open(filename) as hdulist:
+        table_loc = hdulist.fileinfo(1)['hdrLoc']
+        tail_loc = hdulist.fileinfo(2)['hdrLoc']
+    with open(filename, 'rb') as fileobj:
+        primary = fileobj.read(table_loc)
+    inode = os.stat(filename).st_ino
+
+    # Enough metadata columns for a second header block
+    weighted = Beams(major=beams.major, minor=beams.minor, pa=beams.pa,
+                     meta=[{'W{}'.format(key): float(i) for key in range(20)}
+                           for i in range(beams.size)])
+    assert weighted.attach_to_fits_file(filename,
+                                        float_format='D') == 'rewritten'
+
+    assert os.stat(filename).st_ino == inode
+    with fits.open(filename) as hdulist:
+        assert hdulist.fileinfo(2)['hdrLoc'] > tail_loc
+    with open(filename, 'rb') as fileobj:
+        assert fileobj.read(table_loc) == primary
+    with fits.open(filename) as hdulist:
+        assert len(hdulist) == 3
+        npt.assert_equal(hdulist[0].data, cube)
+        npt.assert_equal(hdulist[2].data, np.ones((2, 2)))
+    assert Beams.from_fits_file(filename) == beams
+    npt.assert_equal(Beams.from_fits_file(filename).meta.columns['W0'],
+                     np.arange(beams.size))
+
+
+def test_beams_attach_to_fits_file_errors(tmp_path, monkeypatch):
+
+    import gzip
+
+    beams = asymm_beams_for_tests()[0]
+
+    cube = np.ones((6, 4, 4), dtype=np.float32)
+    hdulist = fits.HDUList([fits.PrimaryHDU(cube), fits.ImageHDU(cube[0])])
+    beams.attach_to_hdulist(hdulist)
+    hdulist.append(fits.ImageHDU(cube[1]))
+
+    # Compressed files are not changed
+    filename = str(tmp_path / "cube.fits.gz")
+    hdulist.writeto(filename)
+    with open(filename, 'rb') as fileobj:
+        contents = fileobj.read()
+
+    with pytest.raises(ValueError, match="not an uncompressed FITS file"):
+        beams.attach_to_fits_file(filename)
+    with open(filename, 'rb') as fileobj:
+        assert fileobj.read() == contents
+    with gzip.open(filename) as fileobj:
+        assert fileobj.read(6) == b'SIMPLE'
+
+    # The file is unchanged when the table cannot be written
+    filename = str(tmp_path / "cube.fits")
+    hdulist.writeto(filename)
+    with open(filename, 'rb') as fileobj:
+        contents = fileobj.read()
+
+    def fail(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(fits.HDUList, 'writeto', fail)
+
+    with pytest.raises(OSError, match="No space left"):
+        beams.attach_to_fits_file(filename)
+    with open(filename, 'rb') as fileobj:
+        assert fileobj.read() == contents
+
+
+@pytest.mark.parametrize("mmap_mode", ['r', None])
+def test_beams_save_load(tmp_path, mmap_mode):
+
+    fname = data_path("m33_beams_bintable.fits.gz")
+
+    with fits.open(fname) as hdulist:
+        beams = Beams.from_fits_bintable(hdulist[1])
+    beams.default_unit = u.deg
+
+    outpath = str(tmp_path / "beams")
+    beams.save(outpath)
+
+    with pytest.raises(OSError):
+        beams.save(outpath)
+
+    loaded = Beams.load(outpath, mmap_mode=mmap_mode)
+
+    assert loaded == beams
+    npt.assert_equal(loaded.major.value, beams.major.value)
+    npt.assert_equal(loaded.pa.value, beams.pa.value)
+    npt.assert_equal(loaded.value, beams.value)
+    assert loaded.major.unit == beams.major.unit
+    assert loaded.default_unit == u.deg
+    assert loaded.meta == beams.meta
+    assert loaded[2:5].meta[1] == beams.meta[3]
+    assert loaded[np.array([4, 1])].meta[0] == beams.meta[4]
+
+
+def test_beams_save_overwrite(tmp_path):
+
+    outpath = tmp_path / "beams"
+
+    beams = Beams(major=[1, 2] * u.arcsec,
+                  meta=[{'CHAN': 0, 'POL': 0}, {'CHAN': 1, 'POL': 0}])
+    beams.save(str(outpath))
+    nfiles = len(os.listdir(outpath))
+
+    # The columns of the earlier save are removed, other files are kept
+    (outpath / "notes.txt").write_text("keep")
+    new_beams = Beams(major=[3] * u.arcsec)
+    new_beams.save(str(outpath), overwrite=True)
+
+    assert len(os.listdir(outpath)) == nfiles - 2 + 1
+    assert (outpath / "notes.txt").exists()
+    assert Beams.load(str(outpath)) == new_beams
+
+
+def test_beams_pickle():
+
+    import pickle
+
+    beams = asymm_beams_for_tests()[0]
+    beams.meta = [{'CHAN': i} for i in range(len(beams))]
+
+    new_beams = pickle.loads(pickle.dumps(beams))
+
+    assert isinstance(new_beams, Beams)
+    assert new_beams == beams
+    npt.assert_equal(new_beams.value, beams.value)
+    assert new_beams.major.unit == beams.major.unit
+    assert new_beams.meta == beams.meta
+
+    # Indexed beams keep their metadata
+    loaded_beams = pickle.loads(pickle.dumps(beams[np.array([0, 2])]))
+    assert loaded_beams.meta == [{'CHAN': 0}, {'CHAN': 2}]
+
+
+@pytest.mark.parametrize("source", ['bintable', 'load'])
+def test_beams_meta_columns_round_trip(tmp_path, source):
+
+    import pickle
+
+    fname = data_path("m33_beams_bintable.fits.gz")
+    with fits.open(fname) as hdulist:
+        beams = Beams.from_fits_bintable(hdulist[1])
+    if source == 'load':
+        beams.save(str(tmp_path / "beams"))
+        beams = Beams.load(str(tmp_path / "beams"))
+    assert isinstance(beams.meta, MetaColumns)
+
+    for subset in (beams, beams[10:20]):
+        new_beams = pickle.loads(pickle.dumps(subset))
+        assert new_beams == subset
+        assert new_beams.meta == subset.meta
+        npt.assert_equal(new_beams.meta.columns['CHAN'],
+                         subset.meta.columns['CHAN'])
+
+        shm = subset.to_shared_memory()
+        try:
+            attached = Beams.from_shared_memory(shm.name)
+            assert attached == subset
+            assert attached.meta == subset.meta
+            npt.assert_equal(attached.meta.columns['POL'],
+                             subset.meta.columns['POL'])
+            del attached
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+def test_beams_shared_memory():
+
+    beams = asymm_beams_for_tests()[0]
+    beams.meta = [{'CHAN': i} for i in range(len(beams))]
+
+    shm = beams.to_shared_memory()
+
+    try:
+        attached = Beams.from_shared_memory(shm.name)
+
+        assert attached == beams
+        assert attached.meta == beams.meta
+        assert not attached.major.flags.writeable
+
+        # Slices keep the attachment alive
+        sliced = attached[1:3]
+        del attached
+        npt.assert_equal(sliced.major.value, beams.major[1:3].value)
+        del sliced
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def test_beams_save_mismatched_meta(tmp_path):
+
+    beams = Beams(major=[1, 2] * u.arcsec, meta=[{'CHAN': 0}, {'POL': 0}])
+
+    with pytest.raises(ValueError, match="same metadata keys"):
+        beams.save(str(tmp_path / "beams"))
+
+
 def test_beams_from_list_of_beam():
 
     beams, majors = symm_beams_for_tests()[:2]
@@ -125,6 +549,68 @@ def test_beams_equality_beam():
     assert not np.any(beams != beam)
 
 
+def test_beams_isclose():
+
+    beams, majors, minors, pas = asymm_beams_for_tests()
+
+    # Shift one PA by 180 deg, which is the same beam
+    other = Beams(major=majors, minor=minors,
+                  pa=pas + [0, 180, 0, 0, 0, 0] * u.deg)
+    assert np.all(beams.isclose(other))
+
+    # Change a single beam
+    other = Beams(major=majors, minor=minors,
+                  pa=pas + [0, 0, 5, 0, 0, 0] * u.deg)
+    npt.assert_equal(beams.isclose(other),
+                     [True, True, False, True, True, True])
+    assert beams != other
+
+    # PA is ignored for circular beams
+    circ_beams = Beams(major=[1, 1] * u.arcsec, pa=[0, 45] * u.deg)
+    assert np.all(circ_beams.isclose(Beam(1 * u.arcsec, pa=10 * u.deg)))
+
+    npt.assert_equal(beams.isclose(beams[1]),
+                     [beam == beams[1] for beam in beams])
+
+
+def test_beams_match():
+
+    beams, majors, minors, pas = asymm_beams_for_tests()
+
+    order = np.array([3, 5, 0, 4, 1, 2])
+    other = beams[order]
+
+    matches = beams.match(other)
+
+    assert np.all(other[matches] == beams)
+
+    # Add a non-matching beam and a duplicate
+    other = Beams(major=[2, 10, 1] * u.arcsec, minor=[1, 10, 0.5] * u.arcsec,
+                  pa=[41 + 180, 0, 20] * u.deg)
+    matches = beams.match(other)
+    npt.assert_equal(matches, [-1, 2, -1, 0, -1, -1])
+
+    # Many identical beams
+    same = Beams(major=[1.] * 1000 * u.arcsec)
+    matches = same.match(same)
+    assert np.all(matches == 0)
+
+    # Many beams with the same major axis and different PAs
+    pas = np.linspace(0, 360, 5000, endpoint=False) * u.deg
+    elliptical = Beams(major=[2.] * 5000 * u.arcsec,
+                       minor=[1.] * 5000 * u.arcsec, pa=pas)
+    npt.assert_equal(elliptical.match(elliptical),
+                     np.tile(np.arange(2500), 2))
+
+    # The PA of circular beams is ignored
+    circular = Beams(major=[2.] * 5000 * u.arcsec, pa=pas)
+    assert np.all(circular.match(circular) == 0)
+    assert np.all(circular.match(elliptical) == -1)
+
+    with pytest.raises(ValueError, match="tol must be positive"):
+        circular.match(elliptical, tol=0 * u.deg)
+
+
 @pytest.mark.xfail(raises=InvalidBeamOperationError, strict=True)
 def test_beams_equality_fail():
 
@@ -244,6 +730,34 @@ def test_indexing():
     assert np.all(beams[mask].major.value == majors[mask].value)
 
 
+def test_indexing_views_and_fancy():
+
+    beams, majors, minors, pas = asymm_beams_for_tests()
+
+    # Slices are views onto the parent arrays
+    sliced = beams[1:4]
+    assert isinstance(sliced, Beams)
+    assert np.shares_memory(sliced.major, beams.major)
+    assert np.shares_memory(sliced.value, beams.value)
+    npt.assert_equal(sliced.pa.value, pas[1:4].value)
+    assert len(sliced.meta) == 3
+
+    # Integer arrays gather, including reordering
+    idx = np.array([4, 0, 2])
+    gathered = beams[idx]
+    assert isinstance(gathered, Beams)
+    npt.assert_equal(gathered.major.value, majors[idx].value)
+    npt.assert_equal(gathered.minor.value, minors[idx].value)
+    npt.assert_equal(gathered.pa.value, pas[idx].value)
+    npt.assert_equal(gathered.value, beams.value[idx])
+
+    # Lists work the same as arrays
+    assert beams[[4, 0, 2]] == gathered
+
+    with pytest.raises(ValueError, match="boolean or integer array"):
+        beams[np.array([0.5, 1.5])]
+
+
 def test_average_beams():
 
     beams, majors = symm_beams_for_tests()[:2]
@@ -321,6 +835,56 @@ def test_extrema_beams(beams, majors, minors, pas):
     assert extrema[1].minor.value == minors[mask].max().value
 
 
+@pytest.mark.parametrize(("beams", "majors", "minors", "pas"),
+                         [symm_beams_for_tests(), asymm_beams_for_tests()])
+def test_beams_summary(beams, majors, minors, pas):
+
+    summary = beams.summary()
+
+    assert set(summary) == {'area', 'major', 'minor', 'ellipticity'}
+    assert summary['area']['argmax'] == beams.sr.value.argmax()
+    assert summary['area']['argmin'] == beams.sr.value.argmin()
+    npt.assert_allclose(summary['area']['max'].value, beams.sr.value.max())
+    npt.assert_allclose(summary['major']['max'].to(u.arcsec).value,
+                        majors.value.max())
+    npt.assert_allclose(summary['minor']['percentiles'].to(u.arcsec).value,
+                        np.percentile(minors.value, (25, 50, 75)))
+    npt.assert_allclose(summary['ellipticity']['max'].value,
+                        (1 - minors / majors).value.max())
+
+    # Indices refer to the full set when masking
+    mask = np.array([True, False, True, False, True, False], dtype='bool')
+    summary = beams.summary(includemask=mask)
+    assert summary['area']['argmax'] == 4
+
+    order = beams.argsort(by='major', includemask=mask)
+    npt.assert_equal(order, [0, 2, 4])
+
+    with pytest.raises(ValueError):
+        beams.argsort(by='size')
+
+
+def test_beams_isfinite_updates():
+
+    beams = Beams(major=[1, 1, np.nan, 2] * u.arcsec)
+
+    npt.assert_equal(beams.isfinite, [True, True, False, True])
+
+    beams.major = [1, 0, 1, 2] * u.arcsec
+    beams.minor = [1, 0, 1, 2] * u.arcsec
+    npt.assert_equal(beams.isfinite, [True, False, True, True])
+
+    assert beams.argsort().tolist() == [0, 2, 3]
+
+    # In-place changes, also through a view, are seen by both beams
+    view = beams[1:]
+    npt.assert_equal(view.isfinite, [False, True, True])
+    view.major[0] = view.minor[0] = 1 * u.arcsec
+    beams.pa[3] = np.nan * u.deg
+    npt.assert_equal(view.isfinite, [True, True, False])
+    npt.assert_equal(beams.isfinite, [True, True, True, False])
+
+
 @pytest.mark.parametrize("majors", [[1, 1, 1, 2, np.nan, 4],
                                     [0, 1, 1, 2, 3, 4]])
 def test_beams_with_invalid(majors):
@@ -377,6 +941,48 @@ def test_beams_iter():
         assert beam == beams[i]
 
 
+def test_beams_iter_params():
+
+    beams, majors, minors, pas = asymm_beams_for_tests()
+
+    for params, beam in zip(beams.iter_params(), beams):
+        assert isinstance(params.major, float)
+        npt.assert_allclose(params.major, beam.major.to(u.deg).value)
+        npt.assert_allclose(params.minor, beam.minor.to(u.deg).value)
+        npt.assert_allclose(params.pa, beam.pa.to(u.deg).value)
+
+    records = beams.records()
+    assert records.dtype.names == ('major', 'minor', 'pa')
+    npt.assert_allclose(records['major'], majors.to(u.deg).value)
+    npt.assert_allclose(records['minor'], minors.to(u.deg).value)
+    npt.assert_allclose(records['pa'], pas.to(u.deg).value)
+
+
+def test_beams_div_deconvolution_fail():
+
+    beams, majors = asymm_beams_for_tests()[:2]
+
+    beam = Beam(1.5 * u.arcsec)
+
+    with pytest.raises(BeamError):
+        beams / beam
+
+    # The vectorized deconvolution should match the per-beam path when
+    # some beams fail
+    individ_deconv_beams = [beam_i.deconvolve(beam, failure_returns_pointlike=True)
+                            for beam_i in beams]
+
+    from ..utils import deconvolve_vectorized
+    new_major, new_minor, new_pa = \
+        deconvolve_vectorized(beams._beamprops(), beam.to_header_keywords(),
+                              failure_returns_pointlike=True)
+
+    npt.assert_allclose(new_major,
+                        [b.major.to(u.deg).value for b in individ_deconv_beams])
+    npt.assert_allclose(new_minor,
+                        [b.minor.to(u.deg).value for b in individ_deconv_beams])
+
+
 # @pytest.mark.parametrize('comp_vals',
 #                          [vals for vals in load_commonbeam_comparisons()])
 # def test_commonbeam_casa_compare(comp_vals):
@@ -693,3 +1299,302 @@ def test_common_beam_mve_auto_increase_epsilon():
                                  epsilon=5e-4,
                                  auto_increase_epsilon=True,
                                  max_epsilon=1e-3)
+
+
+def _aipsio_string(value):
+    data = value.encode('ascii')
+    return struct.pack('>I', len(data)) + data
+
+
+def _aipsio_object(name, version, payload):
+    body = _aipsio_string(name) + struct.pack('>I', version) + payload
+    return struct.pack('>I', 4 + len(body)) + body
+
+
+def _aipsio_record(record):
+    """
+    Encode a dictionary of float, int, str and dict values as a casacore
+    TableRecord.
+    """
+    desc = struct.pack('>i', len(record))
+    values = b''
+    for name, value in record.items():
+        desc += _aipsio_string(name)
+        if isinstance(value, dict):
+            desc += struct.pack('>i', 25)
+            desc += _aipsio_object('RecordDesc', 2, struct.pack('>i', 0))
+            values += _aipsio_record(value)
+        elif isinstance(value, str):
+            desc += struct.pack('>i', 11)
+            values += _aipsio_string(value)
+        elif isinstance(value, int):
+            desc += struct.pack('>i', 5)
+            values += struct.pack('>i', value)
+        else:
+            desc += struct.pack('>i', 8)
+            values += struct.pack('>d', value)
+        desc += _aipsio_string('')
+
+    payload = (_aipsio_object('RecordDesc', 2, desc) + struct.pack('>i', 1) +
+               values)
+    return _aipsio_object('TableRecord', 1, payload)
+
+
+def write_casa_image_keywords(path, keywords):
+    """
+    Write a casacore table with only the given keywords.
+    """
+    os.makedirs(path)
+    table_desc = _aipsio_object('TableDesc', 2, _aipsio_string('') * 3 +
+                                _aipsio_record(keywords))
+    table = _aipsio_object('Table', 2, struct.pack('>II', 1, 1) +
+                           _aipsio_string('PlainTable') + table_desc)
+    with open(os.path.join(path, 'table.dat'), 'wb') as fh:
+        fh.write(struct.pack('>I', 0xbebebebe) + table)
+
+
+def test_beams_from_casa_image(tmp_path):
+
+    from .test_beam import extract_casa_image
+
+    fname = extract_casa_image(str(tmp_path))
+    beams = Beams.from_casa_image(fname)
+    assert len(beams) == 1
+    assert beams[0] == Beam.from_casa_image(fname)
+
+    nchan, npol = 3, 2
+    majors = np.arange(1, nchan * npol + 1, dtype=float)
+    planes = {'*{}'.format(i):
+              {'major': {'value': majors[i], 'unit': 'arcsec'},
+               'minor': {'value': majors[i] / 60., 'unit': 'arcmin'},
+               'positionangle': {'value': 10. * i, 'unit': 'deg'}}
+              for i in range(nchan * npol)}
+    planes.update({'nChannels': nchan, 'nStokes': npol})
+
+    fname = str(tmp_path / 'perplane.image')
+    write_casa_image_keywords(fname, {'units': 'Jy/beam',
+                                      'imageinfo': {'perplanebeams': planes,
+                                                    'imagetype': 'Intensity'}})
+
+    beams = Beams.from_casa_image(fname)
+    assert len(beams) == nchan * npol
+
+    # Planes are numbered with the channel varying fastest
+    chan = np.asarray(beams.meta.columns['CHAN'])
+    pol = np.asarray(beams.meta.columns['POL'])
+    plane = chan + pol * nchan
+    npt.assert_allclose(beams.major.to_value(u.arcsec), majors[plane])
+    npt.assert_allclose(beams.minor.to_value(u.arcsec), majors[plane])
+    npt.assert_allclose(beams.pa.to_value(u.deg), 10. * plane)
+    npt.assert_equal(chan, np.repeat(np.arange(nchan), npol))
+
+    grid = Beams.from_casa_image(fname, by_polarization=True)
+    assert grid.shape == (nchan, npol)
+    npt.assert_allclose(grid.major.to_value(u.arcsec),
+                        majors.reshape(npol, nchan).T)
+    assert grid == beams.by_polarization()
+
+    with pytest.raises(ValueError, match='Use Beams.from_casa_image'):
+        Beam.from_casa_image(fname)
+
+
+def nd_beams_for_tests(nchan=4, npol=2):
+
+    majors = (np.arange(nchan * npol).reshape(nchan, npol) % 3 + 2.) * u.arcsec
+    minors = majors * 0.75
+    pas = np.linspace(-60, 60, nchan * npol).reshape(nchan, npol) * u.deg
+    chan, pol = np.indices((nchan, npol)).reshape(2, -1)
+
+    meta = [{'CHAN': c, 'POL': p} for c, p in zip(chan, pol)]
+
+    return Beams(major=majors, minor=minors, pa=pas, meta=meta)
+
+
+def test_beams_nd_indexing():
+
+    beams = nd_beams_for_tests()
+    assert beams.shape == (4, 2)
+    assert len(beams) == 4
+    assert beams.isfinite.shape == (4, 2)
+
+    beam = beams[2, 1]
+    assert isinstance(beam, Beam)
+    assert beam.major == beams.major[2, 1]
+    assert beam.meta == {'CHAN': 2, 'POL': 1}
+
+    pol1 = beams[:, 1]
+    assert pol1.shape == (4,)
+    assert [row['CHAN'] for row in pol1.meta] == [0, 1, 2, 3]
+    assert all(row['POL'] == 1 for row in pol1.meta)
+    assert pol1[3] == beams[3, 1]
+
+    flat = beams.ravel()
+    assert flat.shape == (8,)
+    assert flat[5] == beams[2, 1]
+    assert flat[5].meta == beams[2, 1].meta
+    assert flat.reshape(4, 2)[2, 1] == beams[2, 1]
+
+    # Flat indices into the beams
+    assert beams.largest_beam() == flat.largest_beam()
+    npt.assert_equal(beams.argsort(), flat.argsort())
+    assert beams.records().shape == (4, 2)
+    assert len(list(beams.iter_params())) == 8
+    npt.assert_equal(beams.match(beams), np.arange(8).reshape(4, 2))
+
+
+def test_beams_nd_broadcasting():
+
+    beams = nd_beams_for_tests()
+    beam = Beam(1 * u.arcsec)
+
+    convolved = beams * beam
+    assert convolved.shape == beams.shape
+    assert convolved[2, 1] == beams[2, 1] * beam
+    assert convolved.meta == beams.meta
+
+    # One target beam per polarization, larger than all of its beams
+    targets = beams.common_beam(axis=0) * beam
+    assert targets.shape == (2,)
+
+    kernels = targets / beams
+    assert kernels.shape == beams.shape
+    for chan in range(4):
+        for pol in range(2):
+            assert kernels[chan, pol] == targets[pol].deconvolve(beams[chan, pol])
+
+    with pytest.raises(ValueError):
+        beams * Beams(major=[1, 2, 3] * u.arcsec)
+
+    # The metadata is dropped when broadcasting changes the shape
+    broadcast = beams[:, :1] * Beams(major=[1, 2] * u.arcsec)
+    assert broadcast.shape == beams.shape
+    assert broadcast.meta == [{}] * beams.size
+
+
+def test_beams_nd_common_beam():
+
+    beams = nd_beams_for_tests()
+
+    assert beams.common_beam() == beams.ravel().common_beam()
+
+    per_pol = beams.common_beam(axis=0)
+    per_chan = beams.common_beam(axis=-1)
+    assert per_chan.shape == (4,)
+    for pol in range(2):
+        assert per_pol[pol] == beams[:, pol].common_beam()
+    for chan in range(4):
+        assert per_chan[chan] == beams[chan].common_beam()
+
+    # 1-D beams reduce to a single beam
+    assert beams[:, 0].common_beam(axis=0) == beams[:, 0].common_beam()
+
+    mask = np.ones(beams.shape, dtype=bool)
+    mask[0] = False
+    per_pol = beams.common_beam(axis=0, includemask=mask)
+    assert per_pol[1] == beams[1:, 1].common_beam()
+
+    # Sets with no included beams have a NaN common beam
+    per_chan = beams.common_beam(axis=-1, includemask=mask)
+    npt.assert_equal(per_chan.isfinite, [False, True, True, True])
+    assert per_chan[1] == beams[1].common_beam()
+    nan_beams = Beams(major=[np.nan, np.nan] * u.arcsec).reshape(1, 2)
+    assert not nan_beams.common_beam(axis=-1).isfinite.any()
+
+    with pytest.raises(ValueError, match='out of bounds'):
+        beams.common_beam(axis=2)
+
+
+def test_beams_by_polarization(tmp_path):
+
+    beams = nd_beams_for_tests()
+
+    bintable = beams.to_fits_bintable(float_format='D')
+    assert bintable.header['NCHAN'] == 4
+    assert bintable.header['NPOL'] == 2
+
+    # Shuffle the rows of the table
+    order = np.random.default_rng(0).permutation(8)
+    bintable = fits.BinTableHDU(bintable.data[order], header=bintable.header)
+
+    flat = Beams.from_fits_bintable(bintable)
+    assert flat.shape == (8,)
+
+    grid = Beams.from_fits_bintable(bintable, by_polarization=True)
+    assert grid.shape == (4, 2)
+    assert grid == beams
+    assert grid[3, 0].meta['CHAN'] == 3
+    assert grid[3, 0].meta['POL'] == 0
+
+    filename = str(tmp_path / 'beams.fits')
+    fits.HDUList([fits.PrimaryHDU(), bintable]).writeto(filename)
+    assert Beams.from_fits_file(filename, by_polarization=True) == beams
+
+    with pytest.raises(ValueError, match='exactly one beam'):
+        flat[:7].by_polarization()
+
+    beams.save(str(tmp_path / 'saved'))
+    loaded = Beams.load(str(tmp_path / 'saved'))
+    assert loaded.shape == (4, 2)
+    assert loaded == beams
+    assert loaded[1, 1].meta == beams[1, 1].meta
+
+
+@pytest.mark.parametrize('mode', ['center', 'oversample', 'integrate'])
+def test_beams_as_kernels(mode):
+
+    beams = Beams(major=[1, 1.5, 2] * u.arcsec, minor=[1, 1, 1.2] * u.arcsec,
+                  pa=[0, 30, 120] * u.deg)
+    pixscale = 0.2 * u.arcsec
+
+    kernels = beams.as_kernels(pixscale, mode=mode)
+
+    # The default shape fits the largest kernel
+    size = max(beam.as_kernel(pixscale, cache=False)._default_size
+               for beam in beams)
+    assert kernels.shape == (3, size, size)
+    assert kernels.flags.c_contiguous
+    npt.assert_allclose(kernels.sum(axis=(1, 2)), 1)
+
+    for beam, kernel in zip(beams, kernels):
+        single = beam.as_kernel(pixscale, x_size=size, mode=mode,
+                                cache=False).array
+        npt.assert_allclose(kernel, single / single.sum(), rtol=1e-12,
+                            atol=1e-15)
+
+    # Caller-chosen and N-dimensional shapes
+    assert beams.as_kernels(pixscale, shape=(9, 11)).shape == (3, 9, 11)
+    assert beams.reshape(3, 1).as_kernels(pixscale,
+                                          shape=(5, 5)).shape == (3, 1, 5, 5)
+
+    with pytest.raises(TypeError):
+        beams.as_kernels(pixscale, shape=(5.5, 5))
+
+    # The shape from a truncation fits the shapes of all kernels
+    shape = beams.as_kernels(pixscale, truncation=1e-4).shape[1:]
+    shapes = [beam.as_kernel(pixscale, truncation=1e-4, cache=False).shape
+              for beam in beams]
+    assert shape == tuple(np.max(shapes, axis=0))
+
+
+def test_beams_as_kernels_for_wcs():
+    from astropy.wcs import WCS
+
+    beams = Beams(major=[1, 1.5, 2] * u.arcsec, minor=[1, 1, 1.2] * u.arcsec,
+                  pa=[0, 30, 120] * u.deg)
+    scale = (0.2 * u.arcsec).to_value(u.deg)
+    mywcs = WCS(naxis=2)
+    mywcs.wcs.ctype = ['RA---TAN', 'DEC--TAN']
+    mywcs.wcs.cd = [[-scale, 0.3 * scale], [0.1 * scale, 1.5 * scale]]
+
+    kernels = beams.as_kernels_for_wcs(mywcs, truncation=1e-5)
+    ny, nx = kernels.shape[1:]
+    for beam, kernel in zip(beams, kernels):
+        single = beam.as_kernel_for_wcs(mywcs, x_size=nx, y_size=ny,
+                                        cache=False).array
+        npt.assert_allclose(kernel, single / single.sum(), rtol=1e-10,
+                            atol=1e-15)
+
+    # Pixels aligned with the sky give the kernels of as_kernels
+    mywcs.wcs.cd = [[-scale, 0], [0, scale]]
+    npt.assert_allclose(beams.as_kernels_for_wcs(mywcs),
+                        beams.as_kernels(0.2 * u.arcsec), atol=1e-12)
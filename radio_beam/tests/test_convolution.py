@@ -0,0 +1,322 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+
+import pytest
+import numpy as np
+import numpy.testing as npt
+from astropy import units as u
+from astropy.io import fits
+
+from ..beam import Beam
+from ..multiple_beams import Beams
+from ..convolution import (convolve_cube, convolve_fits_cube, convolve_image,
+                           _tile_shape)
+from ..utils import BeamError
+
+
+PIXSCALE = 0.5 * u.arcsec
+
+
+def point_source_cube(beams, shape=(48, 50)):
+    data = np.zeros((len(beams),) + shape)
+    data[:, shape[0] // 2, shape[1] // 2] = 1.
+    return data
+
+
+def test_convolve_cube_to():
+
+    target = Beam(4 * u.arcsec, 3.5 * u.arcsec, 20 * u.deg)
+    beams = Beams(major=[2, 2.5, 2, 4] * u.arcsec,
+                  minor=[1.5, 1.5, 1.5, 3.5] * u.arcsec,
+                  pa=[0, 60, 0, 20] * u.deg)
+    data = point_source_cube(beams)
+
+    result = beams.convolve_cube_to(target, data, PIXSCALE, workers=2)
+    assert result.shape == data.shape
+    assert result.dtype == np.float64
+
+    # A point source becomes the convolution kernel
+    for beam, plane in zip(beams[:3], result[:3]):
+        kernel = (target / beam).as_kernel(PIXSCALE, x_size=21, cache=False)
+        npt.assert_allclose(plane[14:35, 15:36], kernel.array, atol=1e-8)
+        npt.assert_allclose(plane.sum(), 1)
+
+    # Identical beams give identical planes, and planes at the target beam
+    # are copied
+    npt.assert_equal(result[0], result[2])
+    npt.assert_equal(result[3], data[3])
+
+    npt.assert_allclose(convolve_cube(data, beams, target, PIXSCALE,
+                                      workers=1), result)
+
+
+def test_convolve_cube_parallel_planes(monkeypatch):
+
+    import threading
+    import time
+    from .. import convolution
+
+    # Every plane has the same beam, so there is a single kernel group
+    beams = Beams(major=[2] * 16 * u.arcsec, minor=[2] * 16 * u.arcsec,
+                  pa=[0] * 16 * u.deg)
+    data = point_source_cube(beams)
+
+    threads = set()
+    transfer_functions = []
+    plans = []
+    convolve = convolution._PlaneConvolver.convolve
+    transfer_function = convolution._CubeConvolution.transfer_function
+
+    def slow_convolve(self, *args):
+        threads.add(threading.get_ident())
+        time.sleep(0.01)
+        return convolve(self, *args)
+
+    def counted_transfer_function(self, group):
+        plans.append(self)
+        transfer_functions.append(group)
+        return transfer_function(self, group)
+
+    monkeypatch.setattr(convolution._PlaneConvolver, 'convolve',
+                        slow_convolve)
+    monkeypatch.setattr(convolution._CubeConvolution, 'transfer_function',
+                        counted_transfer_function)
+
+    result = convolve_cube(data, beams, Beam(3 * u.arcsec), PIXSCALE,
+                           workers=8)
+    npt.assert_allclose(result, np.broadcast_to(result[0], result.shape))
+
+    # The planes run on several threads, and share one transfer function
+    # that is released after the last plane
+    assert len(threads) > 1
+    assert transfer_functions == [0]
+    assert plans[0]._kernels == {}
+
+
+def test_convolve_cube_to_dtypes_and_units():
+
+    target = Beam(3 * u.arcsec)
+    beams = Beams(major=[2, np.nan] * u.arcsec, minor=[2, np.nan] * u.arcsec,
+                  pa=[0, 0] * u.deg)
+    data = point_source_cube(beams).astype(np.float32)
+
+    result = beams.convolve_cube_to(target, data, PIXSCALE)
+    assert result.dtype == np.float32
+    assert np.isnan(result[1]).all()
+
+    # Jy/beam are rescaled to the target beam
+    jy_beam = beams.convolve_cube_to(target, data * u.Jy / u.beam, PIXSCALE)
+    assert jy_beam.unit == u.Jy / u.beam
+    scale = (target.sr / beams[0].sr).value
+    npt.assert_allclose(jy_beam[0].value, result[0] * scale, rtol=1e-5)
+
+    kelvin = beams.convolve_cube_to(target, data * u.K, PIXSCALE)
+    npt.assert_allclose(kelvin[0].value, result[0])
+
+    # Writing to a given array
+    out = np.zeros(data.shape)
+    assert beams.convolve_cube_to(target, data, PIXSCALE, out=out) is out
+    npt.assert_allclose(out, result, rtol=1e-5, atol=1e-7)
+
+
+def test_convolve_cube_to_nan_pixels():
+
+    target = Beam(3 * u.arcsec)
+    beams = Beams(major=[2] * u.arcsec, minor=[2] * u.arcsec, pa=[0] * u.deg)
+    data = np.ones((1, 50, 50))
+    data[0, 24, 22:25] = np.nan
+
+    result = beams.convolve_cube_to(target, data, PIXSCALE)
+    assert np.isnan(result[0, 24, 22:25]).all()
+    assert np.isfinite(result).sum() == data.size - 3
+
+    # The pixels around the NaNs are renormalized, but not the edges, which
+    # are zero-padded
+    inner = result[0, 15:35, 15:35]
+    npt.assert_allclose(inner[np.isfinite(inner)], 1, rtol=1e-6)
+    assert result[0, 0, 0] < 0.5
+
+
+def test_convolve_cube_to_errors():
+
+    beams = Beams(major=[2, 4] * u.arcsec, minor=[2, 4] * u.arcsec,
+                  pa=[0, 0] * u.deg)
+    data = point_source_cube(beams)
+
+    with pytest.raises(BeamError, match=r'planes \[1\]'):
+        beams.convolve_cube_to(Beam(3 * u.arcsec), data, PIXSCALE)
+
+    with pytest.raises(ValueError):
+        beams.convolve_cube_to(Beam(5 * u.arcsec), data[0], PIXSCALE)
+
+
+def cube_header(shape):
+    header = fits.Header()
+    axes = [('RA---SIN', -PIXSCALE.to_value(u.deg), 1),
+            ('DEC--SIN', PIXSCALE.to_value(u.deg), 1),
+            ('FREQ', 1e6, 1e9), ('STOKES', 1, 1)]
+    for axis, (ctype, cdelt, crval) in enumerate(axes[:len(shape)], start=1):
+        header['CTYPE{}'.format(axis)] = ctype
+        header['CDELT{}'.format(axis)] = cdelt
+        header['CRPIX{}'.format(axis)] = 1
+        header['CRVAL{}'.format(axis)] = crval
+    header['BUNIT'] = 'Jy/beam'
+    header['CASAMBM'] = True
+    return header
+
+
+def write_cube(filename, data, beams):
+    header = cube_header(data.shape[::-1])
+    hdulist = fits.HDUList([fits.PrimaryHDU(data, header=header)])
+    beams.attach_to_hdulist(hdulist)
+    hdulist.writeto(filename)
+
+
+@pytest.mark.parametrize(('block_size', 'max_pending'), [(1, 1), (2, None)])
+def test_convolve_fits_cube(tmp_path, block_size, max_pending):
+
+    rng = np.random.default_rng(0)
+    beams = Beams(major=[2, 2.5, 2, 1.5, 3] * u.arcsec,
+                  minor=[1.5, 1.5, 1.5, 1.5, 2] * u.arcsec,
+                  pa=[0, 60, 0, 0, 10] * u.deg)
+    data = rng.normal(size=(5, 20, 24)).astype(np.float32)
+    filename = str(tmp_path / 'cube.fits')
+    output = str(tmp_path / 'smooth.fits')
+    write_cube(filename, data, beams)
+
+    target = convolve_fits_cube(filename, output, workers=2,
+                                block_size=block_size,
+                                max_pending=max_pending)
+    # The beam table is single precision
+    beams = Beams.from_fits_file(filename)
+    assert target == beams.common_beam()
+
+    expected = beams.convolve_cube_to(target, data * u.Jy / u.beam, PIXSCALE)
+    with fits.open(output) as hdulist:
+        assert len(hdulist) == 1
+        header = hdulist[0].header
+        assert Beam.from_fits_header(header) == target
+        assert 'CASAMBM' not in header
+        assert header['CTYPE3'] == 'FREQ'
+        assert hdulist[0].data.dtype == np.dtype('>f4')
+        npt.assert_allclose(hdulist[0].data, expected.value, rtol=1e-5,
+                            atol=1e-6)
+
+    with pytest.raises(OSError):
+        convolve_fits_cube(filename, output)
+
+
+def test_convolve_fits_cube_scaled_polarizations(tmp_path):
+
+    # Two polarizations, with scaled integer data and a single beam in the
+    # header
+    data = np.zeros((2, 3, 16, 16), dtype=np.int16)
+    data[:, :, 8, 8] = 1000
+    data[1, 2, 0, 0] = -1
+    hdu = fits.PrimaryHDU(data, header=cube_header(data.shape[::-1]))
+    hdu.header['BSCALE'] = 1e-3
+    hdu.header['BLANK'] = -1
+    hdu.header.update(Beam(2 * u.arcsec).to_header_keywords())
+    filename = str(tmp_path / 'cube.fits')
+    output = str(tmp_path / 'smooth.fits')
+    hdu.writeto(filename)
+
+    target = Beam(3 * u.arcsec)
+    convolve_fits_cube(filename, output, target=target, workers=1)
+
+    with fits.open(output) as hdulist:
+        result = hdulist[0].data
+        assert result.shape == data.shape
+        assert 'BLANK' not in hdulist[0].header
+        assert 'BSCALE' not in hdulist[0].header
+    assert np.isnan(result[1, 2, 0, 0])
+    assert np.isfinite(result).sum() == result.size - 1
+    # Jy/beam are rescaled by the ratio of the beam areas
+    npt.assert_allclose(result[..., 8, 8], result[0, 0, 8, 8], rtol=1e-4)
+    npt.assert_allclose(result[0, 0].sum(), 2.25, rtol=1e-4)
+
+    # Beams from a table are matched to the planes by polarization
+    beams = Beams(major=[2, 2, 2.5, 2.5, 2, 2] * u.arcsec,
+                  minor=[2, 2, 2.5, 2.5, 2, 2] * u.arcsec,
+                  pa=[0] * 6 * u.deg,
+                  meta=[{'CHAN': chan, 'POL': pol}
+                        for chan in range(3) for pol in range(2)])
+    write_cube(str(tmp_path / 'pol.fits'), data.astype(float) / 1000, beams)
+    convolve_fits_cube(str(tmp_path / 'pol.fits'), output, target=target,
+                       overwrite=True)
+    with fits.open(output) as hdulist:
+        peaks = hdulist[0].data[:, :, 8, 8]
+    npt.assert_allclose(peaks[0], peaks[1])
+    npt.assert_allclose(peaks[:, 0], peaks[:, 2])
+    assert np.all(peaks[:, 1] > 1.1 * peaks[:, 0])
+
+
+@pytest.mark.parametrize('tile_size', [None, 96, (80, 120)])
+def test_convolve_image_tiles(tile_size):
+
+    rng = np.random.default_rng(1)
+    data = rng.normal(size=(300, 230))
+    data[100, 200] = np.nan
+    data[:5, :3] = np.nan
+    beam = Beam(2 * u.arcsec)
+    target = Beam(5 * u.arcsec, 4 * u.arcsec, 30 * u.deg)
+
+    expected = convolve_cube(data[np.newaxis], Beams([beam.major.value] *
+                                                     beam.major.unit),
+                             target, PIXSCALE)[0]
+    result = beam.convolve_image_to(target, data, PIXSCALE,
+                                    tile_size=tile_size, workers=3)
+    npt.assert_allclose(result, expected, atol=1e-12)
+
+
+@pytest.mark.parametrize('pa', [30, 80, -10, -50])
+def test_convolve_image_separable(pa):
+
+    rng = np.random.default_rng(2)
+    data = rng.normal(size=(120, 90))
+    data[60, 40] = np.nan
+    beam = Beam(2 * u.arcsec)
+    target = Beam(8 * u.arcsec, 3 * u.arcsec, pa * u.deg)
+
+    expected = convolve_image(data, beam, target, PIXSCALE)
+    result = beam.convolve_image_to(target, data, PIXSCALE,
+                                    method='separable')
+    assert np.isnan(result[60, 40])
+    npt.assert_allclose(result, expected, atol=1e-8)
+
+    with pytest.raises(ValueError, match='method'):
+        convolve_image(data, beam, target, PIXSCALE, method='iir')
+
+
+def test_convolve_image_memmap(tmp_path):
+
+    data = np.zeros((200, 150), dtype=np.float32)
+    data[50, 60] = 1
+    beam = Beam(2 * u.arcsec)
+    target = Beam(3 * u.arcsec)
+
+    out = np.lib.format.open_memmap(str(tmp_path / 'out.npy'), mode='w+',
+                                    dtype=np.float32, shape=data.shape)
+    result = convolve_image(data * u.Jy / u.beam, beam, target, PIXSCALE,
+                            tile_size=64, out=out)
+    assert result.unit == u.Jy / u.beam
+    out.flush()
+    del out
+
+    saved = np.load(str(tmp_path / 'out.npy'))
+    npt.assert_allclose(saved.sum(), (target.sr / beam.sr).value, rtol=1e-5)
+
+    # Images at the target beam are copied
+    npt.assert_equal(convolve_image(data, target, target, PIXSCALE), data)
+
+    with pytest.raises(ValueError, match='larger than the overlap'):
+        convolve_image(data, beam, target, PIXSCALE, tile_size=16)
+    with pytest.raises(ValueError):
+        convolve_image(data[np.newaxis], beam, target, PIXSCALE)
+
+
+def test_tile_shape():
+
+    # At least MIN_TILE_SIZE, and no larger than the padded image
+    assert _tile_shape((10000, 10000), (20, 30)) == (512, 512)
+    assert _tile_shape((100, 10000), (20, 300)) == (144, 2400)
+    assert _tile_shape((100, 100), (20, 30), tile_size=(64, 90)) == (64, 90)
@@ -44,3 +44,267 @@ def test_tophat_kernel():
                                             0.0)
 
     npt.assert_allclose(kernel.array, direct_kernel.array)
+
+
+@pytest.mark.parametrize(('mode', 'params'),
+                         [(mode, params)
+                          for mode in ['center', 'linear_interp', 'oversample']
+                          for params in [(3., 1.5, 0.7), (2., 2., 0.3),
+                                         (2.5, 1., np.pi / 2)]])
+def test_gauss_kernel_matches_astropy(mode, params):
+
+    from astropy.modeling.models import Gaussian2D
+    from astropy.convolution import discretize_model
+
+    stddev_maj, stddev_min, theta = params
+    kernel = radio_beam.EllipticalGaussian2DKernel(stddev_maj, stddev_min,
+                                                   theta, mode=mode,
+                                                   y_size=31)
+
+    model = Gaussian2D(1. / (2 * np.pi * stddev_maj * stddev_min), 0, 0,
+                       stddev_maj, stddev_min, theta)
+    expected = discretize_model(model, radio_beam._kernel_range(kernel.shape[1]),
+                                radio_beam._kernel_range(31), mode=mode)
+
+    assert kernel.shape[0] == 31
+    npt.assert_allclose(kernel.array, expected, rtol=1e-12, atol=1e-15)
+    npt.assert_allclose(kernel.model(0, 0), model.amplitude.value)
+
+
+@pytest.mark.parametrize('theta', [np.pi / 2, 0.4, 2.1])
+def test_gauss_kernel_integrate(theta):
+
+    from astropy.modeling.models import Gaussian2D
+    from astropy.convolution import discretize_model
+
+    # Keep the kernel small: astropy integrates each pixel numerically
+    kernel = radio_beam.EllipticalGaussian2DKernel(0.9, 0.4, theta,
+                                                   mode='integrate', x_size=5)
+
+    model = Gaussian2D(1. / (2 * np.pi * 0.9 * 0.4), 0, 0, 0.9, 0.4, theta)
+    expected = discretize_model(model, (-2, 3), (-2, 3), mode='integrate')
+
+    npt.assert_allclose(kernel.array, expected, rtol=1e-7, atol=1e-12)
+
+
+def test_gauss_kernel_invalid_mode():
+
+    with pytest.raises(ValueError, match='Invalid mode'):
+        radio_beam.EllipticalGaussian2DKernel(2., 1., 0., mode='nearest')
+
+    with pytest.raises(TypeError):
+        radio_beam.EllipticalGaussian2DKernel(2., 1., 0., x_size=5.5)
+
+
+@pytest.mark.parametrize('theta', [0., np.pi / 2, 0.5])
+@pytest.mark.parametrize('truncation', [1e-3, 1e-8])
+def test_gauss_kernel_truncation(theta, truncation):
+
+    kernel = radio_beam.EllipticalGaussian2DKernel(6., 2., theta,
+                                                   truncation=truncation)
+    ny, nx = kernel.shape
+    assert nx % 2 == 1 and ny % 2 == 1
+    assert kernel._truncation <= truncation
+
+    # The truncation is the integral outside of the kernel: exact for kernels
+    # aligned with the pixels, and an upper bound otherwise
+    def missing(x_size, y_size):
+        return 1 - radio_beam.EllipticalGaussian2DKernel(
+            6., 2., theta, x_size=x_size, y_size=y_size,
+            mode='integrate').array.sum()
+
+    assert missing(nx, ny) <= kernel._truncation * (1 + 1e-6) + 1e-15
+    if theta != 0.5:
+        npt.assert_allclose(missing(nx, ny), kernel._truncation, rtol=1e-6,
+                            atol=1e-15)
+
+    # Both axes are the smallest that meet the truncation
+    assert missing(nx - 2, ny - 2) > truncation / 2
+
+    # Smaller than the default support
+    default = radio_beam.EllipticalGaussian2DKernel(6., 2., theta)
+    assert nx * ny < default.array.size
+
+    with pytest.raises(ValueError, match='truncation'):
+        radio_beam.EllipticalGaussian2DKernel(6., 2., theta, truncation=0)
+
+
+@pytest.mark.parametrize(('theta', 'separable'),
+                         [(0., True), (np.pi / 2, True), (0.4, False)])
+def test_gauss_kernel_separable(theta, separable):
+
+    kernel = radio_beam.EllipticalGaussian2DKernel(3., 1., theta)
+    assert kernel.separable is separable
+
+    # A separable kernel is the outer product of its central row and column
+    array = kernel.array
+    outer = np.outer(array[:, 12], array[12]) / array[12, 12]
+    assert np.allclose(outer, array, atol=1e-12) is separable
+
+    # Circular kernels are always separable
+    assert radio_beam.EllipticalGaussian2DKernel(2., 2., 0.4).separable
+
+
+def test_kernel_cache():
+
+    from ..kernel_cache import KernelCache, kernel_cache
+
+    cache = KernelCache()
+    beam = radio_beam.Beam(1*u.arcsec, 0.5*u.arcsec, 30*u.deg)
+
+    kernel = beam.as_kernel(0.1*u.arcsec, cache=cache)
+    assert cache.cache_info()[:2] == (0, 1)
+    assert not kernel.array.flags.writeable
+
+    # The default arguments and equivalent beams and pixel scales share the
+    # same kernel
+    again = beam.as_kernel(1e-4*u.arcsec * 1e3, cache=cache, mode='center')
+    assert again is not kernel
+    assert again.array is kernel.array
+    assert cache.cache_info()[:2] == (1, 1)
+    npt.assert_equal(kernel.array,
+                     beam.as_kernel(0.1*u.arcsec, cache=False).array)
+    assert beam.as_kernel(0.1*u.arcsec, cache=False).array.flags.writeable
+
+    # Kernels are not cached by default, and can be modified
+    info = kernel_cache.cache_info()
+    beam.as_kernel(0.1*u.arcsec).normalize('peak')
+    beam.as_tophat_kernel(0.1*u.arcsec.to(u.deg)).normalize('peak')
+    assert kernel_cache.cache_info() == info
+
+    # Other modes, sizes, pixel scales and shapes are cached separately
+    beam.as_kernel(0.1*u.arcsec, cache=cache, x_size=11)
+    beam.as_kernel(0.1*u.arcsec, cache=cache, mode='oversample')
+    beam.as_kernel(0.2*u.arcsec, cache=cache)
+    beam.as_tophat_kernel(0.1*u.arcsec.to(u.deg), cache=cache)
+    assert len(cache) == 5
+
+    cache.clear()
+    assert cache.cache_info() == (0, 0, 0, 0, 0, cache.max_bytes)
+
+
+def test_kernel_cache_eviction():
+
+    from ..kernel_cache import KernelCache
+
+    beams = [radio_beam.Beam(major*u.arcsec) for major in (1, 1.001, 1.002)]
+    nbytes = beams[0].as_kernel(0.1*u.arcsec, cache=False).array.nbytes
+
+    cache = KernelCache(max_bytes=2 * nbytes)
+    beams[0].as_kernel(0.1*u.arcsec, cache=cache)
+    beams[1].as_kernel(0.1*u.arcsec, cache=cache)
+    # Use the first kernel, so that the second one is evicted
+    beams[0].as_kernel(0.1*u.arcsec, cache=cache)
+    beams[2].as_kernel(0.1*u.arcsec, cache=cache)
+
+    info = cache.cache_info()
+    assert info.evictions == 1
+    assert info.entries == 2
+    assert info.nbytes == cache.nbytes == 2 * nbytes
+    beams[0].as_kernel(0.1*u.arcsec, cache=cache)
+    assert cache.misses == 3
+    beams[1].as_kernel(0.1*u.arcsec, cache=cache)
+    assert cache.misses == 4
+
+    # Kernels larger than the cache are not stored
+    small = KernelCache(max_bytes=8)
+    assert beams[0].as_kernel(0.1*u.arcsec, cache=small).array.size > 1
+    assert len(small) == 0
+
+
+@pytest.mark.parametrize('shape', [(65, 64), (64, 65)])
+def test_fourier_kernel(shape):
+
+    beam = radio_beam.Beam(2*u.arcsec, 1*u.arcsec, 30*u.deg)
+    pixscale = 0.25*u.arcsec
+
+    # FFT of the image-space kernel, centered on pixel (0, 0)
+    ny, nx = shape
+    size = min(shape) - 1
+    kernel = beam.as_kernel(pixscale, x_size=size, cache=False).array
+    image = np.zeros(shape)
+    image[:size, :size] = kernel
+    image = np.roll(image, (-(size // 2), -(size // 2)), axis=(0, 1))
+
+    fourier = beam.as_fourier_kernel(shape, pixscale)
+    assert fourier.shape == (ny, nx // 2 + 1)
+    npt.assert_allclose(fourier, np.fft.rfft2(image).real, atol=1e-6)
+    assert fourier[0, 0] == 1
+
+    full = beam.as_fourier_kernel(shape, pixscale, real=False)
+    npt.assert_allclose(full, np.fft.fft2(image).real, atol=1e-6)
+
+    single = beam.as_fourier_kernel(shape, pixscale, dtype=np.float32)
+    assert single.dtype == np.float32
+    npt.assert_allclose(single, fourier, rtol=1e-5, atol=1e-30)
+
+
+def test_fourier_kernels():
+
+    from ..multiple_beams import Beams
+
+    beams = Beams(major=[1, 2] * u.arcsec, minor=[1, 1.5] * u.arcsec,
+                  pa=[0, 70] * u.deg)
+    kernels = beams.as_fourier_kernels((16, 20), 0.2*u.arcsec,
+                                       dtype=np.float32)
+    assert kernels.shape == (2, 16, 11)
+    assert kernels.dtype == np.float32
+    for beam, kernel in zip(beams, kernels):
+        npt.assert_allclose(kernel, beam.as_fourier_kernel((16, 20),
+                                                           0.2*u.arcsec),
+                            rtol=1e-5, atol=1e-30)
+
+
+def celestial_wcs(cdelt, pc=None, naxis=2):
+    from astropy.wcs import WCS
+
+    mywcs = WCS(naxis=naxis)
+    mywcs.wcs.ctype = ['RA---SIN', 'DEC--SIN', 'FREQ'][:naxis]
+    mywcs.wcs.cdelt = list(cdelt) + [1e6] * (naxis - 2)
+    if pc is not None:
+        mywcs.wcs.pc = np.pad(pc, (0, naxis - 2))
+        mywcs.wcs.pc[2:, 2:] = np.eye(naxis - 2)
+    return mywcs
+
+
+def test_kernel_for_wcs():
+
+    beam = radio_beam.Beam(3 * u.arcsec, 1.5 * u.arcsec, 20 * u.deg)
+    scale = (0.5 * u.arcsec).to_value(u.deg)
+
+    # Square pixels aligned with the sky give the same kernel as as_kernel
+    kernel = beam.as_kernel_for_wcs(celestial_wcs([-scale, scale], naxis=3),
+                                    cache=False)
+    expected = beam.as_kernel(0.5 * u.arcsec, cache=False)
+    npt.assert_allclose(kernel.array, expected.array, atol=1e-12)
+
+    # Rotating the pixels by phi rotates the beam by -phi
+    phi = np.radians(30)
+    rotation = [[np.cos(phi), -np.sin(phi)], [np.sin(phi), np.cos(phi)]]
+    kernel = beam.as_kernel_for_wcs(celestial_wcs([-scale, scale], rotation),
+                                    cache=False)
+    rotated = radio_beam.Beam(3 * u.arcsec, 1.5 * u.arcsec, -10 * u.deg)
+    npt.assert_allclose(kernel.array,
+                        rotated.as_kernel(0.5 * u.arcsec, cache=False).array,
+                        atol=1e-12)
+
+    # Non-square pixels: a circular beam is elongated along the short pixels
+    circular = radio_beam.Beam(3 * u.arcsec)
+    mywcs = celestial_wcs([-scale, 2 * scale])
+    stddev_maj, stddev_min, angle = radio_beam._transform_gaussian(
+        circular.major.to_value(u.deg), circular.minor.to_value(u.deg), 0.,
+        radio_beam._wcs_pixel_transform(mywcs))
+    npt.assert_allclose(stddev_maj, 6 / radio_beam.SIGMA_TO_FWHM)
+    npt.assert_allclose(stddev_min, 3 / radio_beam.SIGMA_TO_FWHM)
+    npt.assert_allclose(np.sin(angle), 0, atol=1e-12)
+
+    # The transform is cached for the WCS, and updated when it changes
+    assert mywcs in radio_beam._WCS_TRANSFORMS
+    mywcs.wcs.cdelt = [-scale, scale]
+    npt.assert_allclose(radio_beam._wcs_pixel_transform(mywcs),
+                        np.diag([-1, 1]) / scale)
+
+    spectral = celestial_wcs([1e6, 1])
+    spectral.wcs.ctype = ['FREQ', 'STOKES']
+    with pytest.raises(ValueError, match='celestial'):
+        beam.as_kernel_for_wcs(spectral)
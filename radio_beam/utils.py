@@ -115,6 +115,83 @@ def deconvolve_optimized(beamprops1, beamprops2, failure_returns_pointlike=False
     return new_major, new_minor, new_pa
 
 
+def deconvolve_vectorized(beamprops1, beamprops2, failure_returns_pointlike=False):
+    """
+    Array version of `deconvolve_optimized` for deconvolving many beams at once.
+
+    The values in the dictionaries can be arrays, which are broadcast against
+    each other. As for `deconvolve_optimized`, the inputs MUST be in degrees.
+
+    Parameters
+    ----------
+    beamprops1: dict
+        Dictionary with keys 'BMAJ', 'BMIN', and 'BPA' for the beams to
+        deconvolve from.
+    beamprops2: dict
+        Same as `beamprops1` for the second beam(s).
+    failure_returns_pointlike : bool, optional
+        Return a point beam (zero area) where deconvolution fails. If `False`,
+        this will instead raise a `~radio_beam.utils.BeamError` when any
+        deconvolution fails.
+
+    Returns
+    -------
+    new_major : `~numpy.ndarray`
+        Deconvolved major FWHM in degrees.
+    new_minor : `~numpy.ndarray`
+        Deconvolved minor FWHM in degrees.
+    new_pa : `~numpy.ndarray`
+        Deconvolved position angle in radians.
+
+    """
+
+    maj1 = np.asarray(beamprops1['BMAJ'], dtype=float)
+    min1 = np.asarray(beamprops1['BMIN'], dtype=float)
+    pa1 = np.asarray(beamprops1['BPA'], dtype=float) * DEG2RAD
+
+    maj2 = np.asarray(beamprops2['BMAJ'], dtype=float)
+    min2 = np.asarray(beamprops2['BMIN'], dtype=float)
+    pa2 = np.asarray(beamprops2['BPA'], dtype=float) * DEG2RAD
+
+    cos1, sin1 = np.cos(pa1), np.sin(pa1)
+    cos2, sin2 = np.cos(pa2), np.sin(pa2)
+
+    alpha = ((maj1 * cos1)**2 + (min1 * sin1)**2 -
+             (maj2 * cos2)**2 - (min2 * sin2)**2)
+
+    beta = ((maj1 * sin1)**2 + (min1 * cos1)**2 -
+            (maj2 * sin2)**2 - (min2 * cos2)**2)
+
+    gamma = 2 * ((min1**2 - maj1**2) * sin1 * cos1 -
+                 (min2**2 - maj2**2) * sin2 * cos2)
+
+    s = alpha + beta
+    t = np.sqrt((alpha - beta)**2 + gamma**2)
+
+    # Same conditions and tolerances as deconvolve_optimized
+    atol_t = np.finfo(np.float64).eps / 3600.**2
+    failed = ((alpha + np.finfo(np.float64).eps < 0) |
+              (beta + np.finfo(np.float64).eps < 0) |
+              (s < t + atol_t))
+
+    if failed.any() and not failure_returns_pointlike:
+        raise BeamError("Beam could not be deconvolved")
+
+    with np.errstate(invalid='ignore'):
+        new_major = np.sqrt(0.5 * (s + t)) + np.finfo(np.float64).eps
+        new_minor = np.sqrt(0.5 * (s - t)) + np.finfo(np.float64).eps
+
+    atol = 1e-7 / 3600.
+    new_pa = np.where(np.sqrt(np.abs(gamma) + np.abs(alpha - beta)) < atol,
+                      0.0, 0.5 * np.arctan2(-1. * gamma, alpha - beta))
+
+    new_major = np.where(failed, 0., new_major)
+    new_minor = np.where(failed, 0., new_minor)
+    new_pa = np.where(failed, 0., new_pa)
+
+    return new_major, new_minor, new_pa
+
+
 def deconvolve(beam, other, failure_returns_pointlike=False):
     """
     Deconvolve a beam from another
@@ -199,6 +276,66 @@ def convolve(beam, other):
     return new_major, new_minor, new_pa
 
 
+def convolve_vectorized(beamprops1, beamprops2):
+    """
+    An optimized, non-Quantity version of beam convolution that accepts
+    arrays of beam parameters.
+
+    The inputs MUST be in degrees for the major, minor, and position angle.
+    Arrays in the two dictionaries are broadcast against each other.
+
+    Parameters
+    ----------
+    beamprops1: dict
+        Dictionary with keys 'BMAJ', 'BMIN', and 'BPA' for the first beam(s).
+    beamprops2: dict
+        Same as `beamprops1` for the beam(s) to convolve with.
+
+    Returns
+    -------
+    new_major : `~numpy.ndarray`
+        Convolved major FWHM in degrees.
+    new_minor : `~numpy.ndarray`
+        Convolved minor FWHM in degrees.
+    new_pa : `~numpy.ndarray`
+        Convolved position angle in radians.
+    """
+
+    maj1 = np.asarray(beamprops1['BMAJ'], dtype=float)
+    min1 = np.asarray(beamprops1['BMIN'], dtype=float)
+    pa1 = np.asarray(beamprops1['BPA'], dtype=float) * DEG2RAD
+
+    maj2 = np.asarray(beamprops2['BMAJ'], dtype=float)
+    min2 = np.asarray(beamprops2['BMIN'], dtype=float)
+    pa2 = np.asarray(beamprops2['BPA'], dtype=float) * DEG2RAD
+
+    cos1, sin1 = np.cos(pa1), np.sin(pa1)
+    cos2, sin2 = np.cos(pa2), np.sin(pa2)
+
+    alpha = ((maj1 * cos1)**2 + (min1 * sin1)**2 +
+             (maj2 * cos2)**2 + (min2 * sin2)**2)
+
+    beta = ((maj1 * sin1)**2 + (min1 * cos1)**2 +
+            (maj2 * sin2)**2 + (min2 * cos2)**2)
+
+    gamma = 2 * ((min1**2 - maj1**2) * sin1 * cos1 +
+                 (min2**2 - maj2**2) * sin2 * cos2)
+
+    s = alpha + beta
+    t = np.sqrt((alpha - beta)**2 + gamma**2)
+
+    new_major = np.sqrt(0.5 * (s + t))
+    # Rounding can make s - t marginally negative for circular results
+    new_minor = np.sqrt(np.maximum(0.5 * (s - t), 0.))
+
+    # absolute tolerance needs to be <<1 microarcsec
+    atol = 1e-7 / 3600.
+    new_pa = np.where(np.sqrt(np.abs(gamma) + np.abs(alpha - beta)) < atol,
+                      0.0, 0.5 * np.arctan2(-1. * gamma, alpha - beta))
+
+    return new_major, new_minor, new_pa
+
+
 def transform_ellipse(major, minor, pa, x_scale, y_scale):
     """
     Transform an ellipse by scaling in the x and y axes.